@@ -0,0 +1,312 @@
+# optimizador/almacen.py
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from optimizador.models import ModeloMueble, PiezaInventario, PiezaModelo
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sobrantes (
+    id       INTEGER PRIMARY KEY,
+    codigo   TEXT NOT NULL,
+    ancho    REAL NOT NULL,
+    largo    REAL NOT NULL,
+    color    TEXT NOT NULL,
+    espesor  REAL,
+    cantidad INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sobrantes_color_espesor ON sobrantes (color, espesor);
+CREATE INDEX IF NOT EXISTS sobrantes_clave ON sobrantes (codigo, color, ancho, largo, espesor);
+
+CREATE TABLE IF NOT EXISTS modelos (
+    id     INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS piezas_modelo (
+    modelo_id INTEGER NOT NULL REFERENCES modelos (id) ON DELETE CASCADE,
+    orden     INTEGER NOT NULL,
+    codigo    TEXT NOT NULL,
+    ancho     REAL NOT NULL,
+    largo     REAL NOT NULL,
+    espesor   REAL,
+    cantidad  INTEGER NOT NULL,
+    PRIMARY KEY (modelo_id, orden)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+_COLUMNAS_SOBRANTE = ("codigo", "ancho", "largo", "color", "espesor", "cantidad")
+
+
+def _como_fila(pieza: Union[PiezaInventario, Dict, tuple]) -> tuple:
+    if isinstance(pieza, tuple):
+        return pieza
+    if isinstance(pieza, dict):
+        return tuple(pieza.get(c) for c in _COLUMNAS_SOBRANTE)
+    return (pieza.codigo, pieza.ancho, pieza.largo, pieza.color, pieza.espesor, pieza.cantidad)
+
+
+class Almacen:
+    """
+    Sobrantes y modelos en una base SQLite.
+
+    Cada operación abre su propia conexión y corre en una transacción, así
+    que se puede usar desde varios hilos (p. ej. sesiones de Streamlit) y
+    agregar o borrar cuesta lo que toca, no reescribir todo el inventario.
+    Los sobrantes se listan en orden de alta, que es el que usa el motor
+    clásico para desempatar; los filtros por color y espesor van al índice.
+    """
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._transaccion() as con:
+            con.executescript(_ESQUEMA)
+
+    @contextmanager
+    def _transaccion(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            con.execute("PRAGMA foreign_keys = ON")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    # ── Sobrantes ─────────────────────────────────────────────────────
+
+    def _consulta_sobrantes(self, color: Optional[str], espesor: Optional[float]):
+        sql = "SELECT id, codigo, ancho, largo, color, espesor, cantidad FROM sobrantes"
+        condiciones, parametros = [], []
+        if color is not None:
+            condiciones.append("color = ?")
+            parametros.append(color)
+        if espesor is not None:
+            # Un sobrante sin espesor sirve para cualquiera, como en el motor
+            condiciones.append("(espesor = ? OR espesor IS NULL OR espesor = 0)")
+            parametros.append(espesor)
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        return sql + " ORDER BY id", parametros
+
+    def sobrantes(self, color: Optional[str] = None, espesor: Optional[float] = None) -> List[PiezaInventario]:
+        sql, parametros = self._consulta_sobrantes(color, espesor)
+        with self._transaccion() as con:
+            return [PiezaInventario(*fila[1:]) for fila in con.execute(sql, parametros)]
+
+    def filas_sobrantes(self, color: Optional[str] = None, espesor: Optional[float] = None) -> List[Dict]:
+        """Sobrantes como dicts con su `id`, para mostrar y editar."""
+        sql, parametros = self._consulta_sobrantes(color, espesor)
+        with self._transaccion() as con:
+            return [dict(zip(("id",) + _COLUMNAS_SOBRANTE, fila)) for fila in con.execute(sql, parametros)]
+
+    def agregar_sobrantes(self, piezas: Iterable[Union[PiezaInventario, Dict]]) -> int:
+        """Inserta en una sola transacción; devuelve cuántos sobrantes agregó."""
+        filas = [_como_fila(p) for p in piezas]
+        with self._transaccion() as con:
+            con.executemany(
+                "INSERT INTO sobrantes (codigo, ancho, largo, color, espesor, cantidad) VALUES (?, ?, ?, ?, ?, ?)",
+                filas
+            )
+        return len(filas)
+
+    def insertar_sobrantes(self, piezas: Iterable[Union[PiezaInventario, Dict]]) -> List[int]:
+        """Como `agregar_sobrantes`, pero devuelve el id de cada sobrante nuevo."""
+        with self._transaccion() as con:
+            return [
+                con.execute(
+                    "INSERT INTO sobrantes (codigo, ancho, largo, color, espesor, cantidad) VALUES (?, ?, ?, ?, ?, ?)",
+                    _como_fila(p)
+                ).lastrowid
+                for p in piezas
+            ]
+
+    def fusionar_sobrantes(self, piezas: Iterable[Union[PiezaInventario, Dict, tuple]]) -> Tuple[int, int]:
+        """
+        Agrega sobrantes sumando `cantidad` al que ya exista con el mismo
+        código, medidas, color y espesor (si hay repetidos, al más antiguo).
+        Acepta también tuplas en el orden de las columnas. Devuelve
+        (agregados, fusionados); todo en una transacción.
+        """
+        entrantes: Dict[tuple, int] = {}
+        for p in piezas:
+            *clave, cantidad = _como_fila(p)
+            clave = tuple(clave)
+            entrantes[clave] = entrantes.get(clave, 0) + int(cantidad)
+        if not entrantes:
+            return 0, 0
+
+        with self._transaccion() as con:
+            # Sólo se buscan las claves entrantes, por el índice de la clave
+            # completa: el de (color, espesor) es mucho menos selectivo
+            con.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS entrantes (codigo TEXT, ancho REAL, largo REAL, color TEXT, espesor REAL)"
+            )
+            con.execute("DELETE FROM entrantes")
+            con.executemany("INSERT INTO entrantes VALUES (?, ?, ?, ?, ?)", list(entrantes))
+            existentes = {
+                tuple(fila[1:]): fila[0] for fila in con.execute(
+                    "SELECT MIN(s.id), e.codigo, e.ancho, e.largo, e.color, e.espesor "
+                    "FROM entrantes e JOIN sobrantes s INDEXED BY sobrantes_clave ON s.codigo = e.codigo AND s.ancho = e.ancho "
+                    "AND s.largo = e.largo AND s.color = e.color AND s.espesor IS e.espesor "
+                    "GROUP BY e.rowid"
+                )
+            }
+            fusionar = [(c, existentes[k]) for k, c in entrantes.items() if k in existentes]
+            nuevos = [k + (c,) for k, c in entrantes.items() if k not in existentes]
+            con.executemany("UPDATE sobrantes SET cantidad = cantidad + ? WHERE id = ?", fusionar)
+            con.executemany(
+                "INSERT INTO sobrantes (codigo, ancho, largo, color, espesor, cantidad) VALUES (?, ?, ?, ?, ?, ?)",
+                nuevos
+            )
+        return len(nuevos), len(fusionar)
+
+    def aplicar_consumo(
+        self,
+        consumos: Dict[tuple, int],
+        recortes: Iterable[PiezaInventario] = ()
+    ) -> Tuple[Dict[int, int], List[Tuple[int, PiezaInventario]]]:
+        """
+        Descuenta tableros usados y suma recortes en una sola transacción.
+        `consumos` va de (código, color, ancho, largo, espesor) a cuántos
+        tableros descontar, del sobrante más antiguo en adelante; los que
+        quedan en cero se borran. Cada recorte se suma al sobrante con su
+        misma clave o se inserta. Si algún sobrante no alcanza no se aplica
+        nada (ValueError). Devuelve las cantidades nuevas por id (0 si se
+        borró) y los sobrantes insertados con su id.
+        """
+        cantidades: Dict[int, int] = {}
+        insertados: List[Tuple[int, PiezaInventario]] = []
+
+        def filas(con, clave):
+            return con.execute(
+                "SELECT id, cantidad FROM sobrantes INDEXED BY sobrantes_clave "
+                "WHERE codigo = ? AND color = ? AND ancho = ? AND largo = ? AND espesor IS ? ORDER BY id",
+                clave
+            ).fetchall()
+
+        with self._transaccion() as con:
+            for clave, n in consumos.items():
+                existentes = filas(con, clave)
+                if sum(c for _, c in existentes) < n:
+                    raise ValueError(f"Sobrante {clave[0]} ({clave[1]}): no quedan {n} tableros")
+                for id, cantidad in existentes:
+                    tomar = min(n, cantidad)
+                    cantidades[id] = cantidad - tomar
+                    n -= tomar
+                    if n == 0:
+                        break
+            for pieza in recortes:
+                existentes = filas(con, (pieza.codigo, pieza.color, pieza.ancho, pieza.largo, pieza.espesor))
+                if existentes:
+                    id, cantidad = existentes[0]
+                    cantidades[id] = cantidades.get(id, cantidad) + pieza.cantidad
+                else:
+                    insertados.append((con.execute(
+                        "INSERT INTO sobrantes (codigo, ancho, largo, color, espesor, cantidad) VALUES (?, ?, ?, ?, ?, ?)",
+                        _como_fila(pieza)
+                    ).lastrowid, pieza))
+            con.executemany("UPDATE sobrantes SET cantidad = ? WHERE id = ?", [(c, id) for id, c in cantidades.items() if c > 0])
+            con.executemany("DELETE FROM sobrantes WHERE id = ?", [(id,) for id, c in cantidades.items() if c <= 0])
+        return cantidades, insertados
+
+    def eliminar_sobrantes(self, ids: Iterable[int]) -> int:
+        ids = [(int(i),) for i in ids]
+        with self._transaccion() as con:
+            con.executemany("DELETE FROM sobrantes WHERE id = ?", ids)
+        return len(ids)
+
+    def colores(self) -> List[str]:
+        with self._transaccion() as con:
+            return [c for (c,) in con.execute("SELECT DISTINCT color FROM sobrantes ORDER BY color")]
+
+    def cantidad_sobrantes(self) -> int:
+        with self._transaccion() as con:
+            return con.execute("SELECT COUNT(*) FROM sobrantes").fetchone()[0]
+
+    # ── Modelos ───────────────────────────────────────────────────────
+
+    def _piezas(self, con: sqlite3.Connection, modelo_id: int) -> List[PiezaModelo]:
+        return [
+            PiezaModelo(*fila) for fila in con.execute(
+                "SELECT codigo, ancho, largo, espesor, cantidad FROM piezas_modelo WHERE modelo_id = ? ORDER BY orden",
+                (modelo_id,)
+            )
+        ]
+
+    def modelos(self) -> List[ModeloMueble]:
+        with self._transaccion() as con:
+            return [
+                ModeloMueble(id=i, nombre=n, piezas=self._piezas(con, i))
+                for i, n in con.execute("SELECT id, nombre FROM modelos ORDER BY id").fetchall()
+            ]
+
+    def modelo(self, id: int) -> Optional[ModeloMueble]:
+        with self._transaccion() as con:
+            fila = con.execute("SELECT id, nombre FROM modelos WHERE id = ?", (id,)).fetchone()
+            return ModeloMueble(id=fila[0], nombre=fila[1], piezas=self._piezas(con, fila[0])) if fila else None
+
+    def guardar_modelo(self, modelo: ModeloMueble):
+        """Alta o reemplazo del modelo con ese id, piezas incluidas."""
+        with self._transaccion() as con:
+            con.execute("INSERT OR REPLACE INTO modelos (id, nombre) VALUES (?, ?)", (modelo.id, modelo.nombre))
+            con.execute("DELETE FROM piezas_modelo WHERE modelo_id = ?", (modelo.id,))
+            con.executemany(
+                "INSERT INTO piezas_modelo (modelo_id, orden, codigo, ancho, largo, espesor, cantidad) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(modelo.id, k, p.codigo, p.ancho, p.largo, p.espesor, p.cantidad) for k, p in enumerate(modelo.piezas)]
+            )
+
+    def eliminar_modelos(self, ids: Iterable[int]) -> int:
+        ids = [(int(i),) for i in ids]
+        with self._transaccion() as con:
+            con.executemany("DELETE FROM modelos WHERE id = ?", ids)
+        return len(ids)
+
+    # ── Importación inicial ───────────────────────────────────────────
+
+    def importar_json(self, inventario_json: Optional[str] = None, modelos_json: Optional[str] = None) -> bool:
+        """
+        Importa los JSON de la versión anterior una sola vez: queda registrado
+        en la tabla meta y las llamadas siguientes no hacen nada. Todo entra en
+        una transacción. Si no existe ninguno de los dos archivos no se
+        registra nada, así que una ruta equivocada no deja la base marcada
+        como importada. Devuelve True si importó.
+        """
+        with self._transaccion() as con:
+            if con.execute("SELECT 1 FROM meta WHERE clave = 'importado_json'").fetchone():
+                return False
+
+            leidos = 0
+
+            if inventario_json and os.path.exists(inventario_json):
+                with open(inventario_json, "r", encoding="utf-8") as f:
+                    sobrantes = json.load(f)
+                con.executemany(
+                    "INSERT INTO sobrantes (codigo, ancho, largo, color, espesor, cantidad) VALUES (?, ?, ?, ?, ?, ?)",
+                    [_como_fila(p) for p in sobrantes]
+                )
+                leidos += 1
+            if modelos_json and os.path.exists(modelos_json):
+                with open(modelos_json, "r", encoding="utf-8") as f:
+                    modelos = json.load(f)
+                for m in modelos:
+                    con.execute("INSERT OR REPLACE INTO modelos (id, nombre) VALUES (?, ?)", (m["id"], m["nombre"]))
+                    con.executemany(
+                        "INSERT OR REPLACE INTO piezas_modelo (modelo_id, orden, codigo, ancho, largo, espesor, cantidad) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(m["id"], k, p["codigo"], p["ancho"], p["largo"], p.get("espesor"), p["cantidad"])
+                         for k, p in enumerate(m["piezas"])]
+                    )
+                leidos += 1
+            if not leidos:
+                return False
+            con.execute("INSERT INTO meta (clave, valor) VALUES ('importado_json', '1')")
+        return True
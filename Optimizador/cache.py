@@ -0,0 +1,358 @@
+# optimizador/cache.py
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from optimizador.models import ArreglosInventario, ModeloMueble, PiezaInventario
+
+# Tamaño por defecto de la caché en memoria (bytes de JSON serializado)
+MAX_BYTES_MEMORIA = 64 * 1024 * 1024
+# Tamaño por defecto de las entradas en disco; al pasarlo se poda hasta 3/4
+MAX_BYTES_DISCO = 512 * 1024 * 1024
+
+MOTOR_CLASICO = "clasico"
+MOTOR_SA = "sa"
+MOTOR_GUILLOTINA = "guillotina"
+
+# Se incrementa cuando cambia el formato de salida de algún motor, para que
+# no se sirvan resultados guardados con el formato anterior
+VERSION_RESULTADOS = 2
+
+
+def _normalizar_numero(x) -> Optional[float]:
+    # 1, 1.0 y numpy.float64(1.0) deben dar la misma clave; None y NaN también
+    if x is None:
+        return None
+    x = float(x)
+    return None if x != x else x
+
+
+def normalizar_modelo(modelo: ModeloMueble) -> List:
+    """El modelo como lista JSON estable: los mismos números dan la misma lista sea cual sea su tipo."""
+    return [
+        modelo.id, modelo.nombre,
+        [[p.codigo, _normalizar_numero(p.ancho), _normalizar_numero(p.largo),
+          _normalizar_numero(p.espesor), int(p.cantidad)] for p in modelo.piezas]
+    ]
+
+
+def _normalizar_inventario(inventario: Union[List[PiezaInventario], ArreglosInventario]) -> List:
+    # El orden se conserva: a igual área el motor clásico desempata por posición
+    if isinstance(inventario, ArreglosInventario):
+        # Por columnas, sin armar un objeto por sobrante; la clave es la misma
+        espesor = [None if e != e else e for e in inventario.espesor.tolist()]
+        return [
+            list(fila) for fila in zip(
+                inventario.codigo, inventario.color, inventario.ancho.tolist(), inventario.largo.tolist(),
+                espesor, inventario.cantidad.tolist()
+            )
+        ]
+    return [
+        [p.codigo, p.color, _normalizar_numero(p.ancho), _normalizar_numero(p.largo),
+         _normalizar_numero(p.espesor), int(p.cantidad)]
+        for p in inventario
+    ]
+
+
+def huella_inventario(inventario: Union[List[PiezaInventario], ArreglosInventario]) -> str:
+    """
+    Hash SHA-256 del inventario normalizado. Con muchos sobrantes cuesta
+    casi lo mismo que una corrida del motor clásico: quien tiene los datos
+    cargados lo calcula una vez por carga y lo pasa como `huella_inv`.
+    """
+    texto = json.dumps(_normalizar_inventario(inventario), separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def clave_corrida(
+    motor: str,
+    modelo: ModeloMueble,
+    inventario: Union[List[PiezaInventario], ArreglosInventario],
+    cantidad: int,
+    parametros: Optional[Dict[str, Any]] = None,
+    huella_inv: Optional[str] = None
+) -> str:
+    """
+    Hash SHA-256 estable de las entradas normalizadas de una corrida
+    (semilla incluida en `parametros`). El inventario entra por su
+    `huella_inventario`, ya calculada en `huella_inv` o calculada acá.
+    """
+    datos = {
+        "version": VERSION_RESULTADOS,
+        "motor": motor,
+        "modelo": normalizar_modelo(modelo),
+        "inventario": huella_inv or huella_inventario(inventario),
+        "cantidad": int(cantidad),
+        "parametros": {k: v for k, v in sorted((parametros or {}).items()) if v is not None},
+    }
+    texto = json.dumps(datos, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def huella_archivos(rutas: Iterable[str]) -> str:
+    """
+    Huella de los archivos de datos a partir de su tamaño y fecha de
+    modificación; un archivo inexistente también cuenta como estado.
+    """
+    partes = []
+    for ruta in rutas:
+        try:
+            st = os.stat(ruta)
+            partes.append(f"{ruta}:{st.st_size}:{st.st_mtime_ns}")
+        except FileNotFoundError:
+            partes.append(f"{ruta}:-")
+    return hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()
+
+
+class CacheResultados:
+    """
+    Caché de resultados direccionada por contenido.
+
+    En memoria es un LRU acotado por el tamaño del resultado serializado; con
+    `directorio` además guarda cada entrada como JSON y sobrevive reinicios.
+    El disco se acota con `max_bytes_disco`: al pasarlo se borran las
+    entradas usadas hace más tiempo (por fecha de modificación, que se
+    renueva en cada acierto) hasta bajar a 3/4 del límite. Varios procesos
+    pueden compartir el directorio; cada uno lleva su propia cuenta y, al
+    podar, relee el directorio.
+    Cada entrada registra la huella de `fuentes` (p. ej. inventario.json y
+    modelos.json) al momento de guardarse y se descarta sola si los archivos
+    cambiaron. Los resultados se devuelven sin copiar: no hay que mutarlos.
+    """
+    def __init__(
+        self,
+        max_bytes: int = MAX_BYTES_MEMORIA,
+        directorio: Optional[str] = None,
+        fuentes: Iterable[str] = (),
+        max_bytes_disco: int = MAX_BYTES_DISCO
+    ):
+        self.max_bytes = max_bytes
+        self.max_bytes_disco = max_bytes_disco
+        self.directorio = directorio
+        self.fuentes = tuple(fuentes)
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas: "OrderedDict[str, Tuple[str, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._bytes_disco = 0
+        self._lock = threading.Lock()
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+            self._bytes_disco = sum(tam for _, tam, _ in self._archivos())
+
+    def huella(self) -> str:
+        return huella_archivos(self.fuentes)
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def _quitar(self, clave: str):
+        _, _, tam = self._entradas.pop(clave)
+        self._bytes -= tam
+
+    def _archivos(self) -> List[Tuple[float, int, str]]:
+        """(fecha de modificación, tamaño, ruta) de cada entrada en disco."""
+        archivos = []
+        for entrada in os.scandir(self.directorio):
+            if entrada.name.endswith(".json"):
+                try:
+                    st = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                archivos.append((st.st_mtime, st.st_size, entrada.path))
+        return archivos
+
+    def _podar_disco(self):
+        archivos = sorted(self._archivos())
+        total = sum(tam for _, tam, _ in archivos)
+        objetivo = self.max_bytes_disco * 3 // 4
+        for _, tam, ruta in archivos:
+            if total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tam
+        with self._lock:
+            self._bytes_disco = total
+
+    def _recordar(self, clave: str, huella: str, valor: Any, tam: int):
+        if clave in self._entradas:
+            self._quitar(clave)
+        if tam > self.max_bytes:
+            return
+        self._entradas[clave] = (huella, valor, tam)
+        self._bytes += tam
+        while self._bytes > self.max_bytes:
+            self._quitar(next(iter(self._entradas)))
+
+    def obtener(self, clave: str) -> Optional[Any]:
+        huella = self.huella()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                if entrada[0] == huella:
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[1]
+                self._quitar(clave)
+
+        if self.directorio:
+            ruta = self._ruta(clave)
+            try:
+                with open(ruta, "r", encoding="utf-8") as f:
+                    texto = f.read()
+                guardado = json.loads(texto)
+            except (FileNotFoundError, json.JSONDecodeError):
+                guardado = None
+            if guardado is not None:
+                if guardado.get("huella") == huella:
+                    try:
+                        # Renueva la fecha: la poda borra primero lo que no se usa
+                        os.utime(ruta)
+                    except FileNotFoundError:
+                        pass
+                    with self._lock:
+                        self._recordar(clave, huella, guardado["resultado"], len(texto))
+                        self.aciertos += 1
+                    return guardado["resultado"]
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+
+        with self._lock:
+            self.fallos += 1
+        return None
+
+    def guardar(self, clave: str, valor: Any):
+        huella = self.huella()
+        texto = json.dumps({"huella": huella, "resultado": valor}, ensure_ascii=False)
+        with self._lock:
+            self._recordar(clave, huella, valor, len(texto))
+        if self.directorio:
+            # Escritura atómica: un lector nunca ve un archivo a medias
+            ruta = self._ruta(clave)
+            temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                f.write(texto)
+            # Si la clave ya estaba en disco, se reemplaza: sólo cuenta la diferencia
+            try:
+                anterior = os.path.getsize(ruta)
+            except FileNotFoundError:
+                anterior = 0
+            os.replace(temporal, ruta)
+            with self._lock:
+                self._bytes_disco += len(texto.encode("utf-8")) - anterior
+                podar = self._bytes_disco > self.max_bytes_disco
+            if podar:
+                self._podar_disco()
+
+    def limpiar(self):
+        """Vacía la memoria y borra las entradas en disco."""
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+            self._bytes_disco = 0
+        if self.directorio:
+            for nombre in os.listdir(self.directorio):
+                if nombre.endswith(".json"):
+                    os.remove(os.path.join(self.directorio, nombre))
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+# Parámetros que no cambian el resultado y quedan fuera de la clave
+_PARAMETROS_SIN_EFECTO = ("debug", "workers", "callback", "instrumentacion")
+
+
+def _funcion_motor(motor: str):
+    """Función de optimización de un motor ("clasico", "sa" o "guillotina")."""
+    if motor == MOTOR_CLASICO:
+        from optimizador.logic import optimizar_por_color
+        return optimizar_por_color
+    if motor == MOTOR_SA:
+        from optimizador.logic_opti5 import simulated_annealing_optimize
+        return simulated_annealing_optimize
+    if motor == MOTOR_GUILLOTINA:
+        from optimizador.logic_guillotina import optimizar_guillotina
+        return optimizar_guillotina
+    raise ValueError(f"Motor desconocido: {motor!r}")
+
+
+def _clave_si_cacheable(
+    cache: Optional[CacheResultados],
+    motor: str,
+    modelo: ModeloMueble,
+    inventario: List[PiezaInventario],
+    cantidad: int,
+    parametros: Dict[str, Any],
+    huella_inv: Optional[str] = None
+) -> Optional[str]:
+    """
+    Clave de la corrida, o None si no hay caché o el resultado no es
+    reproducible: el recocido sólo se cachea con `semilla`, y con
+    `tiempo_limite_ms` sólo si además se fija `max_iter` (si no, el
+    resultado depende de cuántas iteraciones entraron en el tiempo).
+    """
+    if cache is None:
+        return None
+    if motor == MOTOR_SA:
+        if parametros.get("semilla") is None:
+            return None
+        if parametros.get("tiempo_limite_ms") is not None and parametros.get("max_iter") is None:
+            return None
+    en_clave = {k: v for k, v in parametros.items() if k not in _PARAMETROS_SIN_EFECTO}
+    return clave_corrida(motor, modelo, inventario, cantidad, en_clave, huella_inv)
+
+
+def optimizar_cacheado(
+    cache: Optional[CacheResultados],
+    motor: str,
+    modelo: ModeloMueble,
+    inventario: List[PiezaInventario],
+    cantidad: int,
+    huella_inv: Optional[str] = None,
+    **parametros
+) -> List[Dict]:
+    """
+    Corre `optimizar_por_color` (motor "clasico"),
+    `simulated_annealing_optimize` (motor "sa") u `optimizar_guillotina`
+    (motor "guillotina") pasando por la caché.
+    `debug`, `workers`, `callback` e `instrumentacion` no cambian el
+    resultado y quedan fuera de la clave; un acierto se cuenta en la
+    instrumentación como "cache_aciertos". `huella_inv` es la
+    `huella_inventario` ya calculada de `inventario`, para no rehacerla en
+    cada consulta. Si el callback corta la corrida, el resultado parcial se
+    devuelve pero no se guarda.
+    """
+    optimizar = _funcion_motor(motor)
+    clave = _clave_si_cacheable(cache, motor, modelo, inventario, cantidad, parametros, huella_inv)
+    if clave is None:
+        return optimizar(modelo, inventario, cantidad, **parametros)
+
+    resultado = cache.obtener(clave)
+    if resultado is not None:
+        instrumentacion = parametros.get("instrumentacion")
+        if instrumentacion is not None:
+            instrumentacion.contar("cache_aciertos")
+        return resultado
+
+    callback = parametros.get("callback")
+    cortado = False
+    if callback is not None:
+        def vigilar(*args):
+            nonlocal cortado
+            cortado = cortado or bool(callback(*args))
+            return cortado
+        parametros["callback"] = vigilar
+
+    resultado = optimizar(modelo, inventario, cantidad, **parametros)
+    if not cortado:
+        cache.guardar(clave, resultado)
+    return resultado
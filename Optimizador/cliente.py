@@ -0,0 +1,153 @@
+# optimizador/cliente.py
+
+import http.client
+import json
+import select
+import socket
+import threading
+from dataclasses import asdict, is_dataclass
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+# Sólo biblioteca estándar: quien usa el servicio no carga numpy ni los motores
+
+# Rutas que se pueden repetir sin aplicar dos veces un cambio
+_REPETIBLES = {
+    ("GET", "/estado"), ("POST", "/optimizar"), ("POST", "/maximo"), ("POST", "/ranking"),
+    ("DELETE", "/sobrantes"), ("PUT", "/modelos"), ("DELETE", "/modelos"),
+}
+
+
+class ErrorServicio(Exception):
+    def __init__(self, estado: int, mensaje: str):
+        super().__init__(f"{estado}: {mensaje}")
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+class _ConexionUnix(http.client.HTTPConnection):
+    def __init__(self, ruta: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.ruta = ruta
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.ruta)
+
+
+def _cerrada(con: http.client.HTTPConnection) -> bool:
+    # El servicio no escribe sin un pedido: si el socket en reposo es legible, es un cierre
+    return con.sock is not None and bool(select.select([con.sock], [], [], 0)[0])
+
+
+class ClienteServicio:
+    """
+    Cliente del servicio de `optimizador.servicio`. `direccion` es
+    "http://host:puerto" o "unix:/ruta/al/socket". Reusa una conexión
+    persistente (protegida con un lock, así que se puede compartir entre
+    hilos) y reconecta si el servicio la cerró. Un pedido que se cae a mitad
+    de camino se repite sólo en las rutas repetibles: en POST /sobrantes y
+    POST /confirmar no se sabe si el servicio llegó a aplicarlo, así que el
+    error se propaga (antes de mandarlos se descarta una conexión ya cerrada).
+    """
+    def __init__(self, direccion: str, timeout: float = 600.0):
+        self.direccion = direccion
+        self.timeout = timeout
+        self._con: Optional[http.client.HTTPConnection] = None
+        self._lock = threading.Lock()
+
+    def _conectar(self) -> http.client.HTTPConnection:
+        if self.direccion.startswith("unix:"):
+            return _ConexionUnix(self.direccion[len("unix:"):], self.timeout)
+        partes = urlsplit(self.direccion)
+        return http.client.HTTPConnection(partes.hostname or "127.0.0.1", partes.port or 8765, timeout=self.timeout)
+
+    def _pedir(self, metodo: str, ruta: str, cuerpo: Optional[Dict] = None):
+        datos = json.dumps(cuerpo or {}, ensure_ascii=False).encode("utf-8")
+        cabeceras = {"Content-Type": "application/json"}
+        repetible = (metodo, ruta) in _REPETIBLES
+        with self._lock:
+            if self._con is not None and not repetible and _cerrada(self._con):
+                self._con.close()
+                self._con = None
+            for intento in (1, 2):
+                if self._con is None:
+                    self._con = self._conectar()
+                try:
+                    self._con.request(metodo, ruta, body=datos, headers=cabeceras)
+                    respuesta = self._con.getresponse()
+                    estado, texto = respuesta.status, respuesta.read()
+                    break
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    self._con.close()
+                    self._con = None
+                    if intento == 2 or not repetible:
+                        raise
+        resultado = json.loads(texto) if texto else None
+        if estado != 200:
+            raise ErrorServicio(estado, (resultado or {}).get("error", ""))
+        return resultado
+
+    def cerrar(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+    # ── Consultas ─────────────────────────────────────────────────────
+
+    def estado(self) -> Dict:
+        return self._pedir("GET", "/estado")
+
+    def optimizar(
+        self,
+        modelo_id: int,
+        cantidad: int,
+        color: Optional[str] = None,
+        motor: str = "clasico",
+        sin_cache: bool = False,
+        **parametros
+    ) -> List[Dict]:
+        """Como `optimizar_cacheado` sobre los sobrantes (de `color`) del servicio."""
+        return self._pedir("POST", "/optimizar", {
+            "modelo_id": modelo_id, "cantidad": cantidad, "color": color,
+            "motor": motor, "sin_cache": sin_cache, "parametros": parametros,
+        })
+
+    def maximo(self, modelo_id: int, color: Optional[str] = None) -> Dict[str, int]:
+        """Como `cantidad_maxima`: unidades fabricables por color."""
+        return self._pedir("POST", "/maximo", {"modelo_id": modelo_id, "color": color})
+
+    def ranking(self, color: Optional[str] = None, limite: Optional[int] = None) -> List[Dict]:
+        """Como `ranking_modelos`: el catálogo ordenado por unidades fabricables."""
+        return self._pedir("POST", "/ranking", {"color": color, "limite": limite})
+
+    # ── Ediciones ─────────────────────────────────────────────────────
+
+    def agregar_sobrantes(self, piezas: Iterable) -> List[int]:
+        """Agrega sobrantes (dicts o PiezaInventario); devuelve sus ids."""
+        filas = [asdict(p) if is_dataclass(p) else dict(p) for p in piezas]
+        return self._pedir("POST", "/sobrantes", {"piezas": filas})["ids"]
+
+    def eliminar_sobrantes(self, ids: Iterable[int]) -> int:
+        return self._pedir("DELETE", "/sobrantes", {"ids": [int(i) for i in ids]})["eliminados"]
+
+    def guardar_modelo(self, modelo) -> int:
+        """Alta o reemplazo de un modelo (dict o ModeloMueble)."""
+        return self._pedir("PUT", "/modelos", asdict(modelo) if is_dataclass(modelo) else dict(modelo))["id"]
+
+    def eliminar_modelos(self, ids: Iterable[int]) -> int:
+        return self._pedir("DELETE", "/modelos", {"ids": [int(i) for i in ids]})["eliminados"]
+
+    def confirmar(
+        self,
+        modelo_id: int,
+        resultado: List[Dict],
+        lado_minimo: Optional[float] = None,
+        kerf: Optional[float] = None
+    ) -> Dict[str, int]:
+        """Como `confirmar_plan` en la base del servicio: tableros descontados y recortes agregados."""
+        return self._pedir("POST", "/confirmar", {
+            "modelo_id": modelo_id, "resultado": resultado, "lado_minimo": lado_minimo, "kerf": kerf,
+        })
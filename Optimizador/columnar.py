@@ -0,0 +1,230 @@
+# optimizador/columnar.py
+
+import json
+import os
+from collections.abc import Sequence
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from optimizador.models import ArreglosInventario, Inventario, ModeloMueble, PiezaInventario, PiezaModelo
+
+# Formato columnar opcional para inventario y modelos: Arrow IPC (sin
+# comprimir, se lee con memory map y las columnas numéricas no se copian) o
+# Parquet (comprimido, para guardar o mover). pyarrow se importa al leer o
+# escribir: sin él el resto del paquete funciona igual.
+
+EXTENSIONES = {".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow", ".parquet": "parquet"}
+
+
+def formato(ruta: str) -> str:
+    """"arrow" o "parquet" según la extensión de `ruta`."""
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension not in EXTENSIONES:
+        raise ValueError(f"Extensión no reconocida en {ruta}: usa {', '.join(sorted(EXTENSIONES))}")
+    return EXTENSIONES[extension]
+
+
+def _escribir(tabla, ruta: str):
+    import pyarrow as pa
+
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    if formato(ruta) == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(tabla, temporal, compression="zstd")
+    else:
+        with pa.OSFile(temporal, "wb") as f, pa.ipc.new_file(f, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    # Como la caché: un lector nunca ve un archivo a medias
+    os.replace(temporal, ruta)
+
+
+def _leer(ruta: str, color: Optional[str] = None):
+    import pyarrow as pa
+
+    if formato(ruta) == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(ruta, filters=[("color", "=", color)] if color is not None else None, memory_map=True)
+    # El memory map queda vivo mientras haya arreglos que apunten a él
+    tabla = pa.ipc.open_file(pa.memory_map(ruta, "r")).read_all()
+    if color is not None:
+        import pyarrow.compute as pc
+        tabla = tabla.filter(pc.equal(tabla["color"], color))
+    return tabla
+
+
+class ColumnaTexto(Sequence):
+    """
+    Columna de texto de Arrow vista como secuencia de str. Un elemento
+    suelto se convierte al pedirlo; la lista completa, recién la primera vez
+    que se recorre. Los motores sólo leen los códigos de los sobrantes que
+    usan, así que casi nunca hace falta convertirla entera.
+    """
+    __slots__ = ("_arreglo", "_lista")
+
+    def __init__(self, arreglo):
+        self._arreglo = arreglo
+        self._lista: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._arreglo)
+
+    def __getitem__(self, i):
+        if self._lista is not None or isinstance(i, slice):
+            return self.lista()[i]
+        return self._arreglo[i].as_py()
+
+    def __iter__(self):
+        return iter(self.lista())
+
+    def lista(self) -> List[str]:
+        if self._lista is None:
+            self._lista = self._arreglo.to_pylist()
+        return self._lista
+
+    def tomar(self, indices: List[int]) -> "ColumnaTexto":
+        return ColumnaTexto(self._arreglo.take(indices))
+
+
+def _textos(columna) -> List[str]:
+    """Una columna de texto como lista; si viene con diccionario, los valores repetidos comparten el objeto."""
+    import pyarrow as pa
+
+    columna = columna.combine_chunks() if isinstance(columna, pa.ChunkedArray) else columna
+    if pa.types.is_dictionary(columna.type):
+        valores = columna.dictionary.to_pylist()
+        return [valores[i] for i in columna.indices.to_numpy(zero_copy_only=False).tolist()]
+    return columna.to_pylist()
+
+
+def _numeros(columna, dtype) -> np.ndarray:
+    # Sin nulos y en un solo bloque, to_numpy no copia: apunta al memory map
+    arreglo = columna.to_numpy()
+    return arreglo if arreglo.dtype == dtype else arreglo.astype(dtype)
+
+
+# ── Inventario ────────────────────────────────────────────────────────
+
+def tabla_inventario(inventario: Inventario):
+    """El inventario como tabla de Arrow; el color va con diccionario y el espesor vacío como NaN."""
+    import pyarrow as pa
+
+    if not isinstance(inventario, ArreglosInventario):
+        inventario = ArreglosInventario.desde_piezas(inventario)
+    return pa.table({
+        "codigo": pa.array(inventario.codigo, type=pa.string()),
+        "color": pa.array(inventario.color, type=pa.string()).dictionary_encode(),
+        "ancho": pa.array(np.asarray(inventario.ancho, dtype=float)),
+        "largo": pa.array(np.asarray(inventario.largo, dtype=float)),
+        "espesor": pa.array(np.asarray(inventario.espesor, dtype=float)),
+        "cantidad": pa.array(np.asarray(inventario.cantidad, dtype=np.int64)),
+    })
+
+
+def escribir_inventario(inventario: Inventario, ruta: str):
+    _escribir(tabla_inventario(inventario), ruta)
+
+
+def leer_inventario(ruta: str, color: Optional[str] = None) -> ArreglosInventario:
+    """
+    Inventario de un archivo columnar, listo para los motores. Las columnas
+    numéricas salen del memory map sin copiarse, el color se arma desde su
+    diccionario (los valores repetidos comparten el objeto) y los códigos
+    quedan en Arrow hasta que se lean (`ColumnaTexto`). Con `color`, sólo
+    los sobrantes de ese color.
+    """
+    tabla = _leer(ruta, color)
+    return ArreglosInventario(
+        codigo=ColumnaTexto(tabla["codigo"].combine_chunks()),
+        color=_textos(tabla["color"]),
+        ancho=_numeros(tabla["ancho"], np.float64),
+        largo=_numeros(tabla["largo"], np.float64),
+        espesor=_numeros(tabla["espesor"], np.float64),
+        cantidad=_numeros(tabla["cantidad"], np.int64),
+    )
+
+
+# ── Modelos ───────────────────────────────────────────────────────────
+
+def tabla_modelos(modelos: Iterable[ModeloMueble]):
+    """Una fila por pieza con el id y el nombre de su modelo; un modelo sin piezas deja una fila sin código."""
+    import pyarrow as pa
+
+    filas: Dict[str, list] = {c: [] for c in ("modelo_id", "modelo", "codigo", "ancho", "largo", "espesor", "cantidad")}
+    for m in modelos:
+        for p in m.piezas or [None]:
+            filas["modelo_id"].append(m.id)
+            filas["modelo"].append(m.nombre)
+            filas["codigo"].append(p.codigo if p else None)
+            filas["ancho"].append(p.ancho if p else None)
+            filas["largo"].append(p.largo if p else None)
+            filas["espesor"].append(p.espesor if p else None)
+            filas["cantidad"].append(p.cantidad if p else None)
+    return pa.table({
+        "modelo_id": pa.array(filas["modelo_id"], type=pa.int64()),
+        "modelo": pa.array(filas["modelo"], type=pa.string()).dictionary_encode(),
+        "codigo": pa.array(filas["codigo"], type=pa.string()),
+        "ancho": pa.array(filas["ancho"], type=pa.float64()),
+        "largo": pa.array(filas["largo"], type=pa.float64()),
+        "espesor": pa.array(filas["espesor"], type=pa.float64()),
+        "cantidad": pa.array(filas["cantidad"], type=pa.int64()),
+    })
+
+
+def escribir_modelos(modelos: Iterable[ModeloMueble], ruta: str):
+    _escribir(tabla_modelos(modelos), ruta)
+
+
+def leer_modelos(ruta: str) -> List[ModeloMueble]:
+    """Modelos de un archivo columnar, con las piezas en el orden guardado."""
+    tabla = _leer(ruta)
+    modelos: Dict[int, ModeloMueble] = {}
+    columnas = zip(*(tabla[c].to_pylist() for c in ("modelo_id", "modelo", "codigo", "ancho", "largo", "espesor", "cantidad")))
+    for modelo_id, nombre, codigo, ancho, largo, espesor, cantidad in columnas:
+        modelo = modelos.get(modelo_id)
+        if modelo is None:
+            modelo = modelos[modelo_id] = ModeloMueble(id=modelo_id, nombre=nombre, piezas=[])
+        if codigo is not None:
+            modelo.piezas.append(PiezaModelo(codigo=codigo, ancho=ancho, largo=largo, espesor=espesor, cantidad=cantidad))
+    return list(modelos.values())
+
+
+# ── Conversión ────────────────────────────────────────────────────────
+
+def convertir_json(
+    destino: str,
+    inventario_json: Optional[str] = None,
+    modelos_json: Optional[str] = None,
+    formato_salida: str = "arrow"
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Convierte inventario.json y/o modelos.json (el formato de la versión
+    anterior) a archivos columnares en `destino`. Devuelve sus rutas.
+    """
+    os.makedirs(destino, exist_ok=True)
+    rutas: List[Optional[str]] = [None, None]
+    if inventario_json:
+        with open(inventario_json, "r", encoding="utf-8") as f:
+            sobrantes = json.load(f)
+        rutas[0] = os.path.join(destino, f"inventario.{formato_salida}")
+        campos = ("codigo", "ancho", "largo", "color", "espesor", "cantidad")
+        escribir_inventario([PiezaInventario(*(p.get(c) for c in campos)) for p in sobrantes], rutas[0])
+    if modelos_json:
+        with open(modelos_json, "r", encoding="utf-8") as f:
+            modelos = json.load(f)
+        rutas[1] = os.path.join(destino, f"modelos.{formato_salida}")
+        escribir_modelos([
+            ModeloMueble(id=m["id"], nombre=m["nombre"], piezas=[
+                PiezaModelo(p["codigo"], p["ancho"], p["largo"], p.get("espesor"), p["cantidad"]) for p in m["piezas"]
+            ])
+            for m in modelos
+        ], rutas[1])
+    return rutas[0], rutas[1]
+
+
+def exportar_almacen(almacen, destino: str, formato_salida: str = "arrow") -> Tuple[str, str]:
+    """Sobrantes y modelos de la base (`Almacen`) a archivos columnares en `destino`."""
+    os.makedirs(destino, exist_ok=True)
+    inventario = os.path.join(destino, f"inventario.{formato_salida}")
+    modelos = os.path.join(destino, f"modelos.{formato_salida}")
+    escribir_inventario(almacen.sobrantes(), inventario)
+    escribir_modelos(almacen.modelos(), modelos)
+    return inventario, modelos
@@ -0,0 +1,62 @@
+# optimizador/encaje.py
+
+from typing import List, Tuple, Union
+import numpy as np
+from optimizador.models import ArreglosInventario, PiezaInventario, PiezaModelo
+
+
+def _espesores(items) -> np.ndarray:
+    # Un espesor vacío (None o 0) se trata como comodín
+    return np.array([i.espesor if i.espesor else np.nan for i in items], dtype=float)
+
+
+def columnas_medidas(items) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ancho, largo, espesor) de piezas o tableros como arreglos; un espesor vacío queda en NaN."""
+    if isinstance(items, ArreglosInventario):
+        espesor = np.where(items.espesor == 0, np.nan, items.espesor)
+        return items.ancho, items.largo, espesor
+    return (
+        np.array([i.ancho for i in items], dtype=float),
+        np.array([i.largo for i in items], dtype=float),
+        _espesores(items),
+    )
+
+
+class MatrizEncaje:
+    """
+    Factibilidad tipo de pieza × tablero, calculada una sola vez por corrida.
+
+    `normal` y `rotada` indican si la pieza entra en cada orientación; `valida`
+    además exige espesores compatibles. Los tableros pueden venir como lista
+    de objetos o ya en columnas (ArreglosInventario). Las consultas escalares
+    usan listas de Python porque indexar arreglos de NumPy elemento a elemento
+    es más lento.
+
+    El motor clásico la arma sobre las columnas del índice, así que `tablero`
+    es la posición en el índice, y pregunta `cabe` antes de cortar cada tipo
+    en un sobrante. El recocido la arma sobre sus tableros y usa `destinos`
+    para el primer ajuste, para sortear sólo movimientos válidos y para la
+    cota inferior de energía (un tipo sin destinos nunca se asigna).
+    """
+    def __init__(
+        self,
+        piezas: List[PiezaModelo],
+        tableros: Union[List[PiezaInventario], ArreglosInventario]
+    ):
+        p_ancho, p_largo, p_esp = (c[:, None] for c in columnas_medidas(piezas))
+        t_ancho, t_largo, t_esp = (c[None, :] for c in columnas_medidas(tableros))
+
+        self.normal = (p_ancho <= t_ancho) & (p_largo <= t_largo)
+        self.rotada = (p_largo <= t_ancho) & (p_ancho <= t_largo)
+        self.espesor = np.isnan(p_esp) | np.isnan(t_esp) | np.isclose(p_esp, t_esp)
+        self.valida = (self.normal | self.rotada) & self.espesor
+
+        self._filas = self.valida.tolist()
+        self._destinos = [np.flatnonzero(fila).tolist() for fila in self.valida]
+
+    def cabe(self, tipo: int, tablero: int) -> bool:
+        return self._filas[tipo][tablero]
+
+    def destinos(self, tipo: int) -> List[int]:
+        """Índices de los tableros donde el tipo de pieza puede ir, en orden."""
+        return self._destinos[tipo]
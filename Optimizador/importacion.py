@@ -0,0 +1,197 @@
+# optimizador/importacion.py
+
+import csv
+from dataclasses import dataclass, field
+from typing import IO, Dict, Iterator, List, Tuple, Union
+import numpy as np
+import pandas as pd
+from optimizador.almacen import Almacen
+
+COLUMNAS = ("codigo", "ancho", "largo", "color", "espesor", "cantidad")
+TAMANO_BLOQUE = 20_000
+MAX_ERRORES = 1_000   # Más allá de esto sólo se cuentan
+MUESTRA_SEPARADOR = 1024  # Bytes del inicio del CSV para deducir el separador
+
+Origen = Union[str, IO]
+
+
+@dataclass
+class InformeImportacion:
+    leidas: int = 0
+    validas: int = 0
+    agregadas: int = 0
+    fusionadas: int = 0
+    invalidas: int = 0
+    errores: List[Dict] = field(default_factory=list)
+
+    def anotar(self, errores: List[Dict]):
+        self.invalidas += len(errores)
+        self.errores.extend(errores[:max(0, MAX_ERRORES - len(self.errores))])
+
+
+def _es_excel(nombre: str) -> bool:
+    return nombre.lower().endswith((".xlsx", ".xlsm"))
+
+
+def _bloques_excel(origen: Origen, tamano: int) -> Iterator[pd.DataFrame]:
+    # openpyxl en modo lectura recorre la hoja sin cargarla entera
+    from openpyxl import load_workbook
+    libro = load_workbook(origen, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        columnas = ["" if c is None else str(c) for c in encabezado]
+        bloque = []
+        for fila in filas:
+            bloque.append(fila)
+            if len(bloque) == tamano:
+                yield pd.DataFrame(bloque, columns=columnas)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=columnas)
+    finally:
+        libro.close()
+
+
+def _separador(origen: Origen) -> str:
+    """
+    Separador del CSV deducido de su primer KB (coma si no se puede). Un
+    archivo abierto se deja en la posición en que estaba.
+    """
+    if isinstance(origen, str):
+        with open(origen, "rb") as f:
+            muestra = f.read(MUESTRA_SEPARADOR)
+    else:
+        posicion = origen.tell()
+        muestra = origen.read(MUESTRA_SEPARADOR)
+        origen.seek(posicion)
+    if isinstance(muestra, bytes):
+        muestra = muestra.decode("utf-8", errors="ignore")
+    # La última línea puede venir cortada
+    if "\n" in muestra:
+        muestra = muestra[:muestra.rindex("\n")]
+    try:
+        return csv.Sniffer().sniff(muestra, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def leer_bloques(origen: Origen, nombre: str, tamano: int = TAMANO_BLOQUE) -> Iterator[pd.DataFrame]:
+    """Bloques de a lo sumo `tamano` filas de un .xlsx o .csv, con todo como texto crudo."""
+    if _es_excel(nombre):
+        yield from _bloques_excel(origen, tamano)
+    else:
+        # Con el separador explícito pandas usa su lector en C, bloque por bloque
+        yield from pd.read_csv(origen, chunksize=tamano, dtype=str, keep_default_na=False, sep=_separador(origen))
+
+
+def _normalizar_columnas(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    faltantes = [c for c in COLUMNAS if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"El archivo debe contener las columnas: {', '.join(COLUMNAS)} (faltan: {', '.join(faltantes)})")
+    return df
+
+
+def _a_numero(columna: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Columna como float (NaN si no es número) y máscara de celdas vacías. La
+    conversión directa cubre casi todo; el texto sólo se limpia (espacios,
+    coma decimal) en las celdas que fallaron.
+    """
+    numero = pd.to_numeric(columna, errors="coerce").astype(float)
+    vacio = columna.isna()
+    fallo = numero.isna() & ~vacio
+    if fallo.any():
+        crudo = columna[fallo].astype(str).str.strip().str.replace(",", ".", regex=False)
+        vacio = vacio | (crudo == "").reindex(columna.index, fill_value=False)
+        numero[fallo] = pd.to_numeric(crudo, errors="coerce")
+    return numero, vacio
+
+
+def validar_bloque(df: pd.DataFrame, primera_fila: int) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    Convierte y valida un bloque con operaciones por columna. Devuelve las
+    filas válidas, ya tipadas, y un error por fila descartada con su número
+    de fila en el archivo (contando el encabezado como fila 1).
+    """
+    df = _normalizar_columnas(df)
+    motivos = pd.Series("", index=df.index)
+
+    def marcar(mascara, motivo):
+        nonlocal motivos
+        motivos = motivos.where(~mascara | (motivos != ""), motivo)
+
+    texto = {c: df[c].fillna("").astype(str).str.strip() for c in ("codigo", "color")}
+    marcar(texto["codigo"] == "", "codigo vacío")
+    marcar(texto["color"] == "", "color vacío")
+
+    numeros = {}
+    for c in ("ancho", "largo", "cantidad", "espesor"):
+        numero, vacio = _a_numero(df[c])
+        numeros[c] = numero
+        if c == "espesor":
+            # Espesor vacío es válido (comodín); lo que no es número, no
+            marcar(~vacio & numero.isna(), "espesor no numérico")
+            marcar(numero < 0, "espesor negativo")
+        else:
+            marcar(numero.isna(), f"{c} no numérico o vacío")
+            marcar(numero <= 0, f"{c} debe ser mayor que 0")
+    marcar(numeros["cantidad"] % 1 != 0, "cantidad debe ser entera")
+
+    malas = motivos != ""
+    errores = [
+        {"fila": primera_fila + int(i) + 2, "motivo": m}
+        for i, m in zip(np.flatnonzero(malas.to_numpy()), motivos[malas])
+    ]
+
+    buenas = ~malas
+    validas = pd.DataFrame({
+        "codigo": texto["codigo"][buenas].astype(object),
+        "ancho": numeros["ancho"][buenas].astype(float),
+        "largo": numeros["largo"][buenas].astype(float),
+        "color": texto["color"][buenas].astype(object),
+        "espesor": numeros["espesor"][buenas].astype(float),
+        "cantidad": numeros["cantidad"][buenas].astype(np.int64),
+    })
+    return validas, errores
+
+
+def consolidar(df: pd.DataFrame) -> pd.DataFrame:
+    """Suma `cantidad` de las filas con igual código, medidas, color y espesor."""
+    return (
+        df.groupby(["codigo", "ancho", "largo", "color", "espesor"], dropna=False, sort=False)["cantidad"]
+        .sum()
+        .reset_index()
+    )
+
+
+def importar_inventario(
+    origen: Origen,
+    nombre: str,
+    almacen: Almacen,
+    tamano_bloque: int = TAMANO_BLOQUE
+) -> InformeImportacion:
+    """
+    Importa un .xlsx o .csv por bloques: cada bloque se valida, se consolida y
+    se fusiona con el inventario en su propia transacción, así que la memoria
+    queda acotada por el bloque. Las filas inválidas se informan y no cortan
+    la importación; la falta de columnas sí (ValueError).
+    """
+    informe = InformeImportacion()
+    for bloque in leer_bloques(origen, nombre, tamano_bloque):
+        validas, errores = validar_bloque(bloque, informe.leidas)
+        informe.leidas += len(bloque)
+        informe.validas += len(validas)
+        informe.anotar(errores)
+
+        filas = consolidar(validas)
+        # NaN → None para que SQLite guarde NULL
+        filas["espesor"] = filas["espesor"].astype(object).where(filas["espesor"].notna(), None)
+        agregadas, _ = almacen.fusionar_sobrantes(filas[list(COLUMNAS)].itertuples(index=False, name=None))
+        informe.agregadas += agregadas
+        # Repetidas dentro del archivo o ya presentes en el inventario
+        informe.fusionadas += len(validas) - agregadas
+    return informe
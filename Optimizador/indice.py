@@ -0,0 +1,243 @@
+# optimizador/indice.py
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from optimizador.models import ArreglosInventario, PiezaInventario
+
+
+def clave_espesor(espesor: Optional[float]) -> Optional[float]:
+    """Espesor como clave de grupo: uno vacío (None o 0) es comodín, igual que en MatrizEncaje."""
+    return float(espesor) if espesor else None
+
+
+class GrupoMedidas:
+    """
+    Rectángulos con stock de un (color, espesor), en cubetas por lado corto.
+    La usan el índice de sobrantes y los libres del motor de guillotina.
+
+    Cada cubeta guarda (largo, posición, área) ordenados por largo. Con el
+    lado corto fijo, el área crece con el largo, así que dentro de una
+    cubeta el sobrante de menor área donde entra la pieza sale con una
+    búsqueda binaria. `primero_que_cabe` recorre las cubetas de lado corto
+    suficiente de menor a mayor y corta cuando ni el mejor caso de la
+    siguiente (lado × max(lado, largo pedido)) mejora lo encontrado.
+
+    Costo: O(log m) por cubeta visitada. En el peor caso (muchos lados
+    cortos distintos, todos con largos que no alcanzan) se visitan todas
+    las cubetas de lado suficiente, O(c · log m) con c cubetas. Insertar y
+    quitar buscan en O(log m) pero corren los elementos de la cubeta
+    (O(tamaño de la cubeta)), y crear o vaciar una cubeta cuesta O(c).
+    Los largos y anchos de sobrantes se repiten mucho, así que c suele ser
+    chico frente a la cantidad de sobrantes.
+    """
+    __slots__ = ("lados", "cubetas")
+
+    def __init__(self):
+        self.lados: List[float] = []
+        self.cubetas: Dict[float, List[Tuple[float, int, float]]] = {}
+
+    def insertar(self, area: float, pos: int, corto: float, largo: float):
+        cubeta = self.cubetas.get(corto)
+        if cubeta is None:
+            insort(self.lados, corto)
+            cubeta = self.cubetas[corto] = []
+        insort(cubeta, (largo, pos, area))
+
+    def quitar(self, pos: int, corto: float, largo: float):
+        cubeta = self.cubetas[corto]
+        del cubeta[bisect_left(cubeta, (largo, pos))]
+        if not cubeta:
+            del self.cubetas[corto]
+            del self.lados[bisect_left(self.lados, corto)]
+
+    def primero_que_cabe(self, corto: float, largo: float) -> Optional[Tuple[float, int]]:
+        """(área, posición) del sobrante de menor área donde entra la pieza; a igual área, la menor posición."""
+        mejor = None
+        lados = self.lados
+        for i in range(bisect_left(lados, corto), len(lados)):
+            lado = lados[i]
+            if mejor is not None and lado * max(lado, largo) > mejor[0]:
+                break
+            cubeta = self.cubetas[lado]
+            if cubeta[-1][0] < largo:
+                continue
+            _, pos, area = cubeta[bisect_left(cubeta, (largo, -1))]
+            if mejor is None or (area, pos) < mejor:
+                mejor = (area, pos)
+        return mejor
+
+
+class InventoryIndex:
+    """
+    Índice de sobrantes agrupados por (color, espesor).
+
+    Una pieza entra rotada o no si y sólo si su lado corto y su lado largo
+    no superan los del tablero, por eso cada sobrante guarda sus lados
+    ordenados y cada grupo (`GrupoMedidas`) lo ubica por lado corto y, dentro de
+    él, por lado largo: "el tablero más chico donde entra una pieza de w×h
+    en cualquier orientación" sale con búsquedas binarias por cubeta. Los datos se guardan en columnas y las cantidades se
+    descuentan como enteros en el índice, sin tocar el inventario original;
+    un sobrante sin stock sale de su grupo.
+    """
+    def __init__(self, inventario: Union[List[PiezaInventario], ArreglosInventario]):
+        if not isinstance(inventario, ArreglosInventario):
+            inventario = ArreglosInventario.desde_piezas(inventario)
+        n = len(inventario)
+
+        # Los códigos sólo se leen al armar la salida: una columna que no es
+        # lista (la perezosa de Arrow) se comparte y se copia recién al agregar
+        codigo = inventario.codigo
+        self.codigo: List[str] = list(codigo) if isinstance(codigo, list) else codigo
+        self.color: List[str] = list(inventario.color)
+        self.ancho: List[float] = inventario.ancho.tolist()
+        self.largo: List[float] = inventario.largo.tolist()
+        self.espesor: List[Optional[float]] = [None if e != e else e for e in inventario.espesor.tolist()]
+        self.area: List[float] = (inventario.ancho * inventario.largo).tolist()
+        self._corto: List[float] = np.minimum(inventario.ancho, inventario.largo).tolist()
+        self._largo: List[float] = np.maximum(inventario.ancho, inventario.largo).tolist()
+        self.cantidades: List[int] = [0] * n
+        self._grupos: Dict[str, Dict[Optional[float], GrupoMedidas]] = {}
+        self._por_clave: Optional[Dict[tuple, List[int]]] = None
+
+        # Carga inicial ordenada por (área, posición): dentro de cada cubeta eso es
+        # orden por (largo, posición), así que se agrega al final de cada una
+        cantidades = inventario.cantidad.tolist()
+        cubetas_de: Dict[tuple, Dict[float, list]] = {}
+        for pos in np.lexsort((np.arange(n), inventario.ancho * inventario.largo)).tolist():
+            if cantidades[pos] > 0:
+                self.cantidades[pos] = cantidades[pos]
+                clave = (self.color[pos], self.espesor[pos])
+                cubetas = cubetas_de.get(clave)
+                if cubetas is None:
+                    cubetas = cubetas_de[clave] = self._grupo(pos).cubetas
+                corto = self._corto[pos]
+                if corto not in cubetas:
+                    cubetas[corto] = []
+                cubetas[corto].append((self._largo[pos], pos, self.area[pos]))
+        for por_espesor in self._grupos.values():
+            for grupo in por_espesor.values():
+                grupo.lados = sorted(grupo.cubetas)
+
+    def __len__(self) -> int:
+        return len(self.codigo)
+
+    def _grupo(self, pos: int) -> GrupoMedidas:
+        por_espesor = self._grupos.setdefault(self.color[pos], {})
+        return por_espesor.setdefault(clave_espesor(self.espesor[pos]), GrupoMedidas())
+
+    def sobrante(self, pos: int) -> PiezaInventario:
+        """El sobrante en `pos` con su cantidad actual."""
+        return PiezaInventario(
+            codigo=self.codigo[pos],
+            ancho=self.ancho[pos],
+            largo=self.largo[pos],
+            color=self.color[pos],
+            espesor=self.espesor[pos],
+            cantidad=self.cantidades[pos],
+        )
+
+    def columnas(self) -> ArreglosInventario:
+        return ArreglosInventario(
+            codigo=list(self.codigo) if isinstance(self.codigo, list) else self.codigo,
+            color=list(self.color),
+            ancho=np.array(self.ancho, dtype=float),
+            largo=np.array(self.largo, dtype=float),
+            espesor=np.array([np.nan if e is None else e for e in self.espesor], dtype=float),
+            cantidad=np.array(self.cantidades, dtype=np.int64),
+        )
+
+    def agregar(self, pieza: PiezaInventario) -> int:
+        """Suma un sobrante nuevo al índice y devuelve su posición."""
+        pos = len(self.codigo)
+        if not isinstance(self.codigo, list):
+            self.codigo = list(self.codigo)
+        self.codigo.append(pieza.codigo)
+        self.color.append(pieza.color)
+        self.ancho.append(pieza.ancho)
+        self.largo.append(pieza.largo)
+        self.espesor.append(pieza.espesor)
+        self.area.append(pieza.ancho * pieza.largo)
+        self._corto.append(min(pieza.ancho, pieza.largo))
+        self._largo.append(max(pieza.ancho, pieza.largo))
+        self.cantidades.append(0)
+        if self._por_clave is not None:
+            self._por_clave.setdefault(self._clave(pos), []).append(pos)
+        self.reponer(pos, pieza.cantidad)
+        return pos
+
+    def consumir(self, pos: int, n: int = 1):
+        if n > self.cantidades[pos]:
+            raise ValueError(f"Sobrante {self.codigo[pos]}: sólo quedan {self.cantidades[pos]}")
+        self.cantidades[pos] -= n
+        if n and self.cantidades[pos] == 0:
+            self._grupo(pos).quitar(pos, self._corto[pos], self._largo[pos])
+
+    def reponer(self, pos: int, n: int = 1):
+        if n <= 0:
+            return
+        if self.cantidades[pos] == 0:
+            self._grupo(pos).insertar(self.area[pos], pos, self._corto[pos], self._largo[pos])
+        self.cantidades[pos] += n
+
+    def colores(self) -> List[str]:
+        return sorted(self._grupos)
+
+    def _candidatos(self, color: str, espesor: Optional[float]) -> Iterator[GrupoMedidas]:
+        por_espesor = self._grupos.get(color, {})
+        clave = clave_espesor(espesor)
+        if clave is None:
+            yield from por_espesor.values()
+            return
+        for k in (clave, None):
+            if k in por_espesor:
+                yield por_espesor[k]
+
+    def mejor_ajuste(
+        self, color: str, espesor: Optional[float], ancho: float, largo: float
+    ) -> Optional[int]:
+        """Posición del sobrante con stock de menor área donde entra la pieza, o None."""
+        corto, largo = min(ancho, largo), max(ancho, largo)
+        mejor = None
+        for grupo in self._candidatos(color, espesor):
+            encontrado = grupo.primero_que_cabe(corto, largo)
+            if encontrado is not None and (mejor is None or encontrado < mejor):
+                mejor = encontrado
+        return mejor[1] if mejor is not None else None
+
+    def restantes(self) -> List[PiezaInventario]:
+        """Inventario con las cantidades actuales, sin los sobrantes agotados."""
+        return [self.sobrante(pos) for pos, c in enumerate(self.cantidades) if c > 0]
+
+    # ── Cambios por clave (código, color, ancho, largo, espesor) ──────
+
+    def _clave(self, pos: int) -> tuple:
+        return (self.codigo[pos], self.color[pos], self.ancho[pos], self.largo[pos], self.espesor[pos])
+
+    def posiciones(self, clave: tuple) -> List[int]:
+        """Posiciones de los sobrantes con esa clave, en orden; el mapa se arma la primera vez."""
+        if self._por_clave is None:
+            self._por_clave = {}
+            for pos in range(len(self.codigo)):
+                self._por_clave.setdefault(self._clave(pos), []).append(pos)
+        return self._por_clave.get(clave, [])
+
+    def descontar(self, clave: tuple, n: int):
+        """Descuenta `n` tableros de los sobrantes con esa clave, del primero en adelante."""
+        posiciones = self.posiciones(clave)
+        if sum(self.cantidades[pos] for pos in posiciones) < n:
+            raise ValueError(f"Sobrante {clave[0]} ({clave[1]}): no quedan {n} tableros")
+        for pos in posiciones:
+            tomar = min(n, self.cantidades[pos])
+            self.consumir(pos, tomar)
+            n -= tomar
+            if n == 0:
+                break
+
+    def sumar(self, pieza: PiezaInventario) -> int:
+        """Repone en el sobrante con la misma clave o, si no hay, lo agrega; devuelve su posición."""
+        posiciones = self.posiciones((pieza.codigo, pieza.color, pieza.ancho, pieza.largo, pieza.espesor))
+        if posiciones:
+            self.reponer(posiciones[0], pieza.cantidad)
+            return posiciones[0]
+        return self.agregar(pieza)
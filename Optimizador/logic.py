@@ -1,123 +1,335 @@
 # optimizador/logic_nivel2 V5.0 
 
-from copy import deepcopy
+import logging
+import time
 from math import floor
-from typing import List, Dict
-from optimizador.models import PiezaInventario, ModeloMueble, PiezaModelo
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple
+from optimizador.models import ArreglosInventario, Inventario, ModeloMueble, colores_de, separar_por_color
+from optimizador.encaje import MatrizEncaje
+from optimizador.indice import InventoryIndex
+from optimizador.metricas import NULA, Instrumentacion
 
-def optimizar_por_color(
+logger = logging.getLogger(__name__)
+
+# Por debajo de esto el costo de levantar procesos supera al de optimizar
+MIN_SOBRANTES_PARALELO = 200
+
+
+def _planear_unidad(
     modelo: ModeloMueble,
-    inventario: List[PiezaInventario],
-    cantidad_deseada: int,
-    debug: bool = True
-) -> List[Dict]:
+    indice: InventoryIndex,
+    encaje: MatrizEncaje,
+    color: str,
+    debug: bool,
+    instrumentacion: Instrumentacion = NULA
+) -> Optional[Tuple[List[Tuple[int, int, int, int]], Dict[int, int]]]:
     """
-    Optimización PRO V2 con modo DEBUG.
+    Plan de corte de una unidad: en cada paso toma el sobrante con stock más
+    chico donde entra alguna pieza pendiente, coloca ahí lo que entre y
+    descuenta una copia del índice. Devuelve el plan como tuplas
+    (sobrante, tipo de pieza, cantidad, tablero), donde `tablero` numera las
+    copias usadas en la unidad, y cuántas copias de cada sobrante consumió;
+    si la unidad no se completa repone lo consumido y devuelve None.
     """
-    resultados = []
-    colores = sorted({p.color for p in inventario})
+    plan = []
+    usos = {}
+    paso = 0
+    piezas_restantes = [(j, req.cantidad) for j, req in enumerate(modelo.piezas) if req.cantidad > 0]
+    medir = instrumentacion.activa
+
+    while piezas_restantes:
+        if medir:
+            inicio = time.perf_counter()
+        candidatos = [
+            indice.mejor_ajuste(color, modelo.piezas[j].espesor, modelo.piezas[j].ancho, modelo.piezas[j].largo)
+            for j, _ in piezas_restantes
+        ]
+        if medir:
+            instrumentacion.sumar_tiempo("busqueda_ajuste", time.perf_counter() - inicio)
+            instrumentacion.contar("consultas_ajuste", len(piezas_restantes))
+        candidatos = [k for k in candidatos if k is not None]
+        if not candidatos:
+            if debug:
+                logger.debug("No hay más sobrantes disponibles.")
+            for k, n in usos.items():
+                indice.reponer(k, n)
+            return None
 
-    for color in colores:
-        inv_color = [deepcopy(p) for p in inventario if p.color == color]
-        inv_color.sort(key=lambda p: (p.espesor, p.largo * p.ancho))
+        k = min(candidatos, key=lambda k: (indice.area[k], k))
+        area_disponible = indice.area[k]
 
-        fabricables = 0
-        piezas_usadas = []
+        if debug:
+            logger.debug("Usando sobrante: %s - Área: %s mm²", indice.codigo[k], indice.area[k])
 
-        for n_fabricado in range(cantidad_deseada):
-            lote = []
-            piezas_restantes = deepcopy(modelo.piezas)
+        nuevas_restantes = []
+        colocadas_antes = len(plan)
+
+        for j, cantidad in piezas_restantes:
+            req = modelo.piezas[j]
+            pieza_area = req.ancho * req.largo
+
+            if pieza_area > area_disponible or not encaje.cabe(j, k):
+                nuevas_restantes.append((j, cantidad))
+                continue
+
+            # Una pieza sin área (ancho o largo 0) no ocupa lugar: entran todas
+            piezas_a_colocar = min(cantidad, floor(area_disponible / pieza_area)) if pieza_area > 0 else cantidad
+
+            if piezas_a_colocar <= 0:
+                nuevas_restantes.append((j, cantidad))
+                continue
+
+            plan.append((k, j, piezas_a_colocar, paso))
+            area_disponible -= piezas_a_colocar * pieza_area
 
             if debug:
-                print(f"\n--- Fabricando unidad {n_fabricado+1} ---")
-
-            while piezas_restantes:
-                inv_color = [p for p in inv_color if p.cantidad > 0]
-                if not inv_color:
-                    if debug:
-                        print("No hay más sobrantes disponibles.")
-                    lote = None
-                    break
-
-                sobrante = inv_color.pop(0)
-                sobrante_area_total = sobrante.largo * sobrante.ancho
-                area_disponible = sobrante_area_total
-
-                if debug:
-                    print(f"\nUsando sobrante: {sobrante.codigo} - Área: {sobrante_area_total} mm²")
-
-                tablero_piezas = []
-                piezas_colocadas = []
-                nuevas_restantes = []
-
-                for req in piezas_restantes:
-                    pieza_area = req.ancho * req.largo
-
-                    if pieza_area > area_disponible:
-                        nuevas_restantes.append(req)
-                        continue
-
-                    fits_normal = sobrante.ancho >= req.ancho and sobrante.largo >= req.largo
-                    fits_rotated = sobrante.ancho >= req.largo and sobrante.largo >= req.ancho
-
-                    if not (fits_normal or fits_rotated):
-                        nuevas_restantes.append(req)
-                        continue
-
-                    piezas_a_colocar = min(req.cantidad, floor(area_disponible / pieza_area))
-
-                    if piezas_a_colocar <= 0:
-                        nuevas_restantes.append(req)
-                        continue
-
-                    tablero_piezas.append({
-                        "codigo": sobrante.codigo,
-                        "color": sobrante.color,
-                        "largo": sobrante.largo,
-                        "ancho": sobrante.ancho,
-                        "espesor": sobrante.espesor,
-                        "cantidad_req": piezas_a_colocar,
-                        "pieza_modelo_codigo": req.codigo,
-                    })
-
-                    area_disponible -= piezas_a_colocar * pieza_area
-
-                    if debug:
-                        print(f"Colocadas {piezas_a_colocar} piezas del modelo {req.codigo}.")
-                        print(f"Área restante en sobrante: {area_disponible} mm².")
-
-                    if req.cantidad > piezas_a_colocar:
-                        nuevas_restantes.append(PiezaModelo(
-                            codigo=req.codigo,
-                            ancho=req.ancho,
-                            largo=req.largo,
-                            espesor=req.espesor,
-                            cantidad=req.cantidad - piezas_a_colocar
-                        ))
-
-                if tablero_piezas:
-                    lote.extend(tablero_piezas)
-                    sobrante.cantidad -= 1
-                    piezas_restantes = nuevas_restantes
-                    if debug:
-                        print(f"Sobrante {sobrante.codigo} agotado o lleno.")
-                else:
-                    break
-
-            if lote is None:
+                logger.debug("Colocadas %d piezas del modelo %s. Área restante en sobrante: %s mm².",
+                             piezas_a_colocar, req.codigo, area_disponible)
+
+            if cantidad > piezas_a_colocar:
+                nuevas_restantes.append((j, cantidad - piezas_a_colocar))
+
+        if medir:
+            instrumentacion.contar("colocaciones_intentadas", len(piezas_restantes))
+            instrumentacion.contar("colocaciones_aceptadas", len(plan) - colocadas_antes)
+
+        # El sobrante elegido admite al menos una pieza pendiente
+        indice.consumir(k)
+        usos[k] = usos.get(k, 0) + 1
+        paso += 1
+        piezas_restantes = nuevas_restantes
+
+    return plan, usos
+
+
+def _armar_lote(modelo: ModeloMueble, indice: InventoryIndex, plan: List[Tuple[int, int, int, int]]) -> List[Dict]:
+    return [
+        {
+            "codigo": indice.codigo[k],
+            "color": indice.color[k],
+            "largo": indice.largo[k],
+            "ancho": indice.ancho[k],
+            "espesor": indice.espesor[k],
+            "cantidad_req": n,
+            "pieza_modelo_codigo": modelo.piezas[j].codigo,
+            "tablero": t,
+        }
+        for k, j, n, t in plan
+    ]
+
+
+def optimizar_color(
+    modelo: ModeloMueble,
+    indice: InventoryIndex,
+    encaje: MatrizEncaje,
+    color: str,
+    cantidad_deseada: int,
+    debug: bool = False,
+    patrones: bool = True,
+    detalle: bool = True,
+    callback: Optional[Callable[[str, int], Optional[bool]]] = None,
+    instrumentacion: Instrumentacion = NULA
+) -> Dict:
+    """
+    Optimiza un color descontando del índice los sobrantes usados. Es el paso
+    de `optimizar_por_color` para quien arma el índice y la matriz de encaje
+    una vez y los comparte entre varias corridas (pedidos, ranking): `encaje`
+    tiene que ser de las piezas de `modelo` contra las columnas de `indice`. Con
+    `patrones` el plan de una unidad se repite tantas veces como alcancen las
+    copias de los sobrantes que usa, y sólo se vuelve a planear cuando alguno
+    se agota; el resultado es idéntico al de planear unidad por unidad. Los
+    diccionarios de salida se arman recién al final, uno por plan distinto.
+    `callback(color, fabricables)` se llama tras cada plan; si devuelve True
+    el color se cierra con las unidades ya armadas.
+    """
+    fabricables = 0
+    planes = []
+
+    while fabricables < cantidad_deseada:
+        if debug:
+            logger.debug("--- Fabricando unidad %d (%s) ---", fabricables + 1, color)
+
+        resultado = _planear_unidad(modelo, indice, encaje, color, debug, instrumentacion)
+        if resultado is None:
+            instrumentacion.contar("unidades_incompletas")
+            break
+        plan, usos = resultado
+
+        # El plan ya consumió una unidad; se replica mientras alcancen las copias
+        extra = cantidad_deseada - fabricables - 1 if patrones or not usos else 0
+        for k, n in usos.items():
+            extra = min(extra, indice.cantidades[k] // n)
+        for k, n in usos.items():
+            indice.consumir(k, n * extra)
+
+        repeticiones = extra + 1
+        fabricables += repeticiones
+        planes.append((plan, repeticiones))
+        instrumentacion.contar("planes")
+        instrumentacion.contar("unidades_replicadas", extra)
+        instrumentacion.contar("tableros_consumidos", sum(usos.values()) * repeticiones)
+        if instrumentacion.activa:
+            area = sum(indice.area[k] * n for k, n in usos.items())
+            instrumentacion.contar("area_tableros_consumidos", round(area * repeticiones))
+
+        if debug:
+            logger.debug("Unidad %d fabricada correctamente (%d con el mismo patrón).", fabricables, repeticiones)
+
+        if callback is not None and callback(color, fabricables):
+            break
+
+    piezas_usadas = []
+    if detalle:
+        with instrumentacion.medir("armado_resultado"):
+            for plan, repeticiones in planes:
+                piezas_usadas.extend([_armar_lote(modelo, indice, plan)] * repeticiones)
+
+    return {
+        "color":              color or "Sin color",
+        "cantidadSolicitada": cantidad_deseada,
+        "cantidadFabricable": fabricables,
+        "piezasUtilizadas":   piezas_usadas
+    }
+
+
+def _optimizar_color_aislado(
+    modelo: ModeloMueble,
+    tableros: Inventario,
+    color: str,
+    cantidad_deseada: int,
+    debug: bool,
+    patrones: bool,
+    detalle: bool,
+    medir: bool = False
+) -> Tuple[Dict, Optional[Dict]]:
+    """
+    Versión para el pool de procesos: arma su propio índice del color y
+    devuelve el resultado junto con el resumen de sus métricas si `medir`.
+    """
+    instrumentacion = Instrumentacion() if medir else NULA
+    with instrumentacion.medir("indice"):
+        indice = InventoryIndex(tableros)
+    with instrumentacion.medir("encaje"):
+        encaje = MatrizEncaje(modelo.piezas, indice.columnas())
+    resultado = optimizar_color(
+        modelo, indice, encaje, color, cantidad_deseada, debug, patrones, detalle,
+        instrumentacion=instrumentacion
+    )
+    return resultado, instrumentacion.resumen() if medir else None
+
+
+def _por_colores(
+    modelo: ModeloMueble,
+    inventario: Inventario,
+    cantidades: Dict[str, int],
+    debug: bool,
+    workers: Optional[int],
+    patrones: bool,
+    detalle: bool,
+    callback: Optional[Callable[[str, int], Optional[bool]]] = None,
+    instrumentacion: Instrumentacion = NULA
+) -> List[Dict]:
+    colores = sorted(cantidades)
+    n = len(colores)
+    if callback is not None or not workers or workers <= 1 or n < 2 or len(inventario) < MIN_SOBRANTES_PARALELO:
+        # Los colores no comparten sobrantes: un solo índice sirve para todos
+        with instrumentacion.medir("indice"):
+            indice = InventoryIndex(inventario)
+        with instrumentacion.medir("encaje"):
+            encaje = MatrizEncaje(modelo.piezas, indice.columnas())
+
+        detenido = False
+        avisar = None
+        if callback is not None:
+            def avisar(color: str, fabricables: int) -> bool:
+                nonlocal detenido
+                detenido = detenido or bool(callback(color, fabricables))
+                return detenido
+
+        resultados = []
+        for c in colores:
+            resultados.append(optimizar_color(
+                modelo, indice, encaje, c, cantidades[c], debug, patrones, detalle, avisar, instrumentacion
+            ))
+            if detenido:
                 break
+        return resultados
 
-            fabricables += 1
-            piezas_usadas.append(lote)
+    por_color = separar_por_color(inventario)
+    with ProcessPoolExecutor(max_workers=min(workers, n)) as pool:
+        salidas = list(pool.map(
+            _optimizar_color_aislado,
+            [modelo] * n, [por_color[c] for c in colores], colores,
+            [cantidades[c] for c in colores], [debug] * n, [patrones] * n, [detalle] * n,
+            [instrumentacion.activa] * n
+        ))
+    for _, metricas in salidas:
+        if metricas is not None:
+            instrumentacion.combinar(metricas)
+    return [resultado for resultado, _ in salidas]
 
-            if debug:
-                print(f"Unidad {n_fabricado+1} fabricada correctamente.\n")
 
-        resultados.append({
-            "color":              color or "Sin color",
-            "cantidadSolicitada": cantidad_deseada,
-            "cantidadFabricable": fabricables,
-            "piezasUtilizadas":   piezas_usadas
-        })
+def optimizar_por_color(
+    modelo: ModeloMueble,
+    inventario: Inventario,
+    cantidad_deseada: int,
+    debug: bool = False,
+    workers: Optional[int] = None,
+    patrones: bool = True,
+    callback: Optional[Callable[[str, int], Optional[bool]]] = None,
+    instrumentacion: Instrumentacion = NULA
+) -> List[Dict]:
+    """
+    Optimización PRO V2 con modo DEBUG (mensajes por `logging` en nivel DEBUG).
+
+    Cada registro del inventario aporta `cantidad` tableros iguales, y en cada
+    paso se usa el más chico del color, con espesor compatible, donde entra
+    alguna pieza pendiente. Con `patrones` las unidades que salen con el mismo
+    plan de corte se replican en un solo paso aritmético. Con `workers` > 1
+    cada color se resuelve en un proceso aparte; el orden y el contenido del
+    resultado son los mismos que en la ejecución en serie. Cada entrada de un
+    lote lleva `tablero`, el número de copia dentro de la unidad: las
+    entradas con igual número salen del mismo tablero.
+
+    `callback(color, fabricables)` informa el avance de cada color y fuerza la
+    ejecución en serie. Si devuelve True la corrida se corta y el resultado
+    trae sólo los colores procesados, el último con las unidades ya armadas.
+    `instrumentacion` junta tiempos por fase y contadores de colocaciones,
+    búsquedas en el índice y tableros consumidos. El inventario puede venir
+    como lista de sobrantes o ya en columnas (`ArreglosInventario`).
+    """
+    cantidades = {c: cantidad_deseada for c in colores_de(inventario)}
+    with instrumentacion.medir("total"):
+        return _por_colores(modelo, inventario, cantidades, debug, workers, patrones, True, callback, instrumentacion)
+
+
+def cantidad_maxima(
+    modelo: ModeloMueble,
+    inventario: Inventario,
+    workers: Optional[int] = None,
+    instrumentacion: Instrumentacion = NULA
+) -> Dict[str, int]:
+    """
+    Máxima cantidad de unidades fabricables por color con el inventario actual.
+
+    El motor arma las unidades en secuencia y se detiene en la primera que no
+    se completa, así que una sola corrida pedida con una cota superior devuelve
+    el máximo exacto. La cota es el área del inventario del color dividida por
+    el área de un mueble; la corrida va con patrones y sin armar el detalle.
+    """
+    area_modelo = sum(p.ancho * p.largo * p.cantidad for p in modelo.piezas)
+    if area_modelo <= 0:
+        raise ValueError(f"El modelo '{modelo.nombre}' no tiene piezas con área")
+
+    if isinstance(inventario, ArreglosInventario):
+        areas = inventario.areas_por_color()
+    else:
+        areas = {}
+        for p in inventario:
+            areas[p.color] = areas.get(p.color, 0) + p.ancho * p.largo * p.cantidad
+    cotas = {c: floor(area / area_modelo) for c, area in areas.items()}
 
-    return resultados
+    with instrumentacion.medir("total"):
+        resultados = _por_colores(modelo, inventario, cotas, False, workers, True, False, None, instrumentacion)
+    return {r["color"]: r["cantidadFabricable"] for r in resultados}
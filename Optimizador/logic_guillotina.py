@@ -0,0 +1,305 @@
+# optimizador/logic_guillotina.py
+
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from optimizador.indice import InventoryIndex, GrupoMedidas, clave_espesor
+from optimizador.metricas import NULA, Instrumentacion
+from optimizador.models import Inventario, ModeloMueble, colores_de
+
+logger = logging.getLogger(__name__)
+
+# Ancho de la hoja de sierra (mm): lo que se pierde en cada corte
+KERF = 3.0
+
+# (tablero, tipo de pieza, x, y, ancho colocado, largo colocado, rotada)
+Colocacion = Tuple[int, int, float, float, float, float, bool]
+
+
+class Libres:
+    """
+    Rectángulos libres de los tableros abiertos de un color.
+
+    Se agrupan por espesor del tablero y cada grupo es un `GrupoMedidas` del índice
+    de inventario: el mejor ajuste (el libre más chico donde entra la pieza,
+    en cualquier orientación) busca por bisección dentro de cada lado corto
+    distinto, con el mismo costo y el mismo peor caso que allí (lineal en la
+    cantidad de lados cortos distintos que hay que revisar). Un rectángulo ocupado
+    sale de su grupo y puede volver al deshacer una unidad incompleta. Los
+    que son demasiado chicos para cualquier pieza no se indexan, pero siguen
+    marcados como libres: son los recortes que quedan del tablero.
+    """
+    def __init__(self):
+        self.tablero: List[int] = []
+        self.x: List[float] = []
+        self.y: List[float] = []
+        self.ancho: List[float] = []
+        self.largo: List[float] = []
+        self.libre: List[bool] = []
+        self._indexado: List[bool] = []
+        self._espesor: List[Optional[float]] = []
+        self._grupos: Dict[Optional[float], GrupoMedidas] = {}
+
+    def agregar(
+        self, tablero: int, x: float, y: float, ancho: float, largo: float,
+        espesor: Optional[float], indexar: bool = True
+    ) -> int:
+        r = len(self.x)
+        self.tablero.append(tablero)
+        self.x.append(x)
+        self.y.append(y)
+        self.ancho.append(ancho)
+        self.largo.append(largo)
+        self._espesor.append(clave_espesor(espesor))
+        self.libre.append(False)
+        self._indexado.append(indexar)
+        self.reponer(r)
+        return r
+
+    def quitar(self, r: int):
+        self.libre[r] = False
+        if self._indexado[r]:
+            ancho, largo = self.ancho[r], self.largo[r]
+            self._grupos[self._espesor[r]].quitar(r, min(ancho, largo), max(ancho, largo))
+
+    def reponer(self, r: int):
+        self.libre[r] = True
+        if not self._indexado[r]:
+            return
+        grupo = self._grupos.setdefault(self._espesor[r], GrupoMedidas())
+        ancho, largo = self.ancho[r], self.largo[r]
+        grupo.insertar(ancho * largo, r, min(ancho, largo), max(ancho, largo))
+
+    def mejor_ajuste(self, espesor: Optional[float], ancho: float, largo: float) -> Optional[int]:
+        clave = clave_espesor(espesor)
+        grupos = self._grupos.values() if clave is None else [
+            self._grupos[k] for k in (clave, None) if k in self._grupos
+        ]
+        corto, largo = min(ancho, largo), max(ancho, largo)
+        mejor = None
+        for grupo in grupos:
+            encontrado = grupo.primero_que_cabe(corto, largo)
+            if encontrado is not None and (mejor is None or encontrado < mejor):
+                mejor = encontrado
+        return mejor[1] if mejor is not None else None
+
+
+def colocar(
+    libres: Libres,
+    r: int,
+    ancho: float,
+    largo: float,
+    kerf: float,
+    minimo: float
+) -> Tuple[Tuple[float, float, float, float, bool], List[int]]:
+    """
+    Coloca la pieza en la esquina del libre `r` y lo parte con un corte de
+    guillotina. La orientación es la que deja el margen más chico (mejor
+    ajuste por lado corto) y el corte, el que deja el libre más grande. Los
+    libres con un lado menor que `minimo` no alojan ninguna pieza y no se
+    indexan. Devuelve (x, y, ancho, largo, rotada) y los libres nuevos.
+    """
+    W, H = libres.ancho[r], libres.largo[r]
+    opciones = [(ancho, largo, False), (largo, ancho, True)]
+    w, h, rotada = min(
+        (o for o in opciones if o[0] <= W and o[1] <= H),
+        key=lambda o: (min(W - o[0], H - o[1]), o[2])
+    )
+    x, y = libres.x[r], libres.y[r]
+    libres.quitar(r)
+
+    derecha, arriba = W - w - kerf, H - h - kerf
+    # Corte horizontal primero: arriba queda el ancho completo; vertical: a la derecha el largo completo
+    horizontal = [(x + w + kerf, y, derecha, h), (x, y + h + kerf, W, arriba)]
+    vertical = [(x + w + kerf, y, derecha, H), (x, y + h + kerf, w, arriba)]
+    mayor = lambda rects: max((a * l for _, _, a, l in rects if a > 0 and l > 0), default=0)
+    partes = horizontal if mayor(horizontal) >= mayor(vertical) else vertical
+
+    nuevos = [
+        libres.agregar(libres.tablero[r], px, py, pa, pl, libres._espesor[r], indexar=min(pa, pl) >= minimo)
+        for px, py, pa, pl in partes if pa > 0 and pl > 0
+    ]
+    return (x, y, w, h, rotada), nuevos
+
+
+def _planear_unidad(
+    modelo: ModeloMueble,
+    orden: List[int],
+    indice: InventoryIndex,
+    libres: Libres,
+    tableros: List[int],
+    color: str,
+    kerf: float,
+    minimo: float,
+    instrumentacion: Instrumentacion = NULA
+) -> Optional[List[Colocacion]]:
+    """
+    Coloca las piezas de una unidad, de mayor a menor, en el libre de mejor
+    ajuste de los tableros ya abiertos; si ninguno sirve abre el sobrante
+    más chico del color donde entra la pieza. Si la unidad no se completa
+    deshace sus colocaciones y tableros abiertos y devuelve None.
+    """
+    deshacer = []
+    colocaciones = []
+    medir = instrumentacion.activa
+
+    for j in orden:
+        pieza = modelo.piezas[j]
+        if medir:
+            inicio = time.perf_counter()
+        r = libres.mejor_ajuste(pieza.espesor, pieza.ancho, pieza.largo)
+        if medir:
+            instrumentacion.sumar_tiempo("busqueda_libres", time.perf_counter() - inicio)
+        if r is None:
+            k = indice.mejor_ajuste(color, pieza.espesor, pieza.ancho, pieza.largo)
+            if k is None:
+                for paso in reversed(deshacer):
+                    if paso[0] == "ocupar":
+                        for n in paso[2]:
+                            libres.quitar(n)
+                        libres.reponer(paso[1])
+                    else:
+                        libres.quitar(paso[2])
+                        indice.reponer(paso[1])
+                        tableros.pop()
+                return None
+            indice.consumir(k)
+            tableros.append(k)
+            r = libres.agregar(len(tableros) - 1, 0.0, 0.0, indice.ancho[k], indice.largo[k], indice.espesor[k])
+            deshacer.append(("abrir", k, r))
+
+        (x, y, w, h, rotada), nuevos = colocar(libres, r, pieza.ancho, pieza.largo, kerf, minimo)
+        deshacer.append(("ocupar", r, nuevos))
+        colocaciones.append((libres.tablero[r], j, x, y, w, h, rotada))
+
+    return colocaciones
+
+
+def _armar_lote(
+    modelo: ModeloMueble,
+    indice: InventoryIndex,
+    tableros: List[int],
+    colocaciones: List[Colocacion]
+) -> List[Dict]:
+    """Una entrada por (tablero, tipo de pieza), como en el motor clásico, más sus coordenadas."""
+    lote: Dict[Tuple[int, int], Dict] = {}
+    for t, j, x, y, w, h, rotada in colocaciones:
+        entrada = lote.get((t, j))
+        if entrada is None:
+            k = tableros[t]
+            entrada = lote[(t, j)] = {
+                "codigo": indice.codigo[k],
+                "color": indice.color[k],
+                "largo": indice.largo[k],
+                "ancho": indice.ancho[k],
+                "espesor": indice.espesor[k],
+                "cantidad_req": 0,
+                "pieza_modelo_codigo": modelo.piezas[j].codigo,
+                "tablero": t,
+                "colocaciones": [],
+            }
+        entrada["cantidad_req"] += 1
+        entrada["colocaciones"].append({"x": x, "y": y, "ancho": w, "largo": h, "rotada": rotada})
+    return list(lote.values())
+
+
+def _optimizar_color(
+    modelo: ModeloMueble,
+    orden: List[int],
+    indice: InventoryIndex,
+    color: str,
+    cantidad_deseada: int,
+    kerf: float,
+    minimo: float,
+    debug: bool,
+    callback: Optional[Callable[[str, int], Optional[bool]]] = None,
+    instrumentacion: Instrumentacion = NULA
+) -> Dict:
+    libres = Libres()
+    tableros: List[int] = []
+    lotes = []
+
+    while len(lotes) < cantidad_deseada:
+        colocaciones = _planear_unidad(modelo, orden, indice, libres, tableros, color, kerf, minimo, instrumentacion)
+        if colocaciones is None:
+            instrumentacion.contar("unidades_incompletas")
+            if debug:
+                logger.debug("Unidad %d (%s): no hay más sobrantes donde colocar.", len(lotes) + 1, color)
+            break
+        lotes.append(_armar_lote(modelo, indice, tableros, colocaciones))
+        instrumentacion.contar("colocaciones", len(colocaciones))
+        if debug:
+            logger.debug("Unidad %d (%s) colocada; tableros abiertos: %d", len(lotes), color, len(tableros))
+        if callback is not None and callback(color, len(lotes)):
+            break
+
+    instrumentacion.contar("tableros_consumidos", len(tableros))
+    if instrumentacion.activa:
+        instrumentacion.contar("area_tableros_consumidos", round(sum(indice.area[k] for k in tableros)))
+
+    return {
+        "color":              color or "Sin color",
+        "cantidadSolicitada": cantidad_deseada,
+        "cantidadFabricable": len(lotes),
+        "piezasUtilizadas":   lotes,
+        "libres": [
+            {"tablero": libres.tablero[r], "x": libres.x[r], "y": libres.y[r],
+             "ancho": libres.ancho[r], "largo": libres.largo[r]}
+            for r in range(len(libres.x)) if libres.libre[r]
+        ],
+    }
+
+
+def optimizar_guillotina(
+    modelo: ModeloMueble,
+    inventario: Inventario,
+    cantidad_deseada: int,
+    kerf: float = KERF,
+    debug: bool = False,
+    callback: Optional[Callable[[str, int], Optional[bool]]] = None,
+    instrumentacion: Instrumentacion = NULA
+) -> List[Dict]:
+    """
+    Motor de colocación real: cada pieza se ubica en coordenadas sobre un
+    tablero, con cortes de guillotina de `kerf` mm y rotación permitida, así
+    que el plan se puede cortar tal cual.
+
+    A diferencia del motor clásico, un tablero abierto sigue disponible para
+    las unidades siguientes: las piezas de la próxima unidad van primero a
+    los huecos que quedaron. Cada entrada de `piezasUtilizadas` lleva además
+    `tablero` (número del tablero abierto dentro del color, para reconocer
+    los compartidos) y `colocaciones` con x (sobre el ancho del tablero), y
+    (sobre el largo), medidas colocadas y si va rotada. `libres` trae, por
+    color, los rectángulos sin usar de los tableros abiertos: los recortes
+    que `optimizador.recortes.confirmar_plan` devuelve al inventario.
+    `callback(color, fabricables)` se llama tras cada unidad; si devuelve
+    True la corrida se corta, como en `optimizar_por_color`.
+    """
+    # Sin piezas cada unidad sale vacía, como en el motor clásico
+    piezas = [p for p in modelo.piezas if p.cantidad > 0]
+    # Piezas de mayor a menor: las grandes eligen tablero primero
+    orden = sorted(
+        (j for j, p in enumerate(modelo.piezas) for _ in range(max(p.cantidad, 0))),
+        key=lambda j: (-modelo.piezas[j].ancho * modelo.piezas[j].largo, -max(modelo.piezas[j].ancho, modelo.piezas[j].largo), j)
+    )
+    minimo = min((min(p.ancho, p.largo) for p in piezas), default=0.0)
+
+    with instrumentacion.medir("total"):
+        with instrumentacion.medir("indice"):
+            indice = InventoryIndex(inventario)
+        detenido = False
+        avisar = None
+        if callback is not None:
+            def avisar(color: str, fabricables: int) -> bool:
+                nonlocal detenido
+                detenido = detenido or bool(callback(color, fabricables))
+                return detenido
+
+        resultados = []
+        for color in colores_de(inventario):
+            resultados.append(_optimizar_color(
+                modelo, orden, indice, color, cantidad_deseada, kerf, minimo, debug, avisar, instrumentacion
+            ))
+            if detenido:
+                break
+    return resultados
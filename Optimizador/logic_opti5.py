@@ -1,128 +1,729 @@
 # optimizador/logic_opti5.py
 
+import logging
+import os
 import random
 import math
-from copy import deepcopy
-from typing import List, Dict
-from optimizador.models import PiezaInventario, ModeloMueble, PiezaModelo
+import time
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import accumulate
+from math import floor
+from typing import Callable, List, Dict, Optional, Tuple
+import numpy as np
+from optimizador.models import ArreglosInventario, Inventario, ModeloMueble, PiezaModelo
+from optimizador.encaje import MatrizEncaje
+from optimizador.metricas import NULA, Instrumentacion
+
+PENALIZACION_TABLERO = 100000  # Penalizar fuerte el uso excesivo de tableros
+SIN_ASIGNAR = -1
+
+TEMP_MINIMA_RELATIVA = 1e-4   # Con tiempo límite, se enfría hasta temp_inicial * esto
+FACTOR_RECALENTADO = 0.5      # Al recalentar se vuelve a temp_inicial * esto
+INTERVALO_CALLBACK = 0.25     # Segundos mínimos entre llamadas al callback
+MUESTREO_ENERGIA = 100        # Iteraciones entre muestras de la traza de energía
+
+logger = logging.getLogger(__name__)
 
 # Representa una solución
 class Estado:
-    def __init__(self, piezas: List[PiezaModelo], tableros: List[PiezaInventario]):
-        self.asignacion = {i: [] for i in range(len(tableros))}  # índice tablero -> piezas
-        self.tableros = deepcopy(tableros)
-        self.piezas = deepcopy(piezas)
+    """
+    Asignación de piezas a tableros con acumuladores de área y uso por tablero.
+
+    Cada registro de inventario aporta `cantidad` tableros físicos. La asignación
+    es una matriz de enteros tablero × tipo de pieza, así que la memoria crece con
+    los tipos distintos y no con las unidades pedidas. Un movimiento lleva una
+    unidad de un tipo de un tablero a otro: se propone con `mutar()`, su variación
+    de energía se calcula en O(1) con `delta()` y sólo se aplica (`aplicar()`) si
+    se acepta, sin clonar el estado. Toda la aleatoriedad sale de `rng`, lo que
+    permite cadenas reproducibles.
+    """
+    def __init__(
+        self,
+        piezas: List[PiezaModelo],
+        tableros: Inventario,
+        rng: Optional[random.Random] = None,
+        multiplicidad: int = 1
+    ):
+        self.rng = rng or random.Random()
+        if isinstance(tableros, ArreglosInventario):
+            # El estado trabaja tablero por tablero: las columnas se pasan a objetos
+            tableros = tableros.a_piezas()
+        self.tableros = [t for t in tableros for _ in range(t.cantidad)]
+        self.area_tablero = [t.ancho * t.largo for t in self.tableros]
+
+        # Tipos de pieza distintos y unidades de cada uno por mueble
+        self.piezas = []
+        indice_tipo = {}
+        self.por_unidad = []
+        for p in piezas:
+            if id(p) not in indice_tipo:
+                indice_tipo[id(p)] = len(self.piezas)
+                self.piezas.append(p)
+                self.por_unidad.append(0)
+            self.por_unidad[indice_tipo[id(p)]] += p.cantidad
+        self.demanda = [n * multiplicidad for n in self.por_unidad]
+        self.area_tipo = [p.ancho * p.largo for p in self.piezas]
+        self.encaje = MatrizEncaje(self.piezas, self.tableros)
+
+        # Para sortear la unidad a mover en proporción a la demanda de cada tipo
+        self._demanda_acumulada = list(accumulate(self.demanda))
+
+        # Dejar una pieza sin asignar siempre cuesta más que abrir un tablero
+        self.penalizacion_pieza = PENALIZACION_TABLERO + max(self.area_tablero, default=0)
+
         self._inicializar_asignacion()
 
     def _inicializar_asignacion(self):
-        todas = []
-        for p in self.piezas:
-            todas.extend([p] * p.cantidad)
-        random.shuffle(todas)
-
-        for pieza in todas:
-            for i, tablero in enumerate(self.tableros):
-                if self._cabe(pieza, tablero):
-                    self.asignacion[i].append(pieza)
+        """Primer ajuste en bloque, recorriendo los tipos en orden aleatorio."""
+        asignacion = np.zeros((len(self.tableros), len(self.piezas)), dtype=np.int64)
+        area_usada = [0.0] * len(self.tableros)
+        orden = list(range(len(self.piezas)))
+        self.rng.shuffle(orden)
+
+        for tipo in orden:
+            pendientes = self.demanda[tipo]
+            area = self.area_tipo[tipo]
+            for i in self.encaje.destinos(tipo):
+                if not pendientes:
                     break
+                libre = self.area_tablero[i] - area_usada[i]
+                n = min(pendientes, floor(libre / area)) if area > 0 else pendientes
+                if n > 0:
+                    asignacion[i, tipo] = n
+                    area_usada[i] += n * area
+                    pendientes -= n
 
-    def _cabe(self, pieza: PiezaModelo, tablero: PiezaInventario):
-        return (
-            (pieza.ancho <= tablero.ancho and pieza.largo <= tablero.largo)
-            or (pieza.largo <= tablero.ancho and pieza.ancho <= tablero.largo)
-        )
+        self.restaurar(asignacion)
+
+    def _agregar(self, i: int, tipo: int):
+        self.asignacion[i, tipo] += 1
+        if self.asignacion[i, tipo] == 1:
+            self._posicion[tipo][i] = len(self._con_tipo[tipo])
+            self._con_tipo[tipo].append(i)
+
+    def _quitar(self, i: int, tipo: int):
+        self.asignacion[i, tipo] -= 1
+        if self.asignacion[i, tipo] == 0:
+            # Borrado por intercambio con el último, O(1)
+            lista, posicion = self._con_tipo[tipo], self._posicion[tipo]
+            pos = posicion.pop(i)
+            ultimo = lista.pop()
+            if ultimo != i:
+                lista[pos] = ultimo
+                posicion[ultimo] = pos
+
+    def _cabe_area(self, tipo: int, i: int) -> bool:
+        """Queda área libre suficiente en el tablero `i` para la pieza."""
+        return self.area_usada[i] + self.area_tipo[tipo] <= self.area_tablero[i]
+
+    def _aporte(self, i: int, conteo: int, area: float) -> float:
+        if conteo == 0:
+            return 0
+        return PENALIZACION_TABLERO + self.area_tablero[i] - area
 
     def energia(self):
-        uso = 0
-        desperdicio_total = 0
-        for i, piezas in self.asignacion.items():
-            if piezas:
-                uso += 1
-                area_piezas = sum(p.ancho * p.largo for p in piezas)
-                area_tablero = self.tableros[i].ancho * self.tableros[i].largo
-                desperdicio_total += (area_tablero - area_piezas)
-        return uso * 100000 + desperdicio_total  # Penalizar fuerte el uso excesivo de tableros
+        return self._energia
+
+    def cota_inferior(self) -> float:
+        """
+        Energía mínima alcanzable: las piezas que no entran en ningún tablero
+        quedan siempre sin asignar, el resto necesita al menos
+        k = ceil(área total / área del tablero más grande) tableros, y k
+        tableros desperdician como mínimo la suma de los k más chicos menos el
+        área total.
+        """
+        fijas = sum(d for t, d in enumerate(self.demanda) if not self.encaje.destinos(t))
+        area = sum(d * self.area_tipo[t] for t, d in enumerate(self.demanda) if self.encaje.destinos(t))
+        cota = fijas * self.penalizacion_pieza
+        if area <= 0 or not self.area_tablero:
+            return cota
+        k = math.ceil(area / max(self.area_tablero))
+        if k > len(self.area_tablero):
+            return cota + k * PENALIZACION_TABLERO
+        minimo = sum(sorted(self.area_tablero)[:k])
+        return cota + k * PENALIZACION_TABLERO + max(0.0, minimo - area)
 
     def mutar(self):
-        i_origen = random.choice(list(self.asignacion.keys()))
-        if not self.asignacion[i_origen]:
-            return
-        pieza = random.choice(self.asignacion[i_origen])
-        self.asignacion[i_origen].remove(pieza)
-
-        destinos = list(self.asignacion.keys())
-        random.shuffle(destinos)
-
-        for i_dest in destinos:
-            if self._cabe(pieza, self.tableros[i_dest]):
-                self.asignacion[i_dest].append(pieza)
-                return
-        # si no cupo, vuelve al origen
-        self.asignacion[i_origen].append(pieza)
+        """Propone mover una unidad al azar a otro tablero; None si no es válido."""
+        if not self._demanda_acumulada or not self._demanda_acumulada[-1]:
+            return None
+        tipo = bisect_right(self._demanda_acumulada, self.rng.randrange(self._demanda_acumulada[-1]))
+        # Sólo se muestrean destinos donde la pieza entra por medidas y espesor
+        destinos = self.encaje.destinos(tipo)
+        if not destinos:
+            return None
+
+        # Origen: uno de los tableros con piezas de este tipo, o las sin asignar
+        lista = self._con_tipo[tipo]
+        k = self.rng.randrange(len(lista) + (1 if self.sin_asignar[tipo] else 0))
+        i_origen = lista[k] if k < len(lista) else SIN_ASIGNAR
+
+        i_dest = destinos[self.rng.randrange(len(destinos))]
+        if i_dest == i_origen or not self._cabe_area(tipo, i_dest):
+            return None
+        return (tipo, i_origen, i_dest)
+
+    def delta(self, movimiento) -> float:
+        tipo, i_origen, i_dest = movimiento
+        area = self.area_tipo[tipo]
+        if i_origen == SIN_ASIGNAR:
+            delta = -self.penalizacion_pieza
+        else:
+            c, a = self.conteo[i_origen], self.area_usada[i_origen]
+            delta = self._aporte(i_origen, c - 1, a - area) - self._aporte(i_origen, c, a)
+        c, a = self.conteo[i_dest], self.area_usada[i_dest]
+        return delta + self._aporte(i_dest, c + 1, a + area) - self._aporte(i_dest, c, a)
+
+    def aplicar(self, movimiento, delta=None):
+        if delta is None:
+            delta = self.delta(movimiento)
+        tipo, i_origen, i_dest = movimiento
+        area = self.area_tipo[tipo]
+        if i_origen == SIN_ASIGNAR:
+            self.sin_asignar[tipo] -= 1
+        else:
+            self._quitar(i_origen, tipo)
+            self.conteo[i_origen] -= 1
+            self.area_usada[i_origen] -= area
+        self._agregar(i_dest, tipo)
+        self.conteo[i_dest] += 1
+        self.area_usada[i_dest] += area
+        self._energia += delta
+
+    def instantanea(self) -> np.ndarray:
+        return self.asignacion.copy()
+
+    def restaurar(self, asignacion: np.ndarray):
+        """Reconstruye los acumuladores a partir de una matriz de asignación."""
+        self.asignacion = asignacion.copy()
+        colocadas = self.asignacion.sum(axis=0)
+        self.sin_asignar = [d - int(c) for d, c in zip(self.demanda, colocadas)]
+        self.conteo = self.asignacion.sum(axis=1).tolist()
+        self.area_usada = (self.asignacion @ np.array(self.area_tipo, dtype=float)).tolist()
+
+        self._con_tipo = [np.flatnonzero(col).tolist() for col in self.asignacion.T]
+        self._posicion = [{i: k for k, i in enumerate(lista)} for lista in self._con_tipo]
+
+        self._energia = self.penalizacion_pieza * sum(self.sin_asignar) + sum(
+            self._aporte(i, c, a)
+            for i, (c, a) in enumerate(zip(self.conteo, self.area_usada)) if c
+        )
 
     def clonar(self):
-        nuevo = Estado(self.piezas, self.tableros)
-        nuevo.asignacion = deepcopy(self.asignacion)
+        nuevo = object.__new__(Estado)
+        nuevo.__dict__.update(self.__dict__)
+        nuevo.restaurar(self.asignacion)
         return nuevo
 
 
-def simulated_annealing_optimize(
+def _recocer(
+    estado: Estado,
+    max_iter: Optional[int],
+    temp_inicial: float,
+    enfriamiento: float,
+    debug: bool = False,
+    traza: Optional[List[float]] = None,
+    tiempo_limite_ms: Optional[float] = None,
+    paciencia: Optional[int] = None,
+    recalentar_tras: Optional[int] = None,
+    callback: Optional[Callable[[int, float, Optional[Estado]], Optional[bool]]] = None,
+    instrumentacion: Instrumentacion = NULA
+) -> Tuple[float, Optional[List[int]]]:
+    """
+    Corre una cadena sobre `estado` y devuelve (mejor_energia, mejor_asignacion).
+
+    `mejor_asignacion` es None cuando el estado final ya es el mejor visto.
+    La cadena termina al agotar `max_iter`, el tiempo límite, la `paciencia`
+    (iteraciones seguidas sin mejora), al alcanzar la cota inferior o cuando
+    `callback` devuelve True. Los contadores para `instrumentacion` se llevan
+    en variables locales y se vuelcan al terminar; la energía (en `traza` y
+    en la instrumentación) se muestrea cada MUESTREO_ENERGIA iteraciones.
+    """
+    rng = estado.rng
+    mejor_energia = estado.energia()
+    mejor_asignacion = None
+    temp = temp_inicial
+    cota = estado.cota_inferior()
+
+    inicio = time.perf_counter()
+    limite = inicio + tiempo_limite_ms / 1000 if tiempo_limite_ms is not None else None
+    temp_minima = temp_inicial * TEMP_MINIMA_RELATIVA
+    ultimo_callback = 0.0
+    sin_informar = False
+    sin_mejora = 0
+    estancado = 0
+    iteracion = 0
+    propuestos = aceptados = mejoras = recalentamientos = 0
+    medir = instrumentacion.activa
+    energias = instrumentacion.serie("energia")
+
+    while (max_iter is None or iteracion < max_iter) and mejor_energia > cota:
+        if limite is not None and iteracion % 256 == 0:
+            ahora = time.perf_counter()
+            if ahora >= limite:
+                break
+            # Enfriamiento adaptado para llegar a la temperatura mínima justo al límite
+            if iteracion:
+                restantes = (limite - ahora) * iteracion / (ahora - inicio)
+                enfriamiento = (temp_minima / temp) ** (1 / max(restantes, 1.0)) if temp > temp_minima else 1.0
+
+        # Latido: informa el avance y permite cancelar aunque no haya mejoras;
+        # lleva la mejor solución sólo si quedó una sin informar por el intervalo
+        if callback is not None and iteracion % 256 == 0 and time.perf_counter() - ultimo_callback >= INTERVALO_CALLBACK:
+            mejor_estado = None
+            if sin_informar:
+                mejor_estado = estado
+                if mejor_asignacion is not None:
+                    mejor_estado = estado.clonar()
+                    mejor_estado.restaurar(mejor_asignacion)
+                sin_informar = False
+            ultimo_callback = time.perf_counter()
+            if callback(iteracion, mejor_energia, mejor_estado):
+                break
+
+        movimiento = estado.mutar()
+        if movimiento is not None:
+            propuestos += 1
+            delta_e = estado.delta(movimiento)
+            if delta_e < 0 or rng.random() < math.exp(-delta_e / temp):
+                aceptados += 1
+                # Sólo se copia la asignación al abandonar el mejor estado
+                if delta_e > 0 and mejor_asignacion is None:
+                    mejor_asignacion = estado.instantanea()
+                estado.aplicar(movimiento, delta_e)
+                if estado.energia() < mejor_energia:
+                    mejor_energia = estado.energia()
+                    mejor_asignacion = None
+                    sin_mejora = estancado = -1
+                    mejoras += 1
+                    sin_informar = True
+                    if callback is not None and time.perf_counter() - ultimo_callback >= INTERVALO_CALLBACK:
+                        ultimo_callback = time.perf_counter()
+                        sin_informar = False
+                        if callback(iteracion, mejor_energia, estado):
+                            break
+
+        sin_mejora += 1
+        estancado += 1
+        if paciencia is not None and sin_mejora >= paciencia:
+            break
+        if recalentar_tras is not None and estancado >= recalentar_tras:
+            temp = max(temp, temp_inicial * FACTOR_RECALENTADO)
+            estancado = 0
+            recalentamientos += 1
+
+        temp *= enfriamiento
+        if (traza is not None or debug or medir) and iteracion % MUESTREO_ENERGIA == 0:
+            if traza is not None:
+                traza.append(estado.energia())
+            if medir:
+                energias.append(estado.energia())
+            if debug:
+                logger.debug("Iteración %d, Energía: %.2f, Mejor: %.2f", iteracion, estado.energia(), mejor_energia)
+        iteracion += 1
+
+    if medir:
+        instrumentacion.contar("iteraciones", iteracion)
+        instrumentacion.contar("movimientos_propuestos", propuestos)
+        instrumentacion.contar("movimientos_aceptados", aceptados)
+        instrumentacion.contar("mejoras", mejoras)
+        instrumentacion.contar("recalentamientos", recalentamientos)
+        instrumentacion.sumar_tiempo("recocido", time.perf_counter() - inicio)
+        instrumentacion.fijar("tasa_aceptacion", aceptados / propuestos if propuestos else 0.0)
+        instrumentacion.fijar("mejor_energia", mejor_energia)
+    return mejor_energia, mejor_asignacion
+
+
+def _cadena_independiente(
+    modelo, inventario, cantidad_deseada, semilla, max_iter, temp_inicial, enfriamiento, controles,
+    callback=None
+):
+    controles = dict(controles)
+    limite = controles.pop("limite", None)
+    if limite is not None:
+        # El plazo es común a todas las cadenas: una que arranca tarde corre lo que queda
+        controles["tiempo_limite_ms"] = max(0.0, (limite - time.time()) * 1000)
+    estado = Estado(modelo.piezas, inventario, random.Random(semilla), cantidad_deseada)
+    traza = []
+    _, mejor_asignacion = _recocer(
+        estado, max_iter, temp_inicial, enfriamiento, traza=traza, callback=callback, **controles
+    )
+    if mejor_asignacion is not None:
+        estado.restaurar(mejor_asignacion)
+    return estado, traza
+
+
+# Aviso de corte y avance (mejor energía e iteraciones por cadena) compartidos
+# con los procesos del pool de arranques independientes
+_CANCELAR = None
+_AVANCE_ENERGIA = None
+_AVANCE_ITERACION = None
+
+
+def _iniciar_cadenas(cancelar, energias, iteraciones):
+    global _CANCELAR, _AVANCE_ENERGIA, _AVANCE_ITERACION
+    _CANCELAR, _AVANCE_ENERGIA, _AVANCE_ITERACION = cancelar, energias, iteraciones
+
+
+def _cadena_en_pool(k, *argumentos):
+    def informar(iteracion, energia, _estado):
+        _AVANCE_ENERGIA[k] = energia
+        _AVANCE_ITERACION[k] = max(iteracion, 0)
+        return _CANCELAR.is_set()
+    return _cadena_independiente(*argumentos, callback=informar)
+
+
+# Estado base de cada proceso del pool de parallel tempering
+_REPLICA_BASE = None
+
+
+def _iniciar_replicas(modelo, inventario, cantidad_deseada):
+    global _REPLICA_BASE
+    _REPLICA_BASE = Estado(modelo.piezas, inventario, multiplicidad=cantidad_deseada)
+
+
+def _tramo_replica(asignacion, semilla, iteraciones, temp, base=None):
+    """
+    Corre un tramo a temperatura fija sobre el Estado base del proceso; entre
+    procesos sólo viaja la matriz de asignación. Sin `asignacion` arranca una asignación
+    inicial nueva con la semilla dada.
+    """
+    estado = base or _REPLICA_BASE
+    estado.rng = random.Random(semilla)
+    if asignacion is None:
+        estado._inicializar_asignacion()
+    else:
+        estado.restaurar(asignacion)
+    traza = []
+    mejor_energia, mejor_asignacion = _recocer(estado, iteraciones, temp, 1.0, traza=traza)
+    if mejor_asignacion is None:
+        mejor_asignacion = estado.instantanea()
+    return estado.instantanea(), estado.energia(), mejor_energia, mejor_asignacion, traza
+
+
+def ejecutar_cadenas(
     modelo: ModeloMueble,
-    inventario: List[PiezaInventario],
+    inventario: Inventario,
     cantidad_deseada: int,
+    cadenas: int = 4,
+    semilla: Optional[int] = None,
+    workers: Optional[int] = None,
+    intercambio: bool = False,
     max_iter: int = 1000,
     temp_inicial: float = 1000.0,
     enfriamiento: float = 0.95,
-    debug: bool = True
-) -> List[Dict]:
+    bloque: int = 500,
+    tiempo_limite_ms: Optional[float] = None,
+    paciencia: Optional[int] = None,
+    recalentar_tras: Optional[int] = None,
+    callback: Optional[Callable[[int, float, Optional[Estado]], Optional[bool]]] = None
+) -> Tuple[Estado, List[Dict]]:
+    """
+    Corre varias cadenas de recocido en un pool de procesos y devuelve el mejor
+    Estado junto con un informe por cadena (semilla, mejor energía y traza).
 
-    piezas_total = []
-    for pieza in modelo.piezas:
-        piezas_total.extend([pieza] * cantidad_deseada)
+    Sin `intercambio` las cadenas son arranques independientes, la cadena k usa
+    la semilla `semilla + k`. Con `intercambio` se hace parallel tempering: cada
+    réplica corre a temperatura fija, entre `temp_inicial` y
+    `temp_inicial * enfriamiento ** max_iter`, en tramos de `bloque` iteraciones,
+    y al final de cada tramo las réplicas vecinas intercambian estados con el
+    criterio de Metropolis.
 
-    estado_actual = Estado(piezas_total, inventario)
-    mejor_estado = estado_actual.clonar()
-    temp = temp_inicial
+    `tiempo_limite_ms` acota el tiempo de pared de todas las cadenas juntas:
+    se fija un único plazo al empezar, así que las que esperan turno en el
+    pool (o corren una tras otra con `workers` <= 1) sólo usan lo que queda.
+    `paciencia` y `recalentar_tras` sólo aplican a los arranques independientes.
 
-    for iteracion in range(max_iter):
-        nuevo_estado = estado_actual.clonar()
-        nuevo_estado.mutar()
+    `callback(iteracion, energia, estado)` recibe como mucho cada
+    INTERVALO_CALLBACK segundos las iteraciones sumadas de todas las cadenas
+    y la mejor energía vista; `estado` es la mejor solución cuando mejoró
+    (al terminar una cadena o un tramo de tempering) y None en los latidos.
+    Si devuelve True se cortan todas las cadenas y se devuelve lo mejor
+    encontrado hasta ahí.
+    """
+    if max_iter is None and tiempo_limite_ms is None:
+        raise ValueError("Se requiere max_iter o tiempo_limite_ms")
+    if semilla is None:
+        semilla = random.randrange(2 ** 32)
+    semillas = [semilla + k for k in range(cadenas)]
+    workers = min(workers or os.cpu_count() or 1, cadenas)
+    # Reloj de pared y no perf_counter: el plazo se compara en otros procesos
+    limite = time.time() + tiempo_limite_ms / 1000 if tiempo_limite_ms is not None else None
 
-        delta_e = nuevo_estado.energia() - estado_actual.energia()
-        if delta_e < 0 or random.random() < math.exp(-delta_e / temp):
-            estado_actual = nuevo_estado
-            if estado_actual.energia() < mejor_estado.energia():
-                mejor_estado = estado_actual.clonar()
+    if not intercambio:
+        controles = dict(limite=limite, paciencia=paciencia, recalentar_tras=recalentar_tras)
+        argumentos = [
+            (modelo, inventario, cantidad_deseada, s, max_iter, temp_inicial, enfriamiento, controles)
+            for s in semillas
+        ]
+        if workers <= 1:
+            salidas = _cadenas_en_serie(argumentos, callback)
+        else:
+            salidas = _cadenas_en_pool(argumentos, workers, callback)
+        informe = [
+            {"cadena": k, "semilla": s, "mejor_energia": estado.energia(), "traza": traza}
+            for k, (s, (estado, traza)) in enumerate(zip(semillas, salidas))
+        ]
+        mejor = min((estado for estado, _ in salidas), key=lambda e: e.energia())
+        return mejor, informe
 
-        temp *= enfriamiento
-        if debug and iteracion % 100 == 0:
-            print(f"Iteración {iteracion}, Energía: {estado_actual.energia():.2f}, Mejor: {mejor_estado.energia():.2f}")
+    base = Estado(modelo.piezas, inventario, multiplicidad=cantidad_deseada)
+    if workers <= 1:
+        return _templado_paralelo(
+            None, base, semillas, max_iter, temp_inicial, enfriamiento, bloque, limite, callback
+        )
+    # Un único pool para todas las rondas; cada proceso arma su Estado base una vez
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_iniciar_replicas,
+        initargs=(modelo, inventario, cantidad_deseada)
+    ) as pool:
+        return _templado_paralelo(
+            pool, base, semillas, max_iter, temp_inicial, enfriamiento, bloque, limite, callback
+        )
+
+
+def _cadenas_en_serie(argumentos, callback) -> List[Tuple[Estado, List[float]]]:
+    """Arranques uno tras otro en este proceso; tras un corte no se empiezan los que faltan."""
+    salidas = []
+    mejor_energia = math.inf
+    hechas = 0
+    cortado = False
+
+    def informar(iteracion, energia, estado):
+        nonlocal cortado
+        total = hechas + max(iteracion, 0)
+        if energia < mejor_energia:
+            cortado = bool(callback(total, energia, estado))
+        else:
+            cortado = bool(callback(total, mejor_energia, None))
+        return cortado
+
+    for a in argumentos:
+        estado, traza = _cadena_independiente(*a, callback=informar if callback is not None else None)
+        salidas.append((estado, traza))
+        mejor_energia = min(mejor_energia, estado.energia())
+        # La traza tiene una muestra cada MUESTREO_ENERGIA iteraciones
+        hechas += len(traza) * MUESTREO_ENERGIA
+        if cortado:
+            break
+    return salidas
+
+
+def _cadenas_en_pool(argumentos, workers, callback) -> List[Tuple[Estado, List[float]]]:
+    """
+    Arranques en un pool de procesos. Los workers publican su avance en
+    arreglos compartidos y miran un Event para cortar; este proceso lo lee
+    para el callback mientras espera.
+    """
+    import multiprocessing
+
+    cadenas = len(argumentos)
+    cancelar = multiprocessing.Event()
+    energias = multiprocessing.Array("d", [math.inf] * cadenas, lock=False)
+    iteraciones = multiprocessing.Array("q", cadenas, lock=False)
+    salidas: List[Optional[Tuple[Estado, List[float]]]] = [None] * cadenas
+    mejor_energia = math.inf
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_iniciar_cadenas, initargs=(cancelar, energias, iteraciones)
+    ) as pool:
+        pendientes = {pool.submit(_cadena_en_pool, k, *a): k for k, a in enumerate(argumentos)}
+        while pendientes:
+            hechos, _ = wait(
+                pendientes, timeout=INTERVALO_CALLBACK if callback is not None else None,
+                return_when=FIRST_COMPLETED
+            )
+            mejor_estado = None
+            for futuro in hechos:
+                k = pendientes.pop(futuro)
+                salidas[k] = futuro.result()
+                if salidas[k][0].energia() < mejor_energia:
+                    mejor_estado = salidas[k][0]
+                    mejor_energia = mejor_estado.energia()
+            if callback is not None and not cancelar.is_set():
+                energia = min(mejor_energia, min(energias))
+                if callback(sum(iteraciones), energia, mejor_estado):
+                    cancelar.set()
+    return salidas
+
+
+def _templado_paralelo(
+    pool, base, semillas, max_iter, temp_inicial, enfriamiento, bloque, limite, callback=None
+):
+    cadenas = len(semillas)
 
+    # Escalera geométrica de temperaturas, de la más caliente a la más fría
+    if max_iter is None:
+        temp_final = temp_inicial * TEMP_MINIMA_RELATIVA
+    else:
+        temp_final = max(temp_inicial * enfriamiento ** max_iter, 1e-9)
+    razon = (temp_final / temp_inicial) ** (1 / max(cadenas - 1, 1))
+    temps = [temp_inicial * razon ** k for k in range(cadenas)]
+
+    rng = random.Random(semillas[0])
+    asignaciones = [None] * cadenas
+    energias = [math.inf] * cadenas
+    trazas = [[] for _ in range(cadenas)]
+    mejores = [math.inf] * cadenas
+    mejor_energia, mejor_asignacion = math.inf, None
+    ultimo_callback = 0.0
+    sin_informar = False
+
+    rondas = max(1, math.ceil(max_iter / bloque)) if max_iter is not None else None
+    ronda = 0
+    while rondas is None or ronda < rondas:
+        if limite is not None and ronda and time.time() >= limite:
+            break
+        argumentos = [
+            (asignaciones[k], semillas[k] * 1000003 + ronda, bloque, temps[k])
+            for k in range(cadenas)
+        ]
+        if pool is None:
+            salidas = [_tramo_replica(*a, base=base) for a in argumentos]
+        else:
+            salidas = list(pool.map(_tramo_replica, *zip(*argumentos)))
+
+        for k, (asignacion, energia, mejor_k, asignacion_k, traza) in enumerate(salidas):
+            asignaciones[k], energias[k] = asignacion, energia
+            trazas[k].extend(traza)
+            mejores[k] = min(mejores[k], mejor_k)
+            if mejor_k < mejor_energia:
+                mejor_energia, mejor_asignacion = mejor_k, asignacion_k
+                sin_informar = True
+
+        for k in range(ronda % 2, cadenas - 1, 2):
+            exponente = (1 / temps[k] - 1 / temps[k + 1]) * (energias[k] - energias[k + 1])
+            if exponente >= 0 or rng.random() < math.exp(exponente):
+                asignaciones[k], asignaciones[k + 1] = asignaciones[k + 1], asignaciones[k]
+                energias[k], energias[k + 1] = energias[k + 1], energias[k]
+        ronda += 1
+
+        if callback is not None and time.perf_counter() - ultimo_callback >= INTERVALO_CALLBACK:
+            # Cada tramo restaura su asignación: se puede prestar `base` al callback
+            mejor_estado = None
+            if sin_informar:
+                base.restaurar(mejor_asignacion)
+                mejor_estado, sin_informar = base, False
+            ultimo_callback = time.perf_counter()
+            if callback(ronda * bloque * cadenas, mejor_energia, mejor_estado):
+                break
+
+    base.restaurar(mejor_asignacion)
+    informe = [
+        {"cadena": k, "semilla": semillas[k], "temperatura": temps[k],
+         "mejor_energia": mejores[k], "traza": trazas[k]}
+        for k in range(cadenas)
+    ]
+    return base, informe
+
+
+def formatear_resultado(estado: Estado, cantidad_deseada: int) -> List[Dict]:
     # Armar resultado por tablero
     resultados = []
-    for i, piezas in mejor_estado.asignacion.items():
-        if piezas:
-            tablero = inventario[i]
-            piezas_formato = []
-            contador = {}
-            for p in piezas:
-                key = p.codigo
-                contador[key] = contador.get(key, 0) + 1
-            for cod, qty in contador.items():
-                piezas_formato.append({
-                    "codigo": tablero.codigo,
-                    "color": tablero.color,
-                    "largo": tablero.largo,
-                    "ancho": tablero.ancho,
-                    "espesor": tablero.espesor,
-                    "pieza_modelo_codigo": cod,
-                    "cantidad_req": qty
-                })
-            resultados.append(piezas_formato)
+    for i in np.flatnonzero(estado.asignacion.any(axis=1)).tolist():
+        tablero = estado.tableros[i]
+        piezas_formato = []
+        contador = {}
+        fila = estado.asignacion[i]
+        for tipo in np.flatnonzero(fila).tolist():
+            key = estado.piezas[tipo].codigo
+            contador[key] = contador.get(key, 0) + int(fila[tipo])
+        for cod, qty in contador.items():
+            piezas_formato.append({
+                "codigo": tablero.codigo,
+                "color": tablero.color,
+                "largo": tablero.largo,
+                "ancho": tablero.ancho,
+                "espesor": tablero.espesor,
+                "pieza_modelo_codigo": cod,
+                "cantidad_req": qty
+            })
+        resultados.append(piezas_formato)
+
+    fabricables = min(
+        [(d - f) // n for d, f, n in zip(estado.demanda, estado.sin_asignar, estado.por_unidad) if n > 0],
+        default=cantidad_deseada
+    )
 
     return [{
         "color":              "Global",
         "cantidadSolicitada": cantidad_deseada,
-        "cantidadFabricable": cantidad_deseada,
+        "cantidadFabricable": min(fabricables, cantidad_deseada),
         "piezasUtilizadas":   resultados
     }]
+
+
+def simulated_annealing_optimize(
+    modelo: ModeloMueble,
+    inventario: Inventario,
+    cantidad_deseada: int,
+    max_iter: Optional[int] = 1000,
+    temp_inicial: float = 1000.0,
+    enfriamiento: float = 0.95,
+    debug: bool = False,
+    semilla: Optional[int] = None,
+    cadenas: int = 1,
+    workers: Optional[int] = None,
+    intercambio: bool = False,
+    tiempo_limite_ms: Optional[float] = None,
+    paciencia: Optional[int] = None,
+    recalentar_tras: Optional[int] = None,
+    callback: Optional[Callable[[int, float, Optional[Estado]], Optional[bool]]] = None,
+    instrumentacion: Instrumentacion = NULA
+) -> List[Dict]:
+    """
+    Recocido simulado sobre todas las piezas del pedido. Con `debug` el
+    avance va a `logging` en nivel DEBUG.
+
+    Con `tiempo_limite_ms` la corrida es "anytime": `max_iter` puede ser None y
+    el enfriamiento se ajusta para terminar frío al agotar el tiempo. Con
+    `recalentar_tras` la temperatura sube de nuevo tras ese número de
+    iteraciones sin mejora, y con `paciencia` la corrida se corta.
+    `callback(iteracion, energia, estado)` recibe cada nueva mejor solución
+    (como mucho cada INTERVALO_CALLBACK segundos, más una llamada final); el
+    estado sigue cambiando después, así que hay que copiarlo o pasarlo por
+    `formatear_resultado` dentro del callback. Además recibe un latido
+    periódico, con `estado` None salvo que haya una mejora todavía sin
+    informar. Si devuelve True la corrida se corta y se devuelve la mejor
+    solución encontrada hasta ahí. Con `cadenas` > 1 vale lo mismo, pero la
+    mejor solución llega al terminar cada cadena o tramo (ver
+    `ejecutar_cadenas`).
+
+    `instrumentacion` junta tiempos por fase, movimientos propuestos y
+    aceptados, tasa de aceptación y la traza de energía muestreada. Con
+    `cadenas` > 1 las cadenas corren en otros procesos y sólo se registran
+    los tiempos y la mejor energía de cada una.
+    """
+    if max_iter is None and tiempo_limite_ms is None:
+        raise ValueError("Se requiere max_iter o tiempo_limite_ms")
+
+    if cadenas > 1:
+        with instrumentacion.medir("cadenas"):
+            estado, informe = ejecutar_cadenas(
+                modelo, inventario, cantidad_deseada,
+                cadenas=cadenas, semilla=semilla, workers=workers, intercambio=intercambio,
+                max_iter=max_iter, temp_inicial=temp_inicial, enfriamiento=enfriamiento,
+                tiempo_limite_ms=tiempo_limite_ms, paciencia=paciencia, recalentar_tras=recalentar_tras,
+                callback=callback
+            )
+        for cadena in informe:
+            instrumentacion.fijar(f"mejor_energia_cadena_{cadena['cadena']}", cadena["mejor_energia"])
+    else:
+        with instrumentacion.medir("inicializacion"):
+            estado = Estado(modelo.piezas, inventario, random.Random(semilla), cantidad_deseada)
+        _, mejor_asignacion = _recocer(
+            estado, max_iter, temp_inicial, enfriamiento, debug,
+            tiempo_limite_ms=tiempo_limite_ms, paciencia=paciencia,
+            recalentar_tras=recalentar_tras, callback=callback, instrumentacion=instrumentacion
+        )
+        if mejor_asignacion is not None:
+            estado.restaurar(mejor_asignacion)
+
+    if callback is not None:
+        callback(-1, estado.energia(), estado)
+    with instrumentacion.medir("armado_resultado"):
+        resultado = formatear_resultado(estado, cantidad_deseada)
+    instrumentacion.fijar("energia_final", estado.energia())
+    return resultado
@@ -0,0 +1,110 @@
+# optimizador/metricas.py
+
+import json
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Instrumentacion:
+    """
+    Contadores, tiempos por fase, valores sueltos y series de una corrida.
+
+    Los motores reciben una instancia y sólo la tocan fuera de los bucles
+    internos o detrás de `activa`, así que la instancia NULA (la de por
+    defecto) no cuesta nada. `resumen()` devuelve un dict serializable.
+    """
+    activa = True
+
+    def __init__(self):
+        self.contadores: Dict[str, int] = {}
+        self.tiempos: Dict[str, float] = {}
+        self.valores: Dict[str, float] = {}
+        self.series: Dict[str, List[float]] = {}
+
+    def contar(self, nombre: str, n: int = 1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def sumar_tiempo(self, nombre: str, segundos: float):
+        self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + segundos
+
+    @contextmanager
+    def medir(self, nombre: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sumar_tiempo(nombre, time.perf_counter() - inicio)
+
+    def fijar(self, nombre: str, valor: float):
+        self.valores[nombre] = valor
+
+    def serie(self, nombre: str) -> List[float]:
+        """Lista donde agregar muestras de una serie (p. ej. la energía)."""
+        return self.series.setdefault(nombre, [])
+
+    def combinar(self, otro: Dict):
+        """Suma el `resumen()` de otra instrumentación (p. ej. de un proceso del pool)."""
+        for nombre, n in otro.get("contadores", {}).items():
+            self.contar(nombre, n)
+        for nombre, s in otro.get("tiempos", {}).items():
+            self.sumar_tiempo(nombre, s)
+        self.valores.update(otro.get("valores", {}))
+        for nombre, muestras in otro.get("series", {}).items():
+            self.serie(nombre).extend(muestras)
+
+    def resumen(self) -> Dict:
+        return {
+            "contadores": dict(self.contadores),
+            "tiempos": {k: round(v, 6) for k, v in self.tiempos.items()},
+            "valores": dict(self.valores),
+            "series": {k: list(v) for k, v in self.series.items()},
+        }
+
+    def a_json(self, ruta: str):
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(self.resumen(), f, indent=2, ensure_ascii=False)
+
+    def a_logging(self, destino: Optional[logging.Logger] = None, nivel: int = logging.INFO):
+        """Un mensaje por métrica; las series se resumen en cantidad de muestras y último valor."""
+        destino = destino or logger
+        for nombre, n in sorted(self.contadores.items()):
+            destino.log(nivel, "%s: %d", nombre, n)
+        for nombre, s in sorted(self.tiempos.items()):
+            destino.log(nivel, "%s: %.3f s", nombre, s)
+        for nombre, v in sorted(self.valores.items()):
+            destino.log(nivel, "%s: %s", nombre, v)
+        for nombre, muestras in sorted(self.series.items()):
+            destino.log(nivel, "%s: %d muestras, última %s", nombre, len(muestras), muestras[-1] if muestras else None)
+
+
+class _InstrumentacionNula(Instrumentacion):
+    activa = False
+
+    def __init__(self):
+        super().__init__()
+
+    def contar(self, nombre, n=1):
+        pass
+
+    def sumar_tiempo(self, nombre, segundos):
+        pass
+
+    def medir(self, nombre):
+        return nullcontext()
+
+    def fijar(self, nombre, valor):
+        pass
+
+    def serie(self, nombre):
+        # Lista descartable: lo que se agregue no queda registrado
+        return []
+
+    def combinar(self, otro):
+        pass
+
+
+NULA = _InstrumentacionNula()
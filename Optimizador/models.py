@@ -1,9 +1,10 @@
 # optimizador/models.py
 
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
 
-@dataclass
+@dataclass(slots=True)
 class PiezaInventario:
     codigo: str
     ancho: float
@@ -12,7 +13,7 @@ class PiezaInventario:
     espesor: Optional[float]
     cantidad: int
 
-@dataclass
+@dataclass(slots=True)
 class PiezaModelo:
     codigo: str
     ancho: float
@@ -20,8 +21,130 @@ class PiezaModelo:
     espesor: Optional[float]
     cantidad: int
 
-@dataclass
+@dataclass(slots=True)
 class ModeloMueble:
     id: int
     nombre: str
-    piezas: List[PiezaModelo]
\ No newline at end of file
+    piezas: List[PiezaModelo]
+
+# ── Variantes inmutables (hashables, seguras para compartir) ─────────
+
+@dataclass(frozen=True, slots=True)
+class PiezaInventarioFija:
+    codigo: str
+    ancho: float
+    largo: float
+    color: str
+    espesor: Optional[float]
+    cantidad: int
+
+@dataclass(frozen=True, slots=True)
+class PiezaModeloFija:
+    codigo: str
+    ancho: float
+    largo: float
+    espesor: Optional[float]
+    cantidad: int
+
+@dataclass(frozen=True, slots=True)
+class ModeloMuebleFijo:
+    id: int
+    nombre: str
+    piezas: Tuple[PiezaModeloFija, ...]
+
+    @classmethod
+    def desde(cls, modelo: ModeloMueble) -> "ModeloMuebleFijo":
+        return cls(
+            id=modelo.id,
+            nombre=modelo.nombre,
+            piezas=tuple(
+                PiezaModeloFija(p.codigo, p.ancho, p.largo, p.espesor, p.cantidad)
+                for p in modelo.piezas
+            )
+        )
+
+# ── Inventario en columnas ────────────────────────────────────────────
+
+@dataclass(slots=True)
+class ArreglosInventario:
+    """
+    Inventario como struct-of-arrays: una columna por campo en lugar de un
+    objeto por sobrante. Un espesor None se guarda como NaN. `codigo` puede
+    ser cualquier secuencia de str (p. ej. la columna perezosa de
+    `optimizador.columnar`).
+    """
+    codigo: Sequence[str]
+    color: List[str]
+    ancho: np.ndarray
+    largo: np.ndarray
+    espesor: np.ndarray
+    cantidad: np.ndarray
+
+    @classmethod
+    def desde_piezas(cls, inventario: List[PiezaInventario]) -> "ArreglosInventario":
+        return cls(
+            codigo=[p.codigo for p in inventario],
+            color=[p.color for p in inventario],
+            ancho=np.array([p.ancho for p in inventario], dtype=float),
+            largo=np.array([p.largo for p in inventario], dtype=float),
+            espesor=np.array([np.nan if p.espesor is None else p.espesor for p in inventario], dtype=float),
+            cantidad=np.array([p.cantidad for p in inventario], dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.codigo)
+
+    def pieza(self, i: int) -> PiezaInventario:
+        espesor = float(self.espesor[i])
+        return PiezaInventario(
+            codigo=self.codigo[i],
+            ancho=float(self.ancho[i]),
+            largo=float(self.largo[i]),
+            color=self.color[i],
+            espesor=None if np.isnan(espesor) else espesor,
+            cantidad=int(self.cantidad[i]),
+        )
+
+    def seleccionar(self, mascara: np.ndarray) -> "ArreglosInventario":
+        """Los sobrantes donde `mascara` es verdadera, en el mismo orden."""
+        idx = np.flatnonzero(mascara).tolist()
+        tomar = getattr(self.codigo, "tomar", None)
+        return ArreglosInventario(
+            codigo=tomar(idx) if tomar is not None else [self.codigo[i] for i in idx],
+            color=[self.color[i] for i in idx],
+            ancho=self.ancho[idx],
+            largo=self.largo[idx],
+            espesor=self.espesor[idx],
+            cantidad=self.cantidad[idx],
+        )
+
+    def a_piezas(self) -> List[PiezaInventario]:
+        return [self.pieza(i) for i in range(len(self))]
+
+    def areas_por_color(self) -> Dict[str, float]:
+        """Área total de stock (ancho × largo × cantidad) de cada color."""
+        areas: Dict[str, float] = {}
+        for color, area in zip(self.color, (self.ancho * self.largo * self.cantidad).tolist()):
+            areas[color] = areas.get(color, 0) + area
+        return areas
+
+
+# Los motores aceptan el inventario como lista de sobrantes o ya en columnas
+Inventario = Union[List[PiezaInventario], ArreglosInventario]
+
+
+def colores_de(inventario: Inventario) -> List[str]:
+    """Colores presentes en el inventario, ordenados."""
+    colores = inventario.color if isinstance(inventario, ArreglosInventario) else (p.color for p in inventario)
+    return sorted(set(colores))
+
+
+def separar_por_color(inventario: Inventario) -> Dict[str, Inventario]:
+    """El inventario de cada color, en el orden original y en la misma forma (lista o columnas)."""
+    if isinstance(inventario, ArreglosInventario):
+        colores = np.array(inventario.color, dtype=object)
+        return {c: inventario.seleccionar(colores == c) for c in colores_de(inventario)}
+    por_color: Dict[str, List[PiezaInventario]] = {}
+    for p in inventario:
+        por_color.setdefault(p.color, []).append(p)
+    return por_color
@@ -0,0 +1,108 @@
+# optimizador/pedidos.py
+
+import json
+from dataclasses import MISSING, asdict, dataclass, fields
+from typing import Dict, Iterable, List, Optional, Union
+from optimizador.encaje import MatrizEncaje
+from optimizador.indice import InventoryIndex
+from optimizador.logic import optimizar_color
+from optimizador.metricas import NULA, Instrumentacion
+from optimizador.models import ArreglosInventario, ModeloMueble, PiezaInventario
+
+
+@dataclass
+class Pedido:
+    modelo_id: int
+    cantidad: int
+    prioridad: int = 1          # 1 es la más alta; a igual prioridad, orden de llegada
+    color: Optional[str] = None
+    id: Optional[str] = None
+
+
+def leer_pedidos(ruta: str) -> List[Pedido]:
+    """
+    Pedidos de un .json (lista de objetos) o .jsonl (un objeto por línea).
+
+    Un campo que falta o que `Pedido` no conoce es ValueError con el índice
+    del pedido y el nombre del campo.
+    """
+    with open(ruta, "r", encoding="utf-8") as f:
+        if ruta.lower().endswith(".jsonl"):
+            datos = [json.loads(linea) for linea in f if linea.strip()]
+        else:
+            datos = json.load(f)
+    campos = {c.name: c for c in fields(Pedido)}
+    obligatorios = [c.name for c in campos.values() if c.default is MISSING]
+    pedidos = []
+    for i, d in enumerate(datos):
+        if not isinstance(d, dict):
+            raise ValueError(f"Pedido {i}: se esperaba un objeto JSON")
+        faltan = [c for c in obligatorios if c not in d]
+        if faltan:
+            raise ValueError(f"Pedido {i}: falta el campo '{faltan[0]}'")
+        sobran = [c for c in d if c not in campos]
+        if sobran:
+            raise ValueError(f"Pedido {i}: campo desconocido '{sobran[0]}'")
+        pedidos.append(Pedido(**d))
+    return pedidos
+
+
+def optimizar_pedidos(
+    pedidos: Iterable[Pedido],
+    modelos: Union[Dict[int, ModeloMueble], Iterable[ModeloMueble]],
+    inventario: Union[List[PiezaInventario], ArreglosInventario],
+    debug: bool = False,
+    patrones: bool = True,
+    instrumentacion: Instrumentacion = NULA
+) -> Dict:
+    """
+    Resuelve una lista de pedidos contra un único índice de inventario.
+
+    Los pedidos se atienden por prioridad (1 primero) y, a igual prioridad, en
+    el orden recibido; cada uno consume del mismo índice, así que los de menor
+    prioridad usan lo que dejaron los anteriores. Igual que
+    `optimizar_por_color`, un pedido sin `color` pide su cantidad en cada
+    color. El índice y la matriz de encaje de cada modelo se arman una sola
+    vez. Devuelve la asignación de cada pedido y el inventario restante.
+    """
+    if not isinstance(modelos, dict):
+        modelos = {m.id: m for m in modelos}
+
+    with instrumentacion.medir("indice"):
+        indice = InventoryIndex(inventario)
+    columnas = indice.columnas()
+    colores = indice.colores()
+    encajes: Dict[int, MatrizEncaje] = {}
+
+    ordenados = sorted(enumerate(pedidos), key=lambda par: (par[1].prioridad, par[0]))
+    salida = []
+    for posicion, pedido in ordenados:
+        modelo = modelos.get(pedido.modelo_id)
+        if modelo is None:
+            raise ValueError(f"Pedido {pedido.id or posicion}: modelo con id={pedido.modelo_id} no encontrado")
+        if pedido.modelo_id not in encajes:
+            with instrumentacion.medir("encaje"):
+                encajes[pedido.modelo_id] = MatrizEncaje(modelo.piezas, columnas)
+
+        resultados = [
+            optimizar_color(
+                modelo, indice, encajes[pedido.modelo_id], color, pedido.cantidad, debug, patrones,
+                instrumentacion=instrumentacion
+            )
+            for color in ([pedido.color] if pedido.color is not None else colores)
+        ]
+        instrumentacion.contar("pedidos")
+        salida.append({
+            "pedido": pedido.id if pedido.id is not None else posicion,
+            "modelo_id": modelo.id,
+            "modelo": modelo.nombre,
+            "prioridad": pedido.prioridad,
+            "cantidadSolicitada": pedido.cantidad,
+            "cantidadFabricable": sum(r["cantidadFabricable"] for r in resultados),
+            "resultados": resultados,
+        })
+
+    return {
+        "pedidos": salida,
+        "inventarioRestante": [asdict(p) for p in indice.restantes()],
+    }
@@ -0,0 +1,173 @@
+# optimizador/ranking.py
+
+from typing import Dict, List, Optional, Union
+import numpy as np
+from optimizador.encaje import MatrizEncaje, columnas_medidas
+from optimizador.indice import InventoryIndex
+from optimizador.logic import optimizar_color
+from optimizador.metricas import NULA, Instrumentacion
+from optimizador.models import ArreglosInventario, ModeloMueble, PiezaInventario
+
+# Celdas pieza × tablero por bloque al calcular las cotas (acota la memoria)
+MAX_CELDAS_BLOQUE = 4_000_000
+
+
+def cotas_modelos(
+    modelos: List[ModeloMueble],
+    columnas: ArreglosInventario,
+    colores: List[str],
+    codigo_color: np.ndarray
+) -> np.ndarray:
+    """
+    Cota superior de unidades de cada modelo en cada color (modelos × colores),
+    sin correr el motor. Se arma una sola matriz de encaje con las piezas de
+    todos los modelos contra todos los tableros y se cruza con el área de
+    stock de cada color:
+
+    - dominancia de medidas: una pieza que no entra (ni rotada) en ningún
+      tablero del color deja su área disponible en cero;
+    - área por tipo de pieza: las unidades no superan el área de los tableros
+      donde entra esa pieza dividida por el área que el tipo pide por unidad;
+    - área total: ni el área de los tableros que admiten alguna pieza del
+      modelo dividida por el área de un mueble.
+
+    El motor clásico sólo usa un tablero si admite una pieza pendiente y no
+    pone en él más área que la suya, así que la cota nunca queda por debajo
+    del máximo real.
+    """
+    n_colores = len(colores)
+    cotas = np.zeros((len(modelos), n_colores), dtype=np.int64)
+    # Área de stock de cada tablero, repartida en la columna de su color
+    por_color = np.zeros((len(codigo_color), n_colores))
+    por_color[np.arange(len(codigo_color)), codigo_color] = columnas.ancho * columnas.largo * columnas.cantidad
+    t_ancho, t_largo, t_esp = (c[None, :] for c in columnas_medidas(columnas))
+
+    por_bloque = max(1, MAX_CELDAS_BLOQUE // max(len(codigo_color), 1))
+    inicio = 0
+    while inicio < len(modelos):
+        # Bloque de modelos enteros: cada uno necesita todas sus filas juntas
+        fin, filas = inicio, 0
+        while fin < len(modelos) and (fin == inicio or filas + len(modelos[fin].piezas) <= por_bloque):
+            filas += len(modelos[fin].piezas)
+            fin += 1
+        # Una pieza sin área entra en cualquier tablero; un modelo sin ninguna con área
+        # no se puede evaluar (como en `cantidad_maxima`) y queda con cota 0
+        bloque = [
+            (m, [p for p in modelos[m].piezas if p.cantidad > 0 and p.ancho * p.largo > 0])
+            for m in range(inicio, fin)
+        ]
+        bloque = [(m, piezas) for m, piezas in bloque if piezas]
+        inicio = fin
+        if not bloque:
+            continue
+
+        piezas = [p for _, ps in bloque for p in ps]
+        p_ancho, p_largo, p_esp = (c[:, None] for c in columnas_medidas(piezas))
+        valida = (
+            ((p_ancho <= t_ancho) & (p_largo <= t_largo)) | ((p_largo <= t_ancho) & (p_ancho <= t_largo))
+        ) & (np.isnan(p_esp) | np.isnan(t_esp) | np.isclose(p_esp, t_esp))
+
+        arranques = np.cumsum([0] + [len(ps) for _, ps in bloque[:-1]])
+        pedido = np.array([p.ancho * p.largo * p.cantidad for p in piezas])
+        # Se suma un margen para que un cociente exacto no caiga una unidad por redondeo
+        por_pieza = np.floor(valida.astype(float) @ por_color / pedido[:, None] + 1e-9)
+        por_tipo = np.minimum.reduceat(por_pieza, arranques, axis=0)
+        utiles = np.logical_or.reduceat(valida, arranques, axis=0).astype(float) @ por_color
+        area_mueble = np.add.reduceat(pedido, arranques)
+        por_area = np.floor(utiles / area_mueble[:, None] + 1e-9)
+
+        filas_modelo = [m for m, _ in bloque]
+        cotas[filas_modelo] = np.minimum(por_tipo, por_area).astype(np.int64)
+    return cotas
+
+
+def ranking_modelos(
+    modelos: List[ModeloMueble],
+    inventario: Union[List[PiezaInventario], ArreglosInventario],
+    limite: Optional[int] = None,
+    instrumentacion: Instrumentacion = NULA
+) -> List[Dict]:
+    """
+    Qué se puede fabricar con el inventario actual: todos los modelos del
+    catálogo ordenados por unidades fabricables (y, a igual cantidad, por
+    menor desperdicio).
+
+    Las cotas de `cotas_modelos` descartan sin correr el motor los modelos
+    (y colores) que no pueden armar ni una unidad. El resto se evalúa con el
+    motor clásico, de mayor a menor cota, pidiendo la cota como cantidad:
+    igual que en `cantidad_maxima`, el resultado es el máximo exacto. Todos
+    usan un mismo índice, que se repone después de cada modelo. Con `limite`
+    se devuelven sólo los primeros y se deja de evaluar cuando la cota del
+    siguiente ya no alcanza a los que están en la lista.
+
+    Por modelo: unidades totales y por color, tableros consumidos, su área y
+    el desperdicio estimado (área de los tableros menos la de las piezas).
+    """
+    if not isinstance(inventario, ArreglosInventario):
+        inventario = ArreglosInventario.desde_piezas(inventario)
+    columnas = inventario.seleccionar(inventario.cantidad > 0)
+    colores, codigo_color = np.unique(np.array(columnas.color, dtype=object), return_inverse=True)
+    colores = colores.tolist()
+
+    with instrumentacion.medir("total"):
+        with instrumentacion.medir("cotas"):
+            cotas = cotas_modelos(modelos, columnas, colores, codigo_color)
+        totales = cotas.sum(axis=1)
+        candidatos = sorted((m for m in range(len(modelos)) if totales[m] > 0), key=lambda m: (-totales[m], m))
+        instrumentacion.contar("modelos_descartados", len(modelos) - len(candidatos))
+
+        with instrumentacion.medir("indice"):
+            indice = InventoryIndex(columnas)
+        area = np.array(indice.area)
+        ranking = []
+        for m in candidatos:
+            if limite is not None and len(ranking) >= limite:
+                # A igual cantidad todavía podría ganar por desperdicio: sólo se corta si no llega
+                ultimo = sorted(r["cantidadFabricable"] for r in ranking)[-limite]
+                if totales[m] < ultimo:
+                    break
+            modelo = modelos[m]
+            with instrumentacion.medir("encaje"):
+                # Las medidas del índice son las de `columnas`: sólo cambian las cantidades
+                encaje = MatrizEncaje(modelo.piezas, columnas)
+            antes = np.array(indice.cantidades)
+            por_color = {}
+            for c in np.flatnonzero(cotas[m]).tolist():
+                resultado = optimizar_color(
+                    modelo, indice, encaje, colores[c], int(cotas[m, c]), False, True, False,
+                    instrumentacion=instrumentacion
+                )
+                if resultado["cantidadFabricable"]:
+                    por_color[resultado["color"]] = resultado["cantidadFabricable"]
+            instrumentacion.contar("modelos_evaluados")
+
+            # Se repone lo consumido: el próximo modelo parte del mismo inventario
+            usados = antes - np.array(indice.cantidades)
+            for pos in np.flatnonzero(usados).tolist():
+                indice.reponer(pos, int(usados[pos]))
+
+            unidades = sum(por_color.values())
+            area_tableros = float(usados @ area)
+            desperdicio = area_tableros - unidades * sum(p.ancho * p.largo * p.cantidad for p in modelo.piezas if p.cantidad > 0)
+            ranking.append({
+                "modelo_id": modelo.id,
+                "modelo": modelo.nombre,
+                "cotaSuperior": int(totales[m]),
+                "cantidadFabricable": unidades,
+                "porColor": por_color,
+                "tablerosConsumidos": int(usados.sum()),
+                "areaTableros": round(area_tableros, 1),
+                "desperdicio": round(desperdicio, 1),
+                "desperdicioPct": round(100 * desperdicio / area_tableros, 2) if area_tableros else 0.0,
+            })
+
+        for m in range(len(modelos)):
+            if totales[m] == 0:
+                ranking.append({
+                    "modelo_id": modelos[m].id, "modelo": modelos[m].nombre, "cotaSuperior": 0,
+                    "cantidadFabricable": 0, "porColor": {}, "tablerosConsumidos": 0,
+                    "areaTableros": 0.0, "desperdicio": 0.0, "desperdicioPct": 0.0,
+                })
+
+    ranking.sort(key=lambda r: (-r["cantidadFabricable"], r["desperdicioPct"], r["modelo_id"]))
+    return ranking[:limite] if limite is not None else ranking
@@ -0,0 +1,167 @@
+# optimizador/recortes.py
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from optimizador.almacen import Almacen
+from optimizador.indice import InventoryIndex
+from optimizador.logic_guillotina import KERF, Libres, colocar
+from optimizador.models import ModeloMueble, PiezaInventario
+
+# Un recorte con algún lado menor que esto (mm) no vale la pena guardarlo
+LADO_MINIMO = 100.0
+
+# (código, color, ancho, largo, espesor): la misma clave que usan el almacén y el índice
+Clave = Tuple[str, str, float, float, Optional[float]]
+
+
+@dataclass
+class DeltaInventario:
+    consumos: Dict[Clave, int] = field(default_factory=dict)
+    recortes: List[PiezaInventario] = field(default_factory=list)
+
+    @property
+    def tableros(self) -> int:
+        return sum(self.consumos.values())
+
+
+@dataclass
+class TableroPlan:
+    """
+    Un tablero que consume el plan: la clave de su sobrante, las piezas que
+    lleva (código, ancho, largo) y, si el motor las dio, las colocaciones
+    (código, x, y, ancho, largo) y los libres (x, y, ancho, largo).
+    """
+    color: str
+    clave: Clave
+    piezas: List[Tuple[str, float, float]] = field(default_factory=list)
+    colocaciones: List[Tuple[str, float, float, float, float]] = field(default_factory=list)
+    libres: Optional[List[Tuple[float, float, float, float]]] = None
+
+
+def tableros_plan(resultado: List[Dict], modelo: ModeloMueble) -> List[TableroPlan]:
+    """
+    Los tableros de un resultado, reconocidos por la clave `tablero` de cada
+    entrada: en la guillotina numera los tableros del color (una unidad
+    puede seguir en el tablero de la anterior) y sus libres vienen en
+    `libres`; en el clásico numera los de cada unidad y en el recocido cada
+    lote es un tablero.
+    """
+    piezas = {}
+    for p in modelo.piezas:
+        piezas.setdefault(p.codigo, p)
+
+    salida = []
+    for c, res in enumerate(resultado):
+        compartidos = "libres" in res
+        tableros: Dict[tuple, TableroPlan] = {}
+        for l, lote in enumerate(res["piezasUtilizadas"]):
+            for entrada in lote:
+                id_tablero = entrada.get("tablero", 0) if compartidos else (l, entrada.get("tablero", 0))
+                tablero = tableros.get(id_tablero)
+                if tablero is None:
+                    clave = (entrada["codigo"], entrada["color"], entrada["ancho"], entrada["largo"], entrada["espesor"])
+                    tablero = tableros[id_tablero] = TableroPlan(res["color"], clave, libres=[] if compartidos else None)
+                codigo = entrada["pieza_modelo_codigo"]
+                pieza = piezas.get(codigo)
+                if pieza is None:
+                    raise ValueError(f"La pieza {codigo} no es del modelo '{modelo.nombre}'")
+                tablero.piezas.extend([(codigo, pieza.ancho, pieza.largo)] * entrada["cantidad_req"])
+                tablero.colocaciones.extend(
+                    (codigo, co["x"], co["y"], co["ancho"], co["largo"]) for co in entrada.get("colocaciones", ())
+                )
+        for libre in res.get("libres", []):
+            if libre["tablero"] in tableros:
+                tableros[libre["tablero"]].libres.append((libre["x"], libre["y"], libre["ancho"], libre["largo"]))
+        salida.extend(tableros.values())
+    return salida
+
+
+def _reempacar(
+    ancho: float, largo: float, piezas: List[Tuple[str, float, float]], kerf: float
+) -> Optional[Tuple[List[Tuple[str, float, float, float, float]], List[Tuple[float, float, float, float]]]]:
+    """
+    Ubica `piezas` en un tablero con cortes de guillotina y devuelve sus
+    colocaciones y los rectángulos libres. Los motores sin coordenadas
+    (clásico, recocido) sólo dicen qué va en cada tablero; si no hay forma
+    de cortarlo devuelve None y no se promete ningún recorte.
+    """
+    libres = Libres()
+    libres.agregar(0, 0.0, 0.0, ancho, largo, None)
+    minimo = min(min(w, h) for _, w, h in piezas)
+    colocaciones = []
+    for codigo, w, h in sorted(piezas, key=lambda p: (-p[1] * p[2], -max(p[1], p[2]))):
+        r = libres.mejor_ajuste(None, w, h)
+        if r is None:
+            return None
+        (x, y, cw, ch, _), _ = colocar(libres, r, w, h, kerf, minimo)
+        colocaciones.append((codigo, x, y, cw, ch))
+    sobrantes = [(libres.x[r], libres.y[r], libres.ancho[r], libres.largo[r]) for r in range(len(libres.x)) if libres.libre[r]]
+    return colocaciones, sobrantes
+
+
+def distribucion(
+    tablero: TableroPlan, kerf: float = KERF
+) -> Optional[Tuple[List[Tuple[str, float, float, float, float]], List[Tuple[float, float, float, float]]]]:
+    """Colocaciones y libres del tablero: las del motor si las dio, si no las de reubicar sus piezas."""
+    if tablero.libres is not None:
+        return tablero.colocaciones, tablero.libres
+    return _reempacar(tablero.clave[2], tablero.clave[3], tablero.piezas, kerf)
+
+
+def delta_plan(
+    resultado: List[Dict],
+    modelo: ModeloMueble,
+    kerf: float = KERF,
+    lado_minimo: float = LADO_MINIMO
+) -> DeltaInventario:
+    """
+    Tableros que consume un resultado y recortes que deja, sin tocar nada.
+    Los recortes son los libres de cada tablero (ver `distribucion`) con
+    ambos lados de al menos `lado_minimo`.
+    """
+    delta = DeltaInventario()
+    medidas: Dict[Clave, int] = {}
+    for tablero in tableros_plan(resultado, modelo):
+        clave = tablero.clave
+        delta.consumos[clave] = delta.consumos.get(clave, 0) + 1
+        distribuido = distribucion(tablero, kerf)
+        for _, _, ancho, largo in (distribuido[1] if distribuido is not None else ()):
+            if min(ancho, largo) >= lado_minimo:
+                nueva = (f"{clave[0]}-R", clave[1], round(ancho, 1), round(largo, 1), clave[4])
+                medidas[nueva] = medidas.get(nueva, 0) + 1
+
+    delta.recortes = [
+        PiezaInventario(codigo=cod, ancho=an, largo=la, color=col, espesor=esp, cantidad=n)
+        for (cod, col, an, la, esp), n in medidas.items()
+    ]
+    return delta
+
+
+def aplicar_en_indice(indice: InventoryIndex, delta: DeltaInventario):
+    """Descuenta los tableros y suma los recortes en el índice, sin rearmarlo."""
+    for clave, n in delta.consumos.items():
+        indice.descontar(clave, n)
+    for pieza in delta.recortes:
+        indice.sumar(pieza)
+
+
+def confirmar_plan(
+    resultado: List[Dict],
+    modelo: ModeloMueble,
+    almacen: Optional[Almacen] = None,
+    indice: Optional[InventoryIndex] = None,
+    kerf: float = KERF,
+    lado_minimo: float = LADO_MINIMO
+) -> DeltaInventario:
+    """
+    Da por aceptado un resultado: descuenta los tableros que usa y devuelve
+    al inventario los recortes aprovechables, en el almacén (una
+    transacción) y/o en un índice ya armado, como cambios puntuales y no
+    rearmando el inventario. Devuelve el delta aplicado.
+    """
+    delta = delta_plan(resultado, modelo, kerf, lado_minimo)
+    if almacen is not None:
+        almacen.aplicar_consumo(delta.consumos, delta.recortes)
+    if indice is not None:
+        aplicar_en_indice(indice, delta)
+    return delta
@@ -0,0 +1,280 @@
+# optimizador/reportes.py
+
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from optimizador.cache import normalizar_modelo
+from optimizador.logic_guillotina import KERF
+from optimizador.models import ModeloMueble
+from optimizador.recortes import TableroPlan, distribucion, tableros_plan
+
+# fpdf y openpyxl se importan al armar cada formato: sólo los paga quien exporta
+
+# Tamaño de la caché de reportes (bytes del archivo generado)
+MAX_BYTES_REPORTES = 32 * 1024 * 1024
+# Dibujos de tableros recordados entre reportes
+MAX_DIAGRAMAS = 4096
+
+COLUMNAS = (
+    "Código tablero", "Color", "Ancho (mm)", "Largo (mm)", "Espesor (mm)",
+    "Cantidad requerida", "Pieza del modelo", "Tablero",
+)
+_ANCHOS_PDF = (28, 24, 20, 20, 20, 22, 40, 16)
+
+# Caja de cada diagrama en el PDF (mm): dos por página A4
+_CAJA_ANCHO, _CAJA_ALTO = 190.0, 110.0
+
+# (tipo, x, y, ancho, alto, texto) en mm relativos a la caja; tipo "tablero", "pieza" o "libre"
+Primitiva = Tuple[str, float, float, float, float, str]
+
+
+def filas_piezas(resultado: List[Dict]) -> List[Tuple]:
+    """Una fila por entrada de cada lote, con las columnas de `COLUMNAS`."""
+    return [
+        (e["codigo"], e["color"], e["ancho"], e["largo"], e["espesor"], e["cantidad_req"],
+         e["pieza_modelo_codigo"], e.get("tablero"))
+        for res in resultado for lote in res["piezasUtilizadas"] for e in lote
+    ]
+
+
+def huella_resultado(resultado: List[Dict], modelo: ModeloMueble, **opciones) -> str:
+    """Hash SHA-256 del resultado, el modelo y las opciones del reporte."""
+    texto = json.dumps(
+        {"resultado": resultado, "modelo": normalizar_modelo(modelo), "opciones": opciones},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _firma(tablero: TableroPlan, kerf: float) -> tuple:
+    # Dos tableros con la misma firma se cortan igual: se dibujan una vez
+    clave = tablero.clave
+    if tablero.libres is None:
+        return (clave, tuple(sorted(tablero.piezas)), kerf)
+    return (clave, tuple(tablero.colocaciones), tuple(tablero.libres))
+
+
+def _agrupar(tableros: List[TableroPlan], kerf: float) -> List[Tuple[tuple, TableroPlan, int]]:
+    """Tableros iguales juntos, en el orden de su primera aparición: (firma, tablero, veces)."""
+    grupos: Dict[tuple, List] = {}
+    for tablero in tableros:
+        firma = _firma(tablero, kerf)
+        if firma in grupos:
+            grupos[firma][2] += 1
+        else:
+            grupos[firma] = [firma, tablero, 1]
+    return [tuple(g) for g in grupos.values()]
+
+
+def _texto(valor) -> str:
+    # Las fuentes estándar de fpdf sólo cubren latin-1
+    return str(valor).encode("latin-1", "replace").decode("latin-1")
+
+
+def _medida(x: float) -> str:
+    return f"{x:g}"
+
+
+def _dibujar(pdf, x0: float, y0: float, primitivas: List[Primitiva]):
+    colores = {"tablero": (255, 255, 255), "libre": (235, 235, 235), "pieza": (200, 220, 240)}
+    pdf.set_font("Arial", size=6)
+    for tipo, x, y, w, h, texto in primitivas:
+        pdf.set_fill_color(*colores[tipo])
+        pdf.rect(x0 + x, y0 + y, w, h, "DF")
+        # La etiqueta va sólo si entra en la pieza
+        if texto and pdf.get_string_width(texto) + 2 <= w and h >= 3:
+            pdf.text(x0 + x + 1, y0 + y + min(h / 2 + 1, 4), _texto(texto))
+
+
+class GeneradorReportes:
+    """
+    Exportación de resultados a PDF y Excel bajo demanda.
+
+    Cada archivo se arma en memoria y se guarda en un LRU acotado por bytes,
+    con la huella del resultado como clave: volver a pedir el mismo reporte
+    no lo regenera. Los diagramas de corte se dibujan por tablero y quedan
+    recordados por su firma (sobrante y piezas, o coordenadas si el motor
+    las dio), así que los tableros repetidos dentro de un plan o entre
+    reportes no se vuelven a distribuir ni a dibujar. Es seguro compartirlo
+    entre hilos.
+    """
+    def __init__(self, max_bytes: int = MAX_BYTES_REPORTES, max_diagramas: int = MAX_DIAGRAMAS):
+        self.max_bytes = max_bytes
+        self.max_diagramas = max_diagramas
+        self.aciertos = 0
+        self.fallos = 0
+        self.diagramas_dibujados = 0
+        self._reportes: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._diagramas: "OrderedDict[tuple, Tuple[Optional[tuple], List[Primitiva]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ── Caché ─────────────────────────────────────────────────────────
+
+    def _reporte(self, formato: str, armar, resultado: List[Dict], modelo: ModeloMueble, **opciones) -> bytes:
+        clave = f"{formato}:{huella_resultado(resultado, modelo, **opciones)}"
+        with self._lock:
+            datos = self._reportes.get(clave)
+            if datos is not None:
+                self._reportes.move_to_end(clave)
+                self.aciertos += 1
+                return datos
+            self.fallos += 1
+
+        datos = armar(resultado, modelo, **opciones)
+        with self._lock:
+            if clave not in self._reportes and len(datos) <= self.max_bytes:
+                self._reportes[clave] = datos
+                self._bytes += len(datos)
+                while self._bytes > self.max_bytes:
+                    _, viejo = self._reportes.popitem(last=False)
+                    self._bytes -= len(viejo)
+        return datos
+
+    def _diagrama(self, firma: tuple, tablero: TableroPlan, kerf: float) -> Tuple[Optional[tuple], List[Primitiva]]:
+        """Distribución del tablero y su dibujo escalado a la caja del PDF."""
+        with self._lock:
+            guardado = self._diagramas.get(firma)
+            if guardado is not None:
+                self._diagramas.move_to_end(firma)
+                return guardado
+
+        distribuido = distribucion(tablero, kerf)
+        ancho, largo = tablero.clave[2], tablero.clave[3]
+        # El lado largo del tablero va horizontal
+        girar = largo > ancho
+        if girar:
+            ancho, largo = largo, ancho
+        escala = min(_CAJA_ANCHO / ancho, (_CAJA_ALTO - 10) / largo) if ancho > 0 and largo > 0 else 0.0
+
+        def rect(tipo, x, y, w, h, texto=""):
+            if girar:
+                x, y, w, h = y, x, h, w
+            return (tipo, x * escala, y * escala, w * escala, h * escala, texto)
+
+        primitivas = [rect("tablero", 0.0, 0.0, *((largo, ancho) if girar else (ancho, largo)))]
+        if distribuido is not None:
+            colocaciones, libres = distribuido
+            primitivas.extend(rect("libre", x, y, w, h) for x, y, w, h in libres)
+            primitivas.extend(
+                rect("pieza", x, y, w, h, f"{codigo} {_medida(w)}x{_medida(h)}") for codigo, x, y, w, h in colocaciones
+            )
+
+        guardado = (distribuido, primitivas)
+        with self._lock:
+            self.diagramas_dibujados += 1
+            self._diagramas[firma] = guardado
+            while len(self._diagramas) > self.max_diagramas:
+                self._diagramas.popitem(last=False)
+        return guardado
+
+    def limpiar(self):
+        with self._lock:
+            self._reportes.clear()
+            self._bytes = 0
+            self._diagramas.clear()
+
+    # ── Formatos ──────────────────────────────────────────────────────
+
+    def pdf(self, resultado: List[Dict], modelo: ModeloMueble, diagramas: bool = True, kerf: float = KERF) -> bytes:
+        """Listado de piezas y, con `diagramas`, un diagrama por tablero distinto."""
+        return self._reporte("pdf", self._armar_pdf, resultado, modelo, diagramas=diagramas, kerf=kerf)
+
+    def xlsx(self, resultado: List[Dict], modelo: ModeloMueble, diagramas: bool = True, kerf: float = KERF) -> bytes:
+        """Hojas Resumen, Piezas y Tableros; con `diagramas`, también Cortes (coordenadas)."""
+        return self._reporte("xlsx", self._armar_xlsx, resultado, modelo, diagramas=diagramas, kerf=kerf)
+
+    def _armar_pdf(self, resultado: List[Dict], modelo: ModeloMueble, diagramas: bool, kerf: float) -> bytes:
+        from fpdf import FPDF
+
+        pdf = FPDF()
+        pdf.set_auto_page_break(True, margin=10)
+        pdf.add_page()
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 10, _texto(f"Listado de piezas optimizadas - {modelo.nombre}"), ln=1, align="C")
+        pdf.set_font("Arial", size=9)
+        for res in resultado:
+            pdf.cell(0, 6, _texto(
+                f"{res['color']}: {res['cantidadFabricable']} de {res['cantidadSolicitada']} unidades"
+            ), ln=1)
+        pdf.ln(4)
+
+        pdf.set_font("Arial", "B", 7)
+        for columna, ancho in zip(COLUMNAS, _ANCHOS_PDF):
+            pdf.cell(ancho, 7, _texto(columna), border=1)
+        pdf.ln()
+        pdf.set_font("Arial", size=7)
+        for fila in filas_piezas(resultado):
+            for valor, ancho in zip(fila, _ANCHOS_PDF):
+                pdf.cell(ancho, 6, _texto("" if valor is None else valor), border=1)
+            pdf.ln()
+
+        if diagramas:
+            for n, (firma, tablero, veces) in enumerate(_agrupar(tableros_plan(resultado, modelo), kerf), 1):
+                distribuido, primitivas = self._diagrama(firma, tablero, kerf)
+                if n % 2 == 1:
+                    pdf.add_page()
+                x0, y0 = pdf.l_margin, pdf.t_margin + (0 if n % 2 == 1 else _CAJA_ALTO + 10)
+                codigo, color, ancho, largo, espesor = tablero.clave
+                pdf.set_xy(x0, y0)
+                pdf.set_font("Arial", "B", 9)
+                pdf.cell(0, 6, _texto(
+                    f"Tablero {n}: {codigo} ({color}) {_medida(ancho)}x{_medida(largo)} mm"
+                    + (f" - se repite {veces} veces" if veces > 1 else "")
+                ), ln=1)
+                _dibujar(pdf, x0, y0 + 8, primitivas)
+                if distribuido is None:
+                    pdf.set_xy(x0, y0 + 8)
+                    pdf.set_font("Arial", size=8)
+                    pdf.cell(0, 6, _texto(
+                        "Sin distribución de cortes; piezas: " + ", ".join(sorted({c for c, _, _ in tablero.piezas}))
+                    ))
+
+        datos = pdf.output(dest="S")
+        # fpdf 1.7 devuelve str (latin-1); fpdf2, bytes
+        return datos.encode("latin-1") if isinstance(datos, str) else bytes(datos)
+
+    def _armar_xlsx(self, resultado: List[Dict], modelo: ModeloMueble, diagramas: bool, kerf: float) -> bytes:
+        from openpyxl import Workbook
+
+        libro = Workbook(write_only=True)
+        resumen = libro.create_sheet("Resumen")
+        resumen.append(["Modelo", "Color", "Cantidad solicitada", "Cantidad fabricable"])
+        for res in resultado:
+            resumen.append([modelo.nombre, res["color"], res["cantidadSolicitada"], res["cantidadFabricable"]])
+
+        piezas = libro.create_sheet("Piezas")
+        piezas.append(list(COLUMNAS))
+        for fila in filas_piezas(resultado):
+            piezas.append(list(fila))
+
+        grupos = _agrupar(tableros_plan(resultado, modelo), kerf)
+        hoja = libro.create_sheet("Tableros")
+        hoja.append(["Tablero", "Código", "Color", "Ancho (mm)", "Largo (mm)", "Espesor (mm)",
+                     "Veces", "Piezas", "Aprovechamiento (%)"])
+        for n, (_, tablero, veces) in enumerate(grupos, 1):
+            codigo, color, ancho, largo, espesor = tablero.clave
+            area_piezas = sum(w * h for _, w, h in tablero.piezas)
+            hoja.append([n, codigo, color, ancho, largo, espesor, veces, len(tablero.piezas),
+                         round(100 * area_piezas / (ancho * largo), 2) if ancho * largo else None])
+
+        if diagramas:
+            cortes = libro.create_sheet("Cortes")
+            cortes.append(["Tablero", "Tipo", "Pieza", "X (mm)", "Y (mm)", "Ancho (mm)", "Largo (mm)"])
+            for n, (firma, tablero, _) in enumerate(grupos, 1):
+                distribuido, _ = self._diagrama(firma, tablero, kerf)
+                if distribuido is None:
+                    continue
+                colocaciones, libres = distribuido
+                for codigo, x, y, w, h in colocaciones:
+                    cortes.append([n, "pieza", codigo, x, y, w, h])
+                for x, y, w, h in libres:
+                    cortes.append([n, "libre", None, x, y, w, h])
+
+        buffer = io.BytesIO()
+        libro.save(buffer)
+        return buffer.getvalue()
+
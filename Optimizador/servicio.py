@@ -0,0 +1,396 @@
+# optimizador/servicio.py
+
+import asyncio
+import json
+import logging
+import os
+import pickle
+import shutil
+import signal
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+from optimizador.almacen import Almacen
+from optimizador.cache import CacheResultados, huella_archivos
+from optimizador.models import ModeloMueble, PiezaInventario, PiezaModelo
+from optimizador.recortes import delta_plan
+from optimizador.tandas import resolver
+
+logger = logging.getLogger(__name__)
+
+# Cambios que se reenvían a los workers antes de pasar a una generación nueva
+MAX_CAMBIOS = 64
+MAX_CUERPO = 64 * 1024 * 1024
+
+_RAZONES = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+# ── Vista de cada worker del pool ─────────────────────────────────────
+# Sobrantes por id (en orden de alta) y modelos de la generación vigente,
+# más los cambios ya aplicados sobre ella.
+_generacion: Optional[int] = None
+_aplicados = 0
+_piezas: Dict[int, PiezaInventario] = {}
+_lista: Optional[List[PiezaInventario]] = None
+_modelos: Dict[int, ModeloMueble] = {}
+_cache: Optional[CacheResultados] = None
+_huellas: Dict[Optional[str], str] = {}
+
+
+def _iniciar_worker(ruta_db: str, directorio_cache: Optional[str]):
+    global _cache
+    _cache = CacheResultados(directorio=directorio_cache, fuentes=(ruta_db,)) if directorio_cache else None
+
+
+def _aplicar(tipo: str, datos):
+    if tipo == "sobrantes":
+        for id, pieza in datos:
+            _piezas.setdefault(id, pieza)
+    elif tipo == "eliminar_sobrantes":
+        for id in datos:
+            _piezas.pop(id, None)
+    elif tipo == "modelo":
+        _modelos[datos.id] = datos
+    elif tipo == "eliminar_modelos":
+        for id in datos:
+            _modelos.pop(id, None)
+    elif tipo == "confirmacion":
+        cantidades, insertados = datos
+        for id, cantidad in cantidades.items():
+            if cantidad <= 0:
+                _piezas.pop(id, None)
+            elif id in _piezas:
+                _piezas[id] = replace(_piezas[id], cantidad=cantidad)
+        for id, pieza in insertados:
+            _piezas.setdefault(id, pieza)
+
+
+def _sincronizar(ruta_foto: str, generacion: int, cambios: List[Tuple[str, object]]):
+    """
+    Pone la vista del worker al día: carga la foto de la generación si es
+    otra y aplica los cambios que todavía no vio. Los ids nuevos siempre son
+    mayores, así que el dict conserva el orden de alta.
+    """
+    global _generacion, _aplicados, _piezas, _lista, _modelos, _huellas
+    if generacion != _generacion:
+        with open(ruta_foto, "rb") as f:
+            _piezas, _modelos = pickle.load(f)
+        _generacion, _aplicados, _lista = generacion, 0, None
+    if _aplicados < len(cambios):
+        for tipo, datos in cambios[_aplicados:]:
+            _aplicar(tipo, datos)
+        _aplicados, _lista = len(cambios), None
+    if _lista is None:
+        # Con los sobrantes cambian las huellas de inventario de la caché
+        _lista, _huellas = list(_piezas.values()), {}
+
+
+def _atender(ruta_foto: str, generacion: int, cambios: List[Tuple[str, object]], solicitud: Dict):
+    _sincronizar(ruta_foto, generacion, cambios)
+    return resolver(solicitud, _modelos, _lista, _cache, _huellas)
+
+
+# ── Servicio ──────────────────────────────────────────────────────────
+
+def _modelo_de_dict(datos: Dict) -> ModeloMueble:
+    try:
+        return ModeloMueble(
+            id=int(datos["id"]),
+            nombre=str(datos["nombre"]),
+            piezas=[PiezaModelo(**p) for p in datos["piezas"]]
+        )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Modelo inválido: {e}")
+
+
+def _pieza_de_dict(datos: Dict) -> PiezaInventario:
+    try:
+        return PiezaInventario(**datos)
+    except TypeError as e:
+        raise ValueError(f"Sobrante inválido: {e}")
+
+
+class ServicioOptimizador:
+    """
+    Servicio HTTP local que mantiene modelos y sobrantes cargados.
+
+    El frente es asyncio y sólo enruta; las optimizaciones corren en un pool
+    de procesos cuyos workers guardan su propia copia de los datos. Esa
+    copia parte de una foto de la base (una por generación) y se pone al día
+    con los cambios hechos por el servicio, que se reenvían con cada pedido
+    y se aplican por id, sin recargar. Si la base cambia por fuera (la app
+    de Streamlit, una importación) o se acumulan demasiados cambios, se
+    toma una foto nueva. El índice de sobrantes se arma en cada corrida,
+    porque el motor lo consume.
+
+    Todo lo que bloquea fuera del motor (SQLite, las huellas del archivo,
+    escribir la foto) corre en un único hilo de datos, así que el loop sigue
+    atendiendo mientras tanto y esos pasos no se pisan entre sí. Cada pedido
+    reserva la foto de su generación hasta que termina; una foto vieja se
+    borra recién cuando ningún pedido en curso la usa.
+
+    Rutas (JSON): GET /estado, POST /optimizar, POST /maximo,
+    POST /ranking, POST /sobrantes, DELETE /sobrantes, PUT /modelos, DELETE /modelos,
+    POST /confirmar.
+    """
+    def __init__(self, ruta_db: str, directorio_cache: Optional[str] = None, workers: Optional[int] = None):
+        self.ruta_db = ruta_db
+        self.almacen = Almacen(ruta_db)
+        self.workers = workers or os.cpu_count() or 1
+        self.generacion = 0
+        self.cambios: List[Tuple[str, object]] = []
+        self._huella: Optional[str] = None
+        self._fotos = tempfile.mkdtemp(prefix="optimizador-servicio-")
+        self._con_foto: set = set()
+        self._en_uso: Dict[int, int] = {}
+        self._datos = ThreadPoolExecutor(max_workers=1, thread_name_prefix="servicio-datos")
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_iniciar_worker, initargs=(ruta_db, directorio_cache)
+        )
+        self._rutas = {
+            ("GET", "/estado"): self._estado,
+            ("POST", "/optimizar"): self._optimizar,
+            ("POST", "/maximo"): self._maximo,
+            ("POST", "/ranking"): self._ranking,
+            ("POST", "/sobrantes"): self._agregar_sobrantes,
+            ("DELETE", "/sobrantes"): self._eliminar_sobrantes,
+            ("PUT", "/modelos"): self._guardar_modelo,
+            ("DELETE", "/modelos"): self._eliminar_modelos,
+            ("POST", "/confirmar"): self._confirmar,
+        }
+
+    def _ruta_foto(self, generacion: int) -> str:
+        return os.path.join(self._fotos, f"{generacion}.pickle")
+
+    async def _en_hilo(self, funcion, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._datos, funcion, *args)
+
+    # ── Hilo de datos ─────────────────────────────────────────────────
+
+    def _nueva_generacion(self):
+        # La huella se toma antes de leer: un cambio posterior se detecta
+        self._huella = huella_archivos((self.ruta_db,))
+        piezas = {
+            f["id"]: PiezaInventario(f["codigo"], f["ancho"], f["largo"], f["color"], f["espesor"], f["cantidad"])
+            for f in self.almacen.filas_sobrantes()
+        }
+        modelos = {m.id: m for m in self.almacen.modelos()}
+        self.generacion += 1
+        self.cambios = []
+        with open(self._ruta_foto(self.generacion), "wb") as f:
+            pickle.dump((piezas, modelos), f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._con_foto.add(self.generacion)
+        self._podar_fotos()
+        logger.info("Generación %d: %d sobrantes, %d modelos", self.generacion, len(piezas), len(modelos))
+
+    def _podar_fotos(self):
+        # Las fotos viejas quedan mientras algún pedido en curso las use
+        for generacion in [g for g in self._con_foto if g != self.generacion and g not in self._en_uso]:
+            os.remove(self._ruta_foto(generacion))
+            self._con_foto.discard(generacion)
+
+    def _vigente(self):
+        if self._huella != huella_archivos((self.ruta_db,)) or len(self.cambios) > MAX_CAMBIOS:
+            self._nueva_generacion()
+
+    def _reservar(self) -> Tuple[str, int, List[Tuple[str, object]]]:
+        """Foto, generación y cambios vigentes para un pedido; la foto queda reservada hasta `_liberar`."""
+        self._vigente()
+        self._en_uso[self.generacion] = self._en_uso.get(self.generacion, 0) + 1
+        return self._ruta_foto(self.generacion), self.generacion, list(self.cambios)
+
+    def _liberar(self, generacion: int):
+        self._en_uso[generacion] -= 1
+        if not self._en_uso[generacion]:
+            del self._en_uso[generacion]
+            self._podar_fotos()
+
+    def _editar(self, tipo: str, aplicar):
+        """
+        Corre `aplicar` (que edita la base y devuelve el cambio) y registra
+        el cambio para los workers. Si la base ya había cambiado por fuera,
+        en cambio, arranca una generación nueva.
+        """
+        externa = self._huella != huella_archivos((self.ruta_db,))
+        datos = aplicar()
+        if externa:
+            self._nueva_generacion()
+        else:
+            self.cambios.append((tipo, datos))
+            self._huella = huella_archivos((self.ruta_db,))
+        return datos
+
+    def _estado_actual(self) -> Dict:
+        self._vigente()
+        return {
+            "generacion": self.generacion,
+            "cambios": len(self.cambios),
+            "sobrantes": self.almacen.cantidad_sobrantes(),
+            "workers": self.workers,
+        }
+
+    async def _correr(self, solicitud: Dict):
+        ruta_foto, generacion, cambios = await self._en_hilo(self._reservar)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pool, _atender, ruta_foto, generacion, cambios, solicitud
+            )
+        finally:
+            # Sin esperar: también se libera si el pedido se cancela
+            self._datos.submit(self._liberar, generacion)
+
+    # ── Rutas ─────────────────────────────────────────────────────────
+
+    async def _estado(self, cuerpo: Dict):
+        return await self._en_hilo(self._estado_actual)
+
+    async def _optimizar(self, cuerpo: Dict):
+        return await self._correr({**cuerpo, "max": False})
+
+    async def _maximo(self, cuerpo: Dict):
+        return await self._correr({**cuerpo, "max": True})
+
+    async def _ranking(self, cuerpo: Dict):
+        return await self._correr({**cuerpo, "ranking": True})
+
+    async def _agregar_sobrantes(self, cuerpo: Dict):
+        piezas = [_pieza_de_dict(p) for p in cuerpo.get("piezas", [])]
+
+        def agregar():
+            return list(zip(self.almacen.insertar_sobrantes(piezas), piezas))
+        return {"ids": [id for id, _ in await self._en_hilo(self._editar, "sobrantes", agregar)]}
+
+    async def _eliminar_sobrantes(self, cuerpo: Dict):
+        ids = [int(i) for i in cuerpo.get("ids", [])]
+
+        def eliminar():
+            self.almacen.eliminar_sobrantes(ids)
+            return ids
+        return {"eliminados": len(await self._en_hilo(self._editar, "eliminar_sobrantes", eliminar))}
+
+    async def _guardar_modelo(self, cuerpo: Dict):
+        modelo = _modelo_de_dict(cuerpo)
+
+        def guardar():
+            self.almacen.guardar_modelo(modelo)
+            return modelo
+        return {"id": (await self._en_hilo(self._editar, "modelo", guardar)).id}
+
+    async def _eliminar_modelos(self, cuerpo: Dict):
+        ids = [int(i) for i in cuerpo.get("ids", [])]
+
+        def eliminar():
+            self.almacen.eliminar_modelos(ids)
+            return ids
+        return {"eliminados": len(await self._en_hilo(self._editar, "eliminar_modelos", eliminar))}
+
+    async def _confirmar(self, cuerpo: Dict):
+        def confirmar():
+            modelo = self.almacen.modelo(cuerpo.get("modelo_id"))
+            if modelo is None:
+                raise ValueError(f"Modelo con id={cuerpo.get('modelo_id')} no encontrado")
+            opciones = {k: float(cuerpo[k]) for k in ("kerf", "lado_minimo") if cuerpo.get(k) is not None}
+            delta = delta_plan(cuerpo.get("resultado") or [], modelo, **opciones)
+            self._editar("confirmacion", lambda: self.almacen.aplicar_consumo(delta.consumos, delta.recortes))
+            return {"tableros": delta.tableros, "recortes": sum(r.cantidad for r in delta.recortes)}
+        return await self._en_hilo(confirmar)
+
+    # ── HTTP ──────────────────────────────────────────────────────────
+
+    async def _despachar(self, metodo: str, ruta: str, cuerpo: bytes) -> Tuple[int, object]:
+        manejador = self._rutas.get((metodo, ruta.split("?", 1)[0]))
+        if manejador is None:
+            return 404, {"error": f"Ruta desconocida: {metodo} {ruta}"}
+        try:
+            datos = json.loads(cuerpo) if cuerpo else {}
+            if not isinstance(datos, dict):
+                raise ValueError("Se esperaba un objeto JSON")
+            return 200, await manejador(datos)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            logger.exception("Error atendiendo %s %s", metodo, ruta)
+            return 500, {"error": str(e) or type(e).__name__}
+
+    async def _conexion(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        # HTTP/1.1 mínimo con conexiones persistentes: el cliente reusa la suya
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea.strip():
+                    break
+                metodo, ruta, _ = linea.decode("latin-1").split(" ", 2)
+                cabeceras = {}
+                while True:
+                    cabecera = await lector.readline()
+                    if cabecera in (b"\r\n", b"\n", b""):
+                        break
+                    nombre, _, valor = cabecera.decode("latin-1").partition(":")
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                largo = int(cabeceras.get("content-length", 0))
+                if largo > MAX_CUERPO:
+                    estado, respuesta = 413, {"error": "Cuerpo demasiado grande"}
+                    cabeceras["connection"] = "close"
+                else:
+                    cuerpo = await lector.readexactly(largo) if largo else b""
+                    estado, respuesta = await self._despachar(metodo, ruta, cuerpo)
+                datos = json.dumps(respuesta, ensure_ascii=False).encode("utf-8")
+                escritor.write(
+                    f"HTTP/1.1 {estado} {_RAZONES[estado]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(datos)}\r\n\r\n".encode("latin-1") + datos
+                )
+                await escritor.drain()
+                if cabeceras.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self, host: str = "127.0.0.1", puerto: int = 8765, unix: Optional[str] = None):
+        """Escucha en `host:puerto` o, con `unix`, en ese socket; corre hasta que se cancele."""
+        ruta_foto, generacion, _ = await self._en_hilo(self._reservar)
+        # Los workers cargan la foto antes del primer pedido
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*(
+                loop.run_in_executor(self._pool, _sincronizar, ruta_foto, generacion, [])
+                for _ in range(self.workers)
+            ))
+        finally:
+            self._datos.submit(self._liberar, generacion)
+        if unix:
+            servidor = await asyncio.start_unix_server(self._conexion, path=unix)
+            logger.info("Servicio escuchando en unix:%s", unix)
+        else:
+            servidor = await asyncio.start_server(self._conexion, host, puerto)
+            logger.info("Servicio escuchando en http://%s:%d", host, puerto)
+        async with servidor:
+            await servidor.serve_forever()
+
+    def cerrar(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._datos.shutdown(wait=True)
+        shutil.rmtree(self._fotos, ignore_errors=True)
+
+
+def servir(
+    ruta_db: str,
+    host: str = "127.0.0.1",
+    puerto: int = 8765,
+    unix: Optional[str] = None,
+    directorio_cache: Optional[str] = None,
+    workers: Optional[int] = None
+):
+    """Arranca el servicio y bloquea hasta Ctrl+C (o SIGTERM)."""
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    servicio = ServicioOptimizador(ruta_db, directorio_cache, workers)
+    try:
+        asyncio.run(servicio.servir(host, puerto, unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servicio.cerrar()
+        if unix and os.path.exists(unix):
+            os.remove(unix)
@@ -0,0 +1,161 @@
+# optimizador/tandas.py
+
+import json
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Parámetros que una solicitud no puede fijar: los pone el worker
+_PARAMETROS_RESERVADOS = ("debug", "workers", "callback", "instrumentacion")
+
+# Estado de cada proceso del pool, cargado una vez por `_iniciar_worker`
+_modelos: Dict = {}
+_sobrantes: list = []
+_cache = None
+_huellas: Dict = {}
+
+
+def _iniciar_worker(ruta_db: str, directorio_cache: Optional[str]):
+    """
+    Carga modelos y sobrantes de la base una sola vez por proceso. Los
+    imports del motor se hacen acá y no al importar el módulo, así el CLI
+    arranca sin ellos y cada worker los paga una vez.
+    """
+    global _modelos, _sobrantes, _cache, _huellas
+    from optimizador.almacen import Almacen
+    from optimizador.cache import CacheResultados
+    almacen = Almacen(ruta_db)
+    _modelos = {m.id: m for m in almacen.modelos()}
+    _sobrantes = almacen.sobrantes()
+    _cache = CacheResultados(directorio=directorio_cache, fuentes=(ruta_db,)) if directorio_cache else None
+    _huellas = {}
+
+
+def resolver(solicitud: Dict, modelos: Dict, sobrantes: List, cache=None, huellas: Optional[Dict] = None):
+    """
+    Resuelve una solicitud contra `modelos` (por id) y `sobrantes` en orden
+    de alta; los errores se propagan. `"sin_cache": true` saltea la caché.
+    `huellas` guarda la huella del inventario de cada color para la clave
+    de la caché; quien llama lo vacía cuando cambian los sobrantes.
+    `"ranking": true` (sin `modelo_id`, con `limite` opcional) ordena todo
+    el catálogo según lo que se puede fabricar.
+    """
+    from optimizador.cache import MOTOR_CLASICO, MOTOR_SA, huella_inventario, optimizar_cacheado
+    from optimizador.logic import cantidad_maxima
+
+    color = solicitud.get("color")
+    # Mismo orden de alta que `Almacen.sobrantes(color=...)`
+    inventario = sobrantes if color is None else [p for p in sobrantes if p.color == color]
+    if solicitud.get("ranking"):
+        from optimizador.ranking import ranking_modelos
+        return ranking_modelos(list(modelos.values()), inventario, limite=solicitud.get("limite"))
+
+    modelo = modelos.get(solicitud.get("modelo_id"))
+    if modelo is None:
+        raise ValueError(f"Modelo con id={solicitud.get('modelo_id')} no encontrado")
+
+    if solicitud.get("max"):
+        return cantidad_maxima(modelo, inventario)
+    cantidad = solicitud.get("cantidad")
+    if not isinstance(cantidad, int) or cantidad <= 0:
+        raise ValueError("Indica 'cantidad' (entero mayor que 0) o 'max'")
+    motor = solicitud.get("motor", MOTOR_CLASICO)
+    parametros = {k: v for k, v in (solicitud.get("parametros") or {}).items() if k not in _PARAMETROS_RESERVADOS}
+    if motor == MOTOR_SA:
+        # El paralelismo lo da el pool: las cadenas corren dentro del worker
+        parametros["workers"] = 1
+    if solicitud.get("sin_cache"):
+        cache = None
+    huella_inv = None
+    if cache is not None and huellas is not None:
+        huella_inv = huellas.get(color)
+        if huella_inv is None:
+            huella_inv = huellas[color] = huella_inventario(inventario)
+    return optimizar_cacheado(cache, motor, modelo, inventario, cantidad, huella_inv=huella_inv, **parametros)
+
+
+def _atender(linea: int, solicitud: Dict) -> Dict:
+    """Una línea de salida: `resultado` o `error`, con el id de la solicitud."""
+    salida = {"id": solicitud.get("id", linea), "linea": linea}
+    try:
+        salida["resultado"] = resolver(solicitud, _modelos, _sobrantes, _cache, _huellas)
+    except Exception as e:
+        salida["error"] = str(e) or type(e).__name__
+    return salida
+
+
+def leer_solicitudes(lineas: Iterable[str]) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """(número de línea, solicitud, error de lectura) por cada línea no vacía."""
+    for n, texto in enumerate(lineas, start=1):
+        if not texto.strip():
+            continue
+        try:
+            solicitud = json.loads(texto)
+        except json.JSONDecodeError as e:
+            yield n, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(solicitud, dict):
+            yield n, None, "Se esperaba un objeto JSON"
+            continue
+        yield n, solicitud, None
+
+
+def procesar_tanda(
+    lineas: Iterable[str],
+    salida: IO,
+    ruta_db: str,
+    directorio_cache: Optional[str] = None,
+    workers: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Resuelve solicitudes JSONL (`modelo_id`, `cantidad` o `max`, y
+    opcionales `id`, `color`, `motor`, `parametros` del motor y
+    `sin_cache`) y escribe una línea JSON por solicitud apenas termina, así
+    que la salida no sigue el orden de entrada: cada línea trae su `id` (o
+    su número de `linea`).
+
+    La entrada se lee a medida que se despacha, con a lo sumo dos
+    solicitudes por worker en vuelo, y la memoria no crece con el archivo.
+    Cada worker carga modelos y sobrantes una vez al arrancar; la base no
+    debería cambiar durante la tanda. Con `workers` <= 1 todo corre en este
+    proceso. Devuelve (resueltas, con error).
+    """
+    workers = workers or os.cpu_count() or 1
+    resueltas = errores = 0
+
+    def escribir(linea: Dict):
+        nonlocal resueltas, errores
+        if "error" in linea:
+            errores += 1
+        else:
+            resueltas += 1
+        salida.write(json.dumps(linea, ensure_ascii=False) + "\n")
+        salida.flush()
+
+    if workers <= 1:
+        _iniciar_worker(ruta_db, directorio_cache)
+        for n, solicitud, error in leer_solicitudes(lineas):
+            escribir(_atender(n, solicitud) if error is None else {"linea": n, "error": error})
+        return resueltas, errores
+
+    en_vuelo = set()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_iniciar_worker, initargs=(ruta_db, directorio_cache)
+    ) as pool:
+        for n, solicitud, error in leer_solicitudes(lineas):
+            if error is not None:
+                escribir({"linea": n, "error": error})
+                continue
+            en_vuelo.add(pool.submit(_atender, n, solicitud))
+            # Se escribe lo que ya terminó; sólo se espera con el cupo lleno
+            lleno = len(en_vuelo) >= 2 * workers
+            listos, en_vuelo = wait(en_vuelo, timeout=None if lleno else 0, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                escribir(futuro.result())
+        for futuro in as_completed(en_vuelo):
+            escribir(futuro.result())
+    logger.debug("Tanda con %d workers: %d resueltas, %d con error", workers, resueltas, errores)
+    return resueltas, errores
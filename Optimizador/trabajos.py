@@ -0,0 +1,163 @@
+# optimizador/trabajos.py
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from optimizador.cache import CacheResultados, MOTOR_CLASICO, MOTOR_GUILLOTINA, MOTOR_SA, optimizar_cacheado
+from optimizador.metricas import Instrumentacion
+from optimizador.models import ModeloMueble, PiezaInventario
+
+PENDIENTE = "pendiente"
+EJECUTANDO = "ejecutando"
+TERMINADO = "terminado"
+CANCELADO = "cancelado"
+ERROR = "error"
+
+
+class Trabajo:
+    """
+    Una optimización enviada al gestor.
+
+    `progreso` se actualiza desde el hilo del motor: en el recocido trae
+    iteración, mejor energía y unidades de la mejor solución; en el clásico
+    y la guillotina, color en curso y unidades armadas. `cancelar()` corta
+    la corrida y deja como resultado la mejor solución encontrada hasta ahí.
+    `metricas` es la instrumentación de la corrida; se lee recién cuando el
+    trabajo terminó.
+    """
+    def __init__(self, id: int, motor: str, cantidad: int):
+        self.id = id
+        self.motor = motor
+        self.cantidad = cantidad
+        self.estado = PENDIENTE
+        self.progreso: Dict = {}
+        self.mejor: Optional[List[Dict]] = None
+        self.resultado: Optional[List[Dict]] = None
+        self.error: Optional[BaseException] = None
+        self.metricas = Instrumentacion()
+        self.inicio: Optional[float] = None
+        self.fin: Optional[float] = None
+        self._cancelar = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self._cancelar.is_set()
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in (TERMINADO, CANCELADO, ERROR)
+
+    def instantanea(self) -> Dict:
+        """Copia consistente del estado para mostrar desde otro hilo."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "motor": self.motor,
+                "estado": self.estado,
+                "progreso": dict(self.progreso),
+                "segundos": (self.fin or time.perf_counter()) - self.inicio if self.inicio else 0.0,
+            }
+
+    def mejor_hasta_ahora(self) -> Optional[List[Dict]]:
+        """El resultado final si ya terminó; si no, la última mejor solución informada."""
+        with self._lock:
+            return self.resultado if self.resultado is not None else self.mejor
+
+    # ── Callbacks de los motores (hilo del trabajo) ──────────────────
+
+    def _avance_sa(self, iteracion, energia, estado) -> bool:
+        from optimizador.logic_opti5 import formatear_resultado
+        # formatear_resultado recorre el estado: sólo se llama con una mejora
+        mejor = formatear_resultado(estado, self.cantidad) if estado is not None else None
+        with self._lock:
+            self.progreso["iteracion"] = iteracion if iteracion >= 0 else self.progreso.get("iteracion", 0)
+            self.progreso["energia"] = energia
+            if mejor is not None:
+                self.mejor = mejor
+                self.progreso["fabricables"] = sum(r["cantidadFabricable"] for r in mejor)
+        return self.cancelado
+
+    def _avance_clasico(self, color, fabricables) -> bool:
+        with self._lock:
+            self.progreso["color"] = color
+            self.progreso["fabricables"] = fabricables
+        return self.cancelado
+
+
+class GestorTrabajos:
+    """
+    Corre optimizaciones en un pool de hilos para no bloquear al que las pide.
+
+    Se usan hilos y no procesos porque el avance y la cancelación se
+    comparten en memoria con el motor; el recocido con `cadenas` > 1 ya
+    reparte su trabajo en procesos propios. Pensado para vivir uno por
+    proceso (p. ej. con `st.cache_resource`) y ser compartido entre sesiones.
+    """
+    def __init__(self, max_workers: int = 2, cache: Optional[CacheResultados] = None):
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="optimizador")
+        self._trabajos: Dict[int, Trabajo] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def enviar(
+        self,
+        motor: str,
+        modelo: ModeloMueble,
+        inventario: List[PiezaInventario],
+        cantidad: int,
+        **parametros
+    ) -> Trabajo:
+        """Encola una corrida de `motor` ("clasico", "sa" o "guillotina") y devuelve su Trabajo."""
+        if motor not in (MOTOR_CLASICO, MOTOR_SA, MOTOR_GUILLOTINA):
+            raise ValueError(f"Motor desconocido: {motor!r}")
+        with self._lock:
+            trabajo = Trabajo(next(self._ids), motor, cantidad)
+            self._trabajos[trabajo.id] = trabajo
+        parametros["instrumentacion"] = trabajo.metricas
+        parametros["callback"] = trabajo._avance_sa if motor == MOTOR_SA else trabajo._avance_clasico
+        self._pool.submit(self._correr, trabajo, modelo, inventario, cantidad, parametros)
+        return trabajo
+
+    def _correr(self, trabajo: Trabajo, modelo, inventario, cantidad, parametros):
+        with trabajo._lock:
+            trabajo.inicio = time.perf_counter()
+            if trabajo.cancelado:
+                trabajo.estado, trabajo.fin = CANCELADO, trabajo.inicio
+                return
+            trabajo.estado = EJECUTANDO
+        try:
+            resultado = optimizar_cacheado(self.cache, trabajo.motor, modelo, inventario, cantidad, **parametros)
+        except Exception as e:
+            with trabajo._lock:
+                trabajo.error, trabajo.estado = e, ERROR
+                trabajo.fin = time.perf_counter()
+            return
+        with trabajo._lock:
+            trabajo.resultado = resultado
+            trabajo.estado = CANCELADO if trabajo.cancelado else TERMINADO
+            trabajo.fin = time.perf_counter()
+
+    def obtener(self, id: int) -> Optional[Trabajo]:
+        return self._trabajos.get(id)
+
+    def activos(self) -> List[Trabajo]:
+        return [t for t in self._trabajos.values() if not t.terminado]
+
+    def olvidar(self, id: int):
+        """Saca del registro un trabajo terminado (el resultado ya se consumió)."""
+        with self._lock:
+            trabajo = self._trabajos.get(id)
+            if trabajo is not None and trabajo.terminado:
+                del self._trabajos[id]
+
+    def cerrar(self):
+        for trabajo in self.activos():
+            trabajo.cancelar()
+        self._pool.shutdown(wait=True)
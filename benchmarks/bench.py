@@ -0,0 +1,200 @@
+# benchmarks/bench.py
+#
+# Uso, desde la raíz del repo:
+#   python -m benchmarks.bench correr --escenarios chico,mediano --salida bench.json
+#   python -m benchmarks.bench comparar antes.json despues.json
+
+import gc
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List
+import click
+import numpy as np
+from optimizador.logic import optimizar_por_color
+from optimizador.logic_guillotina import optimizar_guillotina
+from optimizador.logic_opti5 import simulated_annealing_optimize
+from optimizador.metricas import Instrumentacion
+from benchmarks.generadores import generar_inventario, generar_modelo
+
+MOTORES = ("clasico", "sa", "guillotina")
+
+# remanentes, colores, espesores, tipos de pieza, unidades (por color en el
+# clásico y la guillotina, en total en el recocido) y motores que lo corren
+ESCENARIOS: Dict[str, Dict] = {
+    "chico":   dict(sobrantes=10,      colores=2,  espesores=1, tipos=3,  unidades=1,      motores=MOTORES),
+    "mediano": dict(sobrantes=1_000,   colores=5,  espesores=2, tipos=6,  unidades=100,    motores=MOTORES),
+    "grande":  dict(sobrantes=10_000,  colores=8,  espesores=3, tipos=8,  unidades=1_000,  motores=MOTORES),
+    # El recocido expande cada copia de tablero: a esta escala sólo corre el clásico
+    "enorme":  dict(sobrantes=100_000, colores=12, espesores=3, tipos=12, unidades=10_000, motores=("clasico",)),
+}
+
+
+def _correr_motor(motor: str, modelo, inventario, unidades: int, presupuesto_ms: float, semilla: int):
+    instrumentacion = Instrumentacion()
+    if motor == "clasico":
+        resultado = optimizar_por_color(modelo, inventario, unidades, instrumentacion=instrumentacion)
+    elif motor == "guillotina":
+        resultado = optimizar_guillotina(modelo, inventario, unidades, instrumentacion=instrumentacion)
+    else:
+        resultado = simulated_annealing_optimize(
+            modelo, inventario, unidades, max_iter=None, tiempo_limite_ms=presupuesto_ms,
+            semilla=semilla, instrumentacion=instrumentacion
+        )
+    return resultado, instrumentacion
+
+
+def _medidas(motor: str, modelo, resultado: List[Dict], instrumentacion: Instrumentacion) -> Dict:
+    area_pieza = {p.codigo: p.ancho * p.largo for p in modelo.piezas}
+    fabricables = sum(r["cantidadFabricable"] for r in resultado)
+
+    if motor in ("clasico", "guillotina"):
+        # Un lote del clásico (y de la guillotina) es una unidad que recorre
+        # varios tableros: el consumo sale de la instrumentación, y las
+        # unidades salen completas
+        tableros = instrumentacion.contadores.get("tableros_consumidos", 0)
+        area_tableros = instrumentacion.contadores.get("area_tableros_consumidos", 0)
+        area_piezas = fabricables * sum(p.ancho * p.largo * p.cantidad for p in modelo.piezas)
+    else:
+        # En el recocido cada lote es un tablero
+        lotes = [lote for r in resultado for lote in r["piezasUtilizadas"] if lote]
+        tableros = len(lotes)
+        area_tableros = sum(lote[0]["ancho"] * lote[0]["largo"] for lote in lotes)
+        area_piezas = sum(
+            p["cantidad_req"] * area_pieza[p["pieza_modelo_codigo"]] for lote in lotes for p in lote
+        )
+
+    return {
+        "unidades_fabricadas": fabricables,
+        "tableros_usados": tableros,
+        "area_tableros_mm2": area_tableros,
+        "area_desperdicio_mm2": area_tableros - area_piezas,
+        "aprovechamiento": area_piezas / area_tableros if area_tableros else None,
+    }
+
+
+def correr_escenario(
+    nombre: str, motor: str, semilla: int, presupuesto_ms: float, memoria: bool
+) -> Dict:
+    e = ESCENARIOS[nombre]
+    espesores = (15.0, 18.0, 25.0)[:e["espesores"]]
+    inventario = generar_inventario(e["sobrantes"], e["colores"], espesores, semilla=semilla)
+    modelo = generar_modelo(e["tipos"], espesores, semilla=semilla)
+
+    gc.collect()
+    inicio = time.perf_counter()
+    resultado, instrumentacion = _correr_motor(motor, modelo, inventario, e["unidades"], presupuesto_ms, semilla)
+    segundos = time.perf_counter() - inicio
+
+    pico = None
+    if memoria:
+        # Segunda corrida aparte: tracemalloc distorsiona los tiempos
+        gc.collect()
+        tracemalloc.start()
+        _correr_motor(motor, modelo, inventario, e["unidades"], presupuesto_ms, semilla)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "escenario": nombre,
+        "motor": motor,
+        "semilla": semilla,
+        "sobrantes": e["sobrantes"],
+        "unidades_pedidas": e["unidades"],
+        "presupuesto_ms": presupuesto_ms if motor == "sa" else None,
+        "segundos": round(segundos, 4),
+        "pico_memoria_bytes": pico,
+        **_medidas(motor, modelo, resultado, instrumentacion),
+        "metricas": instrumentacion.resumen()["contadores"],
+    }
+
+
+def _version_codigo() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+
+
+@click.group()
+def cli():
+    """Benchmarks de los motores de optimización."""
+
+
+@cli.command()
+@click.option('--escenarios', default="chico,mediano,grande", help="Lista separada por comas: " + ", ".join(ESCENARIOS))
+@click.option('--motores', default=",".join(MOTORES), help="clasico, sa, guillotina (separados por comas)")
+@click.option('--semilla', default=0, type=int, help="Semilla de los generadores y del recocido")
+@click.option('--presupuesto-ms', default=2000.0, type=float, help="Tiempo límite del recocido por escenario")
+@click.option('--sin-memoria', is_flag=True, help="No medir el pico de memoria (evita la segunda corrida)")
+@click.option('--salida', type=click.Path(dir_okay=False, writable=True), help="Archivo JSON de resultados")
+def correr(escenarios, motores, semilla, presupuesto_ms, sin_memoria, salida):
+    nombres = [n.strip() for n in escenarios.split(",") if n.strip()]
+    desconocidos = [n for n in nombres if n not in ESCENARIOS]
+    if desconocidos:
+        raise click.BadParameter(f"Escenarios desconocidos: {', '.join(desconocidos)}")
+    motores = [m.strip() for m in motores.split(",") if m.strip()]
+
+    corridas = []
+    for nombre in nombres:
+        for motor in motores:
+            if motor not in ESCENARIOS[nombre]["motores"]:
+                continue
+            fila = correr_escenario(nombre, motor, semilla, presupuesto_ms, not sin_memoria)
+            corridas.append(fila)
+            click.echo(
+                f"{nombre:8} {motor:10} {fila['segundos']:9.3f} s  "
+                f"{fila['unidades_fabricadas']:>6} u  {fila['tableros_usados']:>7} tableros  "
+                f"aprov. {fila['aprovechamiento'] or 0:.1%}", err=True
+            )
+
+    informe = {
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "version": _version_codigo(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "corridas": corridas,
+    }
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        click.echo(texto)
+
+
+@cli.command()
+@click.argument('antes', type=click.Path(exists=True, dir_okay=False))
+@click.argument('despues', type=click.Path(exists=True, dir_okay=False))
+def comparar(antes, despues):
+    """Compara dos archivos de resultados: tiempo, memoria y unidades por escenario."""
+    def cargar(ruta):
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        return datos, {(c["escenario"], c["motor"], c["semilla"]): c for c in datos["corridas"]}
+
+    info_a, a = cargar(antes)
+    info_b, b = cargar(despues)
+    click.echo(f"{info_a['version']} → {info_b['version']}")
+    for clave in sorted(a.keys() & b.keys()):
+        ca, cb = a[clave], b[clave]
+        razon = cb["segundos"] / ca["segundos"] if ca["segundos"] else float("inf")
+        memoria = ""
+        if ca["pico_memoria_bytes"] and cb["pico_memoria_bytes"]:
+            memoria = f"  memoria x{cb['pico_memoria_bytes'] / ca['pico_memoria_bytes']:.2f}"
+        click.echo(
+            f"{clave[0]:8} {clave[1]:8} tiempo x{razon:.2f}{memoria}  "
+            f"unidades {ca['unidades_fabricadas']} → {cb['unidades_fabricadas']}"
+        )
+
+
+if __name__ == "__main__":
+    cli()
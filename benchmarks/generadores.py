@@ -0,0 +1,82 @@
+# benchmarks/generadores.py
+
+import random
+from typing import List, Optional, Sequence
+from optimizador.models import ModeloMueble, PiezaInventario, PiezaModelo
+
+COLORES = (
+    "BLANCO", "NEGRO", "ROBLE", "NOGAL", "GRIS", "CEREZO", "WENGUE", "HAYA",
+    "ARCE", "CENIZA", "TECA", "PINO", "GRAFITO", "MARFIL", "LINO", "OLMO",
+)
+ESPESORES = (15.0, 18.0, 25.0)
+
+# Tablero estándar del que salen los sobrantes (mm)
+TABLERO_ANCHO = 1830
+TABLERO_LARGO = 2440
+
+
+def _lado(rng: random.Random, minimo: int, maximo: int) -> float:
+    # Los sobrantes chicos son mucho más comunes que los grandes
+    return float(round(min(maximo, minimo + rng.expovariate(3.0 / (maximo - minimo)))))
+
+
+def generar_inventario(
+    n: int,
+    colores: int = 3,
+    espesores: Sequence[float] = ESPESORES,
+    semilla: int = 0,
+    prob_sin_espesor: float = 0.02
+) -> List[PiezaInventario]:
+    """
+    Inventario sintético de `n` registros de sobrantes cortados de tableros
+    estándar. La mayoría tiene una sola copia; unos pocos espesores quedan
+    vacíos (comodín) como pasa con datos cargados a mano.
+    """
+    rng = random.Random(semilla)
+    paleta = COLORES[:colores] if colores <= len(COLORES) else [f"COLOR{i}" for i in range(colores)]
+    inventario = []
+    for i in range(n):
+        ancho = _lado(rng, 80, TABLERO_ANCHO)
+        largo = _lado(rng, 150, TABLERO_LARGO)
+        espesor = None if rng.random() < prob_sin_espesor else rng.choice(espesores)
+        cantidad = 1 + min(int(rng.expovariate(1.5)), 9)
+        inventario.append(PiezaInventario(
+            codigo=f"S{i:06d}",
+            ancho=min(ancho, largo),
+            largo=max(ancho, largo),
+            color=rng.choice(paleta),
+            espesor=espesor,
+            cantidad=cantidad,
+        ))
+    return inventario
+
+
+def generar_modelo(
+    tipos: int = 6,
+    espesores: Sequence[float] = ESPESORES,
+    semilla: int = 0,
+    id: int = 1
+) -> ModeloMueble:
+    """
+    Mueble sintético: laterales y puertas altas, estantes y cajones medianos,
+    y piezas chicas de refuerzo, todas de un mismo espesor salvo alguna.
+    """
+    rng = random.Random(semilla)
+    espesor = rng.choice(espesores)
+    piezas = []
+    for j in range(tipos):
+        clase = j % 3
+        if clase == 0:    # lateral / puerta
+            ancho, largo, cantidad = rng.randint(300, 600), rng.randint(700, 2000), rng.choice((1, 2, 2))
+        elif clase == 1:  # estante / frente de cajón
+            ancho, largo, cantidad = rng.randint(250, 550), rng.randint(400, 900), rng.randint(1, 4)
+        else:             # refuerzo / zócalo
+            ancho, largo, cantidad = rng.randint(60, 150), rng.randint(200, 800), rng.randint(1, 4)
+        piezas.append(PiezaModelo(
+            codigo=chr(ord("A") + j % 26) + (str(j // 26) if j >= 26 else ""),
+            ancho=float(ancho),
+            largo=float(largo),
+            espesor=espesor if rng.random() > 0.15 else rng.choice(espesores),
+            cantidad=cantidad,
+        ))
+    return ModeloMueble(id=id, nombre=f"Sintético {tipos} piezas #{semilla}", piezas=piezas)
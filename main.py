@@ -1,27 +1,262 @@
 # main.py
 
 import json
+import logging
 import click
-from optimizador.models import PiezaInventario, PiezaModelo, ModeloMueble
-from optimizador.logic import optimizar_uso_inventario
-
-def load_data(path, cls):
-    with open(path, 'r', encoding='utf-8') as f:
-        items = json.load(f)
-    return [cls(**i) for i in items]
-
-@click.command()
-@click.option('--modelo-id', required=True, type=int, help="ID del modelo de mueble")
-@click.option('--cantidad', required=True, type=int, help="Cantidad deseada")
-def cli(modelo_id, cantidad):
-    inv = load_data('data/inventario.json', PiezaInventario)
-    modelos = load_data('data/modelos.json', ModeloMueble)
-    modelo = next((m for m in modelos if m.id == modelo_id), None)
+
+# Los módulos del optimizador (numpy incluido) se importan dentro de cada
+# comando: `--help` y `batch`, cuyos workers cargan lo suyo, arrancan sin ellos
+
+INV_FILE = 'Data/inventario.json'
+MOD_FILE = 'Data/modelos.json'
+DB_FILE = 'Data/optimizador.db'
+CACHE_DIR = 'Data/cache'
+
+def abrir_almacen():
+    from optimizador.almacen import Almacen
+    # La primera vez se importan los JSON de la versión anterior
+    almacen = Almacen(DB_FILE)
+    almacen.importar_json(INV_FILE, MOD_FILE)
+    return almacen
+
+@click.group(invoke_without_command=True)
+@click.option('--modelo-id', type=int, help="ID del modelo de mueble")
+@click.option('--cantidad', type=int, help="Cantidad deseada")
+@click.option('--color', help="Optimizar sólo los sobrantes de este color")
+@click.option('--max', 'maximo', is_flag=True, help="Mostrar la cantidad máxima fabricable por color")
+@click.option('--pedidos', type=click.Path(exists=True, dir_okay=False),
+              help="Resolver en una pasada los pedidos de un .json/.jsonl (modelo_id, cantidad, prioridad, color, id)")
+@click.option('--ranking', is_flag=True, help="Ordenar todos los modelos por unidades fabricables con el inventario actual")
+@click.option('--limite', type=int, help="Con --ranking, mostrar sólo los primeros N modelos")
+@click.option('--motor', type=click.Choice(['clasico', 'guillotina', 'sa']), default='clasico', show_default=True,
+              help="Motor para --cantidad: clásico por área, guillotina con coordenadas de corte o recocido")
+@click.option('--confirmar', is_flag=True,
+              help="Aceptar el plan: descontar los tableros usados y guardar los recortes como sobrantes")
+@click.option('--recorte-minimo', type=float, default=100.0, show_default=True,
+              help="Lado mínimo (mm) de un recorte para guardarlo con --confirmar")
+@click.option('--reporte', type=click.Path(dir_okay=False, writable=True),
+              help="Exportar el plan de --cantidad a un .pdf o .xlsx con diagramas de corte por tablero")
+@click.option('--sin-cache', is_flag=True, help="Optimizar sin consultar ni guardar en la caché de resultados")
+@click.option('--debug', is_flag=True, help="Mostrar el detalle del motor en stderr")
+@click.option('--stats', is_flag=True, help="Mostrar métricas de la corrida en stderr")
+@click.option('--stats-json', type=click.Path(dir_okay=False, writable=True), help="Guardar métricas de la corrida en un JSON")
+@click.option('--inventario', 'inventario_columnar', type=click.Path(exists=True, dir_okay=False),
+              help="Leer los sobrantes de un archivo columnar (.arrow/.parquet, ver `convertir`) en lugar de la base")
+@click.option('--modelos', 'modelos_columnar', type=click.Path(exists=True, dir_okay=False),
+              help="Leer los modelos de un archivo columnar en lugar de la base")
+@click.option('--servicio', envvar='OPTIMIZADOR_SERVICIO',
+              help="Resolver --modelo-id en un servicio ya levantado (http://host:puerto o unix:/ruta)")
+@click.pass_context
+def cli(ctx, modelo_id, cantidad, color, maximo, pedidos, ranking, limite, motor, confirmar, recorte_minimo, reporte,
+        sin_cache, debug, stats, stats_json, inventario_columnar, modelos_columnar, servicio):
+    """
+    Optimiza un modelo o un archivo de pedidos, o arma el ranking del
+    catálogo; `batch` resuelve solicitudes
+    JSONL y `servir` levanta el servicio local.
+    """
+    if ctx.invoked_subcommand is not None:
+        return
+    if ranking and (pedidos is not None or modelo_id is not None or confirmar):
+        raise click.UsageError("--ranking no va con --modelo-id, --pedidos ni --confirmar.")
+    if not ranking and pedidos is None and modelo_id is None:
+        raise click.UsageError("Indica --modelo-id, --pedidos o --ranking.")
+    if not ranking and pedidos is None and not maximo and cantidad is None:
+        raise click.UsageError("Indica --cantidad o --max.")
+    if confirmar and (pedidos is not None or maximo):
+        raise click.UsageError("--confirmar va con --modelo-id y --cantidad.")
+    if reporte and (ranking or pedidos is not None or maximo):
+        raise click.UsageError("--reporte va con --modelo-id y --cantidad.")
+    if reporte and not reporte.lower().endswith((".pdf", ".xlsx")):
+        raise click.UsageError("--reporte debe terminar en .pdf o .xlsx.")
+    columnar = inventario_columnar or modelos_columnar
+    if columnar and confirmar:
+        raise click.UsageError("--confirmar descuenta en la base: no va con --inventario ni --modelos.")
+    if columnar and servicio:
+        raise click.UsageError("--inventario y --modelos no están disponibles con --servicio.")
+    logging.basicConfig(level=logging.DEBUG if debug else logging.INFO, format="%(message)s")
+    if servicio and pedidos is None:
+        if stats or stats_json:
+            raise click.UsageError("--stats y --stats-json no están disponibles con --servicio.")
+        _por_servicio(servicio, modelo_id, cantidad, color, maximo, ranking, limite, motor, sin_cache, confirmar,
+                      recorte_minimo, reporte)
+        return
+    from optimizador.cache import CacheResultados, optimizar_cacheado
+    from optimizador.logic import cantidad_maxima
+    from optimizador.metricas import NULA, Instrumentacion
+    from optimizador.pedidos import leer_pedidos, optimizar_pedidos
+    instrumentacion = Instrumentacion() if stats or stats_json else NULA
+    almacen = abrir_almacen()
+    if inventario_columnar or modelos_columnar:
+        almacen = _AlmacenColumnar(almacen, inventario_columnar, modelos_columnar)
+    if ranking:
+        from optimizador.ranking import ranking_modelos
+        resultado = ranking_modelos(
+            almacen.modelos(), almacen.sobrantes(color=color), limite=limite, instrumentacion=instrumentacion
+        )
+        _emitir(resultado, instrumentacion, stats, stats_json)
+        return
+    if pedidos is not None:
+        try:
+            resultado = optimizar_pedidos(
+                leer_pedidos(pedidos), almacen.modelos(), almacen.sobrantes(color=color),
+                debug=debug, instrumentacion=instrumentacion
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        _emitir(resultado, instrumentacion, stats, stats_json)
+        return
+    modelo = almacen.modelo(modelo_id)
     if not modelo:
         click.echo(f"⚠️  Modelo con id={modelo_id} no encontrado.")
         return
-    resultado = optimizar_uso_inventario(modelo, inv, cantidad)
+    inv = almacen.sobrantes(color=color)
+    if maximo:
+        resultado = cantidad_maxima(modelo, inv, instrumentacion=instrumentacion)
+    else:
+        cache = None if sin_cache else CacheResultados(directorio=CACHE_DIR, fuentes=(DB_FILE,))
+        resultado = optimizar_cacheado(
+            cache, motor, modelo, inv, cantidad, debug=debug, instrumentacion=instrumentacion
+        )
+        if confirmar:
+            from optimizador.recortes import confirmar_plan
+            try:
+                delta = confirmar_plan(resultado, modelo, almacen=almacen, lado_minimo=recorte_minimo)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+            _informar_confirmacion(delta.tableros, sum(r.cantidad for r in delta.recortes))
+        if reporte:
+            _exportar(reporte, resultado, modelo)
+    _emitir(resultado, instrumentacion, stats, stats_json)
+
+class _AlmacenColumnar:
+    """Sobrantes y/o modelos de archivos columnares; lo que no se indicó sale de la base."""
+    def __init__(self, almacen, inventario, modelos):
+        self.almacen = almacen
+        self.inventario = inventario
+        self._modelos = None
+        if modelos:
+            from optimizador.columnar import leer_modelos
+            self._modelos = {m.id: m for m in leer_modelos(modelos)}
+
+    def sobrantes(self, color=None):
+        if not self.inventario:
+            return self.almacen.sobrantes(color=color)
+        from optimizador.columnar import leer_inventario
+        return leer_inventario(self.inventario, color=color)
+
+    def modelos(self):
+        return self.almacen.modelos() if self._modelos is None else list(self._modelos.values())
+
+    def modelo(self, id):
+        return self.almacen.modelo(id) if self._modelos is None else self._modelos.get(id)
+
+def _exportar(ruta, resultado, modelo):
+    from optimizador.reportes import GeneradorReportes
+    generador = GeneradorReportes()
+    datos = generador.pdf(resultado, modelo) if ruta.lower().endswith(".pdf") else generador.xlsx(resultado, modelo)
+    with open(ruta, "wb") as f:
+        f.write(datos)
+    logging.getLogger(__name__).info("Reporte guardado en %s", ruta)
+
+def _informar_confirmacion(tableros, recortes):
+    logging.getLogger(__name__).info(
+        "Plan confirmado: %d tableros descontados, %d recortes agregados al inventario", tableros, recortes
+    )
+
+@cli.command()
+@click.argument('entrada', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--salida', type=click.File('w', encoding='utf-8'), default='-', help="JSONL de resultados (por defecto stdout)")
+@click.option('--workers', type=int, help="Procesos del pool (por defecto, uno por CPU; 1 corre todo en este proceso)")
+@click.option('--sin-cache', is_flag=True, help="Optimizar sin consultar ni guardar en la caché de resultados")
+@click.option('--debug', is_flag=True, help="Mostrar el detalle de la tanda en stderr")
+def batch(entrada, salida, workers, sin_cache, debug):
+    """
+    Resuelve las solicitudes JSONL de ENTRADA (o stdin), una por línea:
+    {"id", "modelo_id", "cantidad" o "max", "color", "motor", "parametros"}
+    o {"id", "ranking": true, "limite", "color"}.
+    Escribe una línea por solicitud a medida que terminan, con su id.
+    """
+    logging.basicConfig(level=logging.DEBUG if debug else logging.INFO, format="%(message)s")
+    from optimizador.tandas import procesar_tanda
+    abrir_almacen()
+    resueltas, errores = procesar_tanda(
+        entrada, salida, DB_FILE, directorio_cache=None if sin_cache else CACHE_DIR, workers=workers
+    )
+    logging.getLogger(__name__).info("%d solicitudes resueltas, %d con error", resueltas, errores)
+    if errores:
+        raise SystemExit(1)
+
+def _por_servicio(direccion, modelo_id, cantidad, color, maximo, ranking, limite, motor, sin_cache, confirmar,
+                  recorte_minimo, reporte):
+    from optimizador.cliente import ClienteServicio, ErrorServicio
+    cliente = ClienteServicio(direccion)
+    try:
+        if ranking:
+            resultado = cliente.ranking(color, limite)
+        elif maximo:
+            resultado = cliente.maximo(modelo_id, color)
+        else:
+            resultado = cliente.optimizar(modelo_id, cantidad, color, motor=motor, sin_cache=sin_cache)
+            if confirmar:
+                aplicado = cliente.confirmar(modelo_id, resultado, lado_minimo=recorte_minimo)
+                _informar_confirmacion(aplicado["tableros"], aplicado["recortes"])
+    except ErrorServicio as e:
+        raise click.ClickException(e.mensaje)
+    except OSError as e:
+        raise click.ClickException(f"No se pudo conectar con el servicio en {direccion}: {e}")
+    finally:
+        cliente.cerrar()
+    if reporte:
+        # El servicio usa la misma base: el modelo se lee de ahí
+        _exportar(reporte, resultado, abrir_almacen().modelo(modelo_id))
+    click.echo(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+@cli.command()
+@click.option('--inventario', 'inventario_json', type=click.Path(exists=True, dir_okay=False),
+              help="JSON de sobrantes con el formato de inventario.json")
+@click.option('--modelos', 'modelos_json', type=click.Path(exists=True, dir_okay=False),
+              help="JSON de modelos con el formato de modelos.json")
+@click.option('--destino', type=click.Path(file_okay=False), default='Data', show_default=True,
+              help="Carpeta donde escribir inventario.<formato> y modelos.<formato>")
+@click.option('--formato', type=click.Choice(['arrow', 'parquet']), default='arrow', show_default=True,
+              help="arrow: Arrow IPC sin comprimir, se lee con memory map; parquet: comprimido")
+def convertir(inventario_json, modelos_json, destino, formato):
+    """
+    Convierte los JSON indicados, o sin ellos la base actual, al formato
+    columnar que aceptan --inventario y --modelos.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from optimizador.columnar import convertir_json, exportar_almacen
+    if inventario_json or modelos_json:
+        rutas = convertir_json(destino, inventario_json, modelos_json, formato)
+    else:
+        rutas = exportar_almacen(abrir_almacen(), destino, formato)
+    for ruta in rutas:
+        if ruta:
+            logging.getLogger(__name__).info("Escrito %s", ruta)
+
+@cli.command()
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--puerto', type=int, default=8765, show_default=True)
+@click.option('--unix', type=click.Path(dir_okay=False), help="Escuchar en este socket Unix en lugar de TCP")
+@click.option('--workers', type=int, help="Procesos del pool (por defecto, uno por CPU)")
+@click.option('--sin-cache', is_flag=True, help="No usar la caché de resultados")
+def servir(host, puerto, unix, workers, sin_cache):
+    """
+    Levanta el servicio local, que mantiene modelos y sobrantes en memoria
+    entre pedidos; el CLI (con --servicio) y la app lo usan como clientes.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from optimizador import servicio
+    abrir_almacen()
+    servicio.servir(DB_FILE, host, puerto, unix, None if sin_cache else CACHE_DIR, workers)
+
+def _emitir(resultado, instrumentacion, stats, stats_json):
     click.echo(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if stats:
+        instrumentacion.a_logging()
+    if stats_json:
+        instrumentacion.a_json(stats_json)
 
 if __name__ == "__main__":
     cli()
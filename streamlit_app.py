@@ -1,43 +1,55 @@
 # streamlit_app.py
 
 import os
-import json
+from dataclasses import asdict
 import pandas as pd
 import streamlit as st
-import tempfile
-from fpdf import FPDF
 
-from optimizador.models import PiezaInventario, PiezaModelo, ModeloMueble
-from optimizador.logic import optimizar_por_color
-
-from optimizador.logic_opti5 import simulated_annealing_optimize
-from optimizador.logic import optimizar_por_color
+from optimizador.models import PiezaModelo, ModeloMueble
+from optimizador.almacen import Almacen
+from optimizador.importacion import importar_inventario
+from optimizador.reportes import COLUMNAS, GeneradorReportes, filas_piezas
+from optimizador.cache import CacheResultados, MOTOR_CLASICO, MOTOR_GUILLOTINA, MOTOR_SA
+from optimizador.trabajos import GestorTrabajos
 
 # ── Paths de datos ───────────────────────────────────────────────────
-DATA_DIR = "data"
+DATA_DIR = "Data"
 INV_FILE = os.path.join(DATA_DIR, "inventario.json")
 MOD_FILE = os.path.join(DATA_DIR, "modelos.json")
-
-# ── Funciones de persistencia ────────────────────────────────────────
-def leer_json(path):
-    if not os.path.exists(path):
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
-
-def guardar_json(path, data):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+DB_FILE = os.path.join(DATA_DIR, "optimizador.db")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+
+# ── Persistencia (SQLite; los JSON viejos se importan una sola vez) ──
+@st.cache_resource
+def almacen():
+    a = Almacen(DB_FILE)
+    a.importar_json(INV_FILE, MOD_FILE)
+    return a
+
+# ── Caché de resultados (una por proceso, compartida entre sesiones) ─
+@st.cache_resource
+def cache_resultados():
+    return CacheResultados(directorio=CACHE_DIR, fuentes=(DB_FILE,))
+
+# ── Trabajos en segundo plano (compartidos entre sesiones) ──────────
+@st.cache_resource
+def gestor_trabajos():
+    return GestorTrabajos(max_workers=2, cache=cache_resultados())
+
+# ── Reportes (PDF/Excel bajo demanda, en caché por huella del resultado) ─
+@st.cache_resource
+def generador_reportes():
+    return GeneradorReportes()
+
+# ── Servicio local (opcional): el motor clásico corre ahí, con datos en memoria
+SERVICIO = os.environ.get("OPTIMIZADOR_SERVICIO")
+
+@st.cache_resource
+def cliente_servicio():
+    from optimizador.cliente import ClienteServicio
+    return ClienteServicio(SERVICIO)
 
 # ── Estado inicial ───────────────────────────────────────────────────
-if 'inventario' not in st.session_state:
-    st.session_state['inventario'] = leer_json(INV_FILE)
-if 'modelos' not in st.session_state:
-    st.session_state['modelos'] = leer_json(MOD_FILE)
 if 'pieza_buffer' not in st.session_state:
     st.session_state['pieza_buffer'] = []
 
@@ -52,7 +64,7 @@ st.title("🛠️ Optimizador de Desperdicios")
 # ── Menú lateral ─────────────────────────────────────────────────────
 módulo = st.sidebar.radio(
     "🔀 Selecciona módulo",
-    ("Sobrantes", "Modelos", "Optimización")
+    ("Sobrantes", "Modelos", "Optimización", "Ranking")
 )
 
 # ── Módulo “Sobrantes” ────────────────────────────────────────────────
@@ -82,42 +94,36 @@ if módulo == "Sobrantes":
             espesor=espesor,
             cantidad=cantidad
         )
-        st.session_state['inventario'].append(nueva)
-        guardar_json(INV_FILE, st.session_state['inventario'])
+        almacen().agregar_sobrantes([nueva])
         st.success(f"Pieza '{codigo}' agregada.")
 
     st.markdown("---")
-    st.subheader("📤 Subir inventario desde Excel")
+    st.subheader("📤 Subir inventario desde Excel o CSV")
 
-    archivo_excel = st.file_uploader("Carga un archivo Excel (.xlsx)", type=["xlsx"])
+    archivo_excel = st.file_uploader("Carga un archivo Excel (.xlsx) o CSV", type=["xlsx", "csv"])
 
-    if archivo_excel:
+    # El uploader conserva el archivo entre reruns: se importa una sola vez
+    if archivo_excel and st.session_state.get("archivo_importado") != archivo_excel.file_id:
         try:
-            df_excel = pd.read_excel(archivo_excel)
-
-            # Verificación de columnas mínimas necesarias
-            columnas_requeridas = ["codigo", "ancho", "largo", "color", "espesor", "cantidad"]
-            
-            if not set(columnas_requeridas).issubset(df_excel.columns.str.lower()):
-                st.error(f"El archivo debe contener las columnas: {', '.join(columnas_requeridas)}")
-            
-            else:
-            # Normalizar nombres
-                df_excel.columns = df_excel.columns.str.lower()
-
-            # Convertir a dicts y añadir
-            nuevas_piezas = df_excel[columnas_requeridas].to_dict(orient="records")
-            st.session_state['inventario'].extend(nuevas_piezas)
-            guardar_json(INV_FILE, st.session_state['inventario'])
-            st.success(f"Inventario cargado correctamente: {len(nuevas_piezas)} piezas añadidas.")
-        
+            with st.spinner("Importando inventario…"):
+                informe = importar_inventario(archivo_excel, archivo_excel.name, almacen())
+            st.session_state["archivo_importado"] = archivo_excel.file_id
+            st.success(
+                f"Inventario cargado: {informe.validas} filas válidas de {informe.leidas}, "
+                f"{informe.agregadas} sobrantes nuevos y {informe.fusionadas} sumados a existentes."
+            )
+            if informe.invalidas:
+                st.warning(f"{informe.invalidas} filas descartadas.")
+                st.dataframe(pd.DataFrame(informe.errores), hide_index=True)
+        except ValueError as e:
+            st.error(str(e))
         except Exception as e:
             st.error(f"Error al leer el archivo: {e}")
-      
+
     st.markdown("---")
     st.subheader("📦 Inventario de Sobrantes")
 
-    df_inv = pd.DataFrame(st.session_state['inventario'])
+    df_inv = pd.DataFrame(almacen().filas_sobrantes())
 
     if df_inv.empty:
             st.info("No hay piezas en el inventario aún.")
@@ -129,18 +135,18 @@ if módulo == "Sobrantes":
         use_container_width=True,
         num_rows="dynamic",
         key="editor_inventario",
-        hide_index=True
+        hide_index=True,
+        disabled=["id"]
     )
 
-        to_delete = edited_df[edited_df["Eliminar"]].index.tolist()
+        to_delete = edited_df.loc[edited_df["Eliminar"], "id"].dropna().astype(int).tolist()
 
         if to_delete:
             st.warning(f"{len(to_delete)} piezas marcadas para eliminar.")
             if st.button("🗑️ Quitar las piezas seleccionadas"):
-                for idx in sorted(to_delete, reverse=True):
-                    st.session_state['inventario'].pop(idx)
-                    guardar_json(INV_FILE, st.session_state['inventario'])
-                    st.success("Piezas eliminadas correctamente.")
+                almacen().eliminar_sobrantes(to_delete)
+                st.success("Piezas eliminadas correctamente.")
+                st.rerun()
         else:
             st.info("No hay piezas en el inventario aún.")
 
@@ -181,7 +187,7 @@ elif módulo == "Modelos":
         if to_del_buf and st.button("🗑️ Eliminar del buffer"):
             for idx in sorted(to_del_buf, reverse=True):
                 st.session_state['pieza_buffer'].pop(idx)
-            st.experimental_rerun()
+            st.rerun()
     else:
         st.info("El buffer está vacío. Agrega piezas arriba.")
 
@@ -189,40 +195,37 @@ elif módulo == "Modelos":
     with st.form("form_modelo", clear_on_submit=True):
         id_mod = st.number_input(
             "ID del modelo", min_value=1,
-            value=len(st.session_state['modelos']) + 1, step=1
+            value=len(almacen().modelos()) + 1, step=1
         )
         nombre_mod = st.text_input("Nombre del modelo")
         save_mod = st.form_submit_button("✅ Guardar modelo")
     if save_mod:
-        modelo = dict(
+        modelo = ModeloMueble(
             id=id_mod,
             nombre=nombre_mod,
-            piezas=st.session_state['pieza_buffer'].copy()
+            piezas=[PiezaModelo(**pz) for pz in st.session_state['pieza_buffer']]
         )
-        st.session_state['modelos'].append(modelo)
+        almacen().guardar_modelo(modelo)
         st.session_state['pieza_buffer'].clear()
-        guardar_json(MOD_FILE, st.session_state['modelos'])
         st.success(f"Modelo '{nombre_mod}' guardado.")
 
     st.subheader("🗂️ Modelos disponibles")
-    df_mods = pd.DataFrame(st.session_state['modelos'])
+    df_mods = pd.DataFrame([asdict(m) for m in almacen().modelos()])
     if not df_mods.empty:
         df_mods['Eliminar'] = False
-        edited_mod = st.data_editor(df_mods, num_rows="dynamic", use_container_width=True)
-        to_del_mod = edited_mod.index[edited_mod['Eliminar']].tolist()
+        edited_mod = st.data_editor(df_mods, num_rows="dynamic", use_container_width=True, disabled=["id"])
+        to_del_mod = edited_mod.loc[edited_mod['Eliminar'], "id"].dropna().astype(int).tolist()
         if to_del_mod and st.button("🗑️ Eliminar modelos"):
-            for idx in sorted(to_del_mod, reverse=True):
-                st.session_state['modelos'].pop(idx)
-            guardar_json(MOD_FILE, st.session_state['modelos'])
-            st.experimental_rerun()
+            almacen().eliminar_modelos(to_del_mod)
+            st.rerun()
     else:
         st.info("No hay modelos definidos aún.")
 
 # ── Módulo “Optimización” ─────────────────────────────────────────────
 elif módulo == "Optimización":
     st.header("🔎 Ejecutar Optimización")
-    inv_objs = [PiezaInventario(**p) for p in st.session_state['inventario']]
-    nombres = [m["nombre"] for m in st.session_state['modelos']]
+    modelos = almacen().modelos()
+    nombres = [m.nombre for m in modelos]
 
     if not nombres:
         st.warning("Define primero algún modelo.")
@@ -231,70 +234,207 @@ elif módulo == "Optimización":
     modelo_sel = st.selectbox("Selecciona modelo", nombres)
     cantidad = st.number_input("Cantidad deseada", min_value=1, value=1, step=1)
 
-    modelo_dict = {m["nombre"]: m for m in st.session_state['modelos']}
-    modelo_data = modelo_dict.get(modelo_sel)
-    modelo_obj = ModeloMueble(
-        id=modelo_data["id"],
-        nombre=modelo_data["nombre"],
-        piezas=[PiezaModelo(**pz) for pz in modelo_data["piezas"]]
+    modelo_obj = next(m for m in modelos if m.nombre == modelo_sel)
+
+    motor = st.radio(
+        "Selecciona motor de optimización",
+        ["Clásico", "Guillotina (cortes con coordenadas)", "Simulated Annealing (Opti 5.0)"]
     )
+    if motor.startswith("Simulated"):
+        c1, c2 = st.columns(2)
+        with c1:
+            tiempo_s = st.number_input("Tiempo límite (s)", min_value=1, value=10, step=1)
+        with c2:
+            semilla = st.number_input("Semilla", min_value=0, value=0, step=1)
+
+    if st.button("🛠️ Optimizar", disabled="trabajo_id" in st.session_state):
+        st.session_state["modelo_optimizado"] = modelo_obj.id
+        if motor == "Clásico" and SERVICIO:
+            # El servicio responde en milisegundos: no hace falta un trabajo
+            from optimizador.cliente import ErrorServicio
+            try:
+                st.session_state["resultados_optimizados"] = cliente_servicio().optimizar(modelo_obj.id, cantidad)
+                st.session_state.pop("metricas_optimizacion", None)
+            except (ErrorServicio, OSError) as e:
+                st.session_state.pop("resultados_optimizados", None)
+                st.session_state["error_optimizacion"] = str(e)
+            trabajo = None
+        else:
+            # Los sobrantes se leen sólo al optimizar aquí, no en cada rerun
+            inv_objs = almacen().sobrantes()
+            if motor == "Clásico":
+                trabajo = gestor_trabajos().enviar(MOTOR_CLASICO, modelo_obj, inv_objs, cantidad)
+            elif motor.startswith("Guillotina"):
+                trabajo = gestor_trabajos().enviar(MOTOR_GUILLOTINA, modelo_obj, inv_objs, cantidad)
+            else:
+                trabajo = gestor_trabajos().enviar(
+                    MOTOR_SA, modelo_obj, inv_objs, cantidad,
+                    max_iter=None, tiempo_limite_ms=tiempo_s * 1000, semilla=int(semilla)
+                )
+        if trabajo is not None:
+            st.session_state["trabajo_id"] = trabajo.id
+            st.session_state.pop("resultados_optimizados", None)
+            st.session_state.pop("metricas_optimizacion", None)
+
+    @st.fragment(run_every=1.0)
+    def panel_trabajo():
+        trabajo_id = st.session_state.get("trabajo_id")
+        if trabajo_id is None:
+            return
+        trabajo = gestor_trabajos().obtener(trabajo_id)
+        if trabajo is None:
+            st.session_state.pop("trabajo_id", None)
+            return
+
+        if trabajo.terminado:
+            if trabajo.error is not None:
+                st.session_state["error_optimizacion"] = str(trabajo.error)
+            else:
+                st.session_state["resultados_optimizados"] = trabajo.resultado
+                st.session_state["metricas_optimizacion"] = trabajo.metricas.resumen()
+            gestor_trabajos().olvidar(trabajo_id)
+            st.session_state.pop("trabajo_id", None)
+            st.rerun()
+
+        info = trabajo.instantanea()
+        progreso = info["progreso"]
+        st.info(f"⏳ Optimizando ({info['estado']}, {info['segundos']:.0f} s)…")
+        m1, m2, m3 = st.columns(3)
+        if trabajo.motor == MOTOR_SA:
+            m1.metric("Iteración", f"{progreso.get('iteracion', 0):,}")
+            m2.metric("Mejor energía", f"{progreso.get('energia', 0):,.0f}")
+        else:
+            m1.metric("Color", progreso.get("color", "—"))
+        m3.metric("Unidades armadas", progreso.get("fabricables", 0))
+
+        b1, b2 = st.columns(2)
+        with b1:
+            if st.button("⏹️ Cancelar"):
+                trabajo.cancelar()
+        with b2:
+            mejor = trabajo.mejor_hasta_ahora()
+            if mejor is not None and st.button("📌 Usar la mejor solución hasta ahora"):
+                st.session_state["resultados_optimizados"] = mejor
+                st.rerun()
+
+    panel_trabajo()
 
-    motor = st.radio("Selecciona motor de optimización", ["Clásico", "Simulated Annealing (Opti 5.0)"])
+    if "plan_confirmado" in st.session_state:
+        tableros, recortes = st.session_state.pop("plan_confirmado")
+        st.success(f"Plan confirmado: {tableros} tableros descontados y {recortes} recortes agregados al inventario.")
 
-    if st.button("🛠️ Optimizar"):
-        resultados = optimizar_por_color(modelo_obj, inv_objs, cantidad)
-        st.session_state["resultados_optimizados"] = resultados
+    if "error_optimizacion" in st.session_state:
+        st.error(f"Error al optimizar: {st.session_state.pop('error_optimizacion')}")
 
     if "resultados_optimizados" in st.session_state:
         resultados = st.session_state["resultados_optimizados"]
 
-        piezas_lista = []
-        for res in resultados:
-            for lote in res["piezasUtilizadas"]:
-                for pieza in lote:
-                        piezas_lista.append({
-                            "Código tablero": pieza["codigo"],
-                            "Color": pieza["color"],
-                            "Ancho (mm)": pieza["ancho"],
-                            "Largo (mm)": pieza["largo"],
-                            "Espesor (mm)": pieza["espesor"],
-                            "Cantidad requerida": pieza["cantidad_req"],
-                            "Pieza del modelo": pieza["pieza_modelo_codigo"],
-                    })
-
+        piezas_lista = filas_piezas(resultados)
 
         if piezas_lista:
-            df_export = pd.DataFrame(piezas_lista)
+            df_export = pd.DataFrame(piezas_lista, columns=COLUMNAS)
 
             st.subheader("📋 Resumen de piezas optimizadas")
             st.dataframe(df_export, use_container_width=True)
-            
-            # PDF Export
-        from fpdf import FPDF
-        import tempfile
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=10)
-        pdf.cell(200, 10, txt="Listado de piezas optimizadas", ln=True, align="C")
-        pdf.ln(10)
-
-        for col in df_export.columns:
-            pdf.cell(30, 8, col, border=1)
-        pdf.ln()
-        for _, row in df_export.iterrows():
-            for item in row:
-                pdf.cell(30, 8, str(item), border=1)
-            pdf.ln()
-
-        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        pdf.output(tmp_file.name)
-
-        with open(tmp_file.name, "rb") as f:
-            st.download_button(
-                label="📥 Descargar PDF de piezas optimizadas",
-                data=f,
-                file_name="optimizado_piezas.pdf",
-                mime="application/pdf"
-            )
-    else:
-        st.info("No se encontraron piezas fabricables para exportar.")
+            modelo_plan = almacen().modelo(st.session_state.get("modelo_optimizado", modelo_obj.id))
+
+            # Aceptar el plan: descuenta tableros y guarda los recortes, sin recargar todo
+            c1, c2 = st.columns([1, 2])
+            with c1:
+                lado_minimo = st.number_input("Recorte mínimo a guardar (mm)", min_value=0, value=100, step=10)
+            with c2:
+                st.write("")
+                if st.button("✅ Confirmar plan (descontar tableros y guardar recortes)"):
+                    from optimizador.recortes import confirmar_plan
+                    try:
+                        delta = confirmar_plan(resultados, modelo_plan, almacen=almacen(), lado_minimo=float(lado_minimo))
+                    except ValueError as e:
+                        st.error(f"No se pudo confirmar: {e}")
+                    else:
+                        st.session_state.pop("resultados_optimizados", None)
+                        st.session_state["plan_confirmado"] = (delta.tableros, sum(r.cantidad for r in delta.recortes))
+                        st.rerun()
+
+            # Exportación: el archivo se arma sólo al pedirlo, en memoria
+            if st.session_state.get("reportes_de") is not resultados:
+                st.session_state["reportes_de"] = resultados
+                st.session_state["reportes"] = {}
+            diagramas = st.checkbox("Incluir diagramas de corte por tablero", value=True)
+            e1, e2 = st.columns(2)
+            for columna, formato, etiqueta, mime in (
+                (e1, "pdf", "PDF", "application/pdf"),
+                (e2, "xlsx", "Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+            ):
+                with columna:
+                    datos = st.session_state["reportes"].get((formato, diagramas))
+                    if datos is None and st.button(f"📄 Preparar {etiqueta}"):
+                        generar = getattr(generador_reportes(), formato)
+                        datos = st.session_state["reportes"][(formato, diagramas)] = generar(
+                            resultados, modelo_plan, diagramas=diagramas
+                        )
+                    if datos is not None:
+                        st.download_button(
+                            label=f"📥 Descargar {etiqueta} de piezas optimizadas",
+                            data=datos,
+                            file_name=f"optimizado_piezas.{formato}",
+                            mime=mime
+                        )
+        else:
+            st.info("No se encontraron piezas fabricables para exportar.")
+
+        metricas = st.session_state.get("metricas_optimizacion")
+        if metricas:
+            with st.expander("📊 Métricas de la corrida"):
+                c1, c2 = st.columns(2)
+                with c1:
+                    st.markdown("**Contadores**")
+                    st.json(metricas["contadores"])
+                    if metricas["valores"]:
+                        st.markdown("**Valores**")
+                        st.json(metricas["valores"])
+                with c2:
+                    st.markdown("**Tiempos por fase (s)**")
+                    st.json(metricas["tiempos"])
+                energia = metricas["series"].get("energia")
+                if energia:
+                    st.markdown("**Energía del recocido**")
+                    st.line_chart(energia)
+
+# ── Módulo “Ranking” ──────────────────────────────────────────────────
+elif módulo == "Ranking":
+    st.header("🏆 ¿Qué se puede fabricar?")
+    st.caption("Todos los modelos contra el inventario actual: unidades fabricables por color, "
+               "tableros que consumen y desperdicio estimado.")
+    colores = ["Todos"] + almacen().colores()
+    c1, c2 = st.columns(2)
+    with c1:
+        color_rk = st.selectbox("Color", colores)
+    with c2:
+        limite = st.number_input("Mostrar los primeros (0 = todos)", min_value=0, value=0, step=1)
+
+    if st.button("🏆 Calcular ranking"):
+        color = None if color_rk == "Todos" else color_rk
+        try:
+            if SERVICIO:
+                ranking = cliente_servicio().ranking(color, limite or None)
+            else:
+                from optimizador.ranking import ranking_modelos
+                ranking = ranking_modelos(almacen().modelos(), almacen().sobrantes(color=color), limite=limite or None)
+            st.session_state["ranking"] = ranking
+        except Exception as e:
+            st.error(f"Error al armar el ranking: {e}")
+
+    ranking = st.session_state.get("ranking")
+    if ranking is not None:
+        if not ranking:
+            st.info("No hay modelos cargados.")
+        else:
+            df_rk = pd.DataFrame([{
+                "Modelo": r["modelo"],
+                "Unidades": r["cantidadFabricable"],
+                **{f"Unid. {c}": n for c, n in r["porColor"].items()},
+                "Tableros": r["tablerosConsumidos"],
+                "Desperdicio (%)": r["desperdicioPct"],
+                "Cota": r["cotaSuperior"],
+            } for r in ranking]).fillna(0)
+            st.dataframe(df_rk, use_container_width=True, hide_index=True)
@@ -0,0 +1,21 @@
+# tests/conftest.py
+#
+# Uso, desde la raíz del repo:
+#   python -m pytest -q
+
+import os
+import sys
+import types
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+# El paquete vive en Optimizador/ y se importa como `optimizador`: en Windows
+# da igual, en un sistema de archivos que distingue mayúsculas hace falta el alias
+try:
+    import optimizador  # noqa: F401
+except ImportError:
+    paquete = types.ModuleType("optimizador")
+    paquete.__path__ = [os.path.join(RAIZ, "Optimizador")]
+    sys.modules["optimizador"] = paquete
@@ -0,0 +1,43 @@
+# tests/datos.py
+
+import random
+from typing import List
+from optimizador.models import ModeloMueble, PiezaInventario, PiezaModelo
+
+COLORES = ("BLANCO", "NEGRO", "ROBLE", "NOGAL")
+ESPESORES = (15.0, 18.0)
+
+
+def inventario(n: int, colores: int = 2, semilla: int = 0, prob_sin_espesor: float = 0.0) -> List[PiezaInventario]:
+    """Sobrantes al azar pero reproducibles; algunos con espesor vacío (comodín)."""
+    rng = random.Random(semilla)
+    piezas = []
+    for i in range(n):
+        ancho, largo = float(rng.randint(100, 1200)), float(rng.randint(200, 2440))
+        piezas.append(PiezaInventario(
+            codigo=f"S{i:04d}",
+            ancho=min(ancho, largo),
+            largo=max(ancho, largo),
+            color=COLORES[rng.randrange(colores)],
+            espesor=None if rng.random() < prob_sin_espesor else rng.choice(ESPESORES),
+            cantidad=rng.randint(1, 3),
+        ))
+    return piezas
+
+
+def modelo(semilla: int = 0, id: int = 1) -> ModeloMueble:
+    """Mueble de cuatro tipos de pieza, casi todas del mismo espesor."""
+    rng = random.Random(semilla)
+    espesor = rng.choice(ESPESORES)
+    medidas = ((300, 600, 700, 1400), (250, 500, 400, 800), (60, 150, 200, 700), (250, 450, 250, 450))
+    piezas = [
+        PiezaModelo(
+            codigo="ABCD"[j],
+            ancho=float(rng.randint(a0, a1)),
+            largo=float(rng.randint(l0, l1)),
+            espesor=espesor if rng.random() > 0.15 else rng.choice(ESPESORES),
+            cantidad=rng.randint(1, 3),
+        )
+        for j, (a0, a1, l0, l1) in enumerate(medidas)
+    ]
+    return ModeloMueble(id=id, nombre=f"Prueba #{semilla}", piezas=piezas)
@@ -0,0 +1,128 @@
+# tests/test_cache.py
+
+import os
+import numpy as np
+import pytest
+from optimizador.cache import (
+    MOTOR_CLASICO, MOTOR_SA, CacheResultados, clave_corrida, huella_inventario, optimizar_cacheado
+)
+from optimizador.metricas import Instrumentacion
+from optimizador.models import ArreglosInventario, ModeloMueble, PiezaInventario, PiezaModelo
+import datos
+
+SA = dict(max_iter=300, workers=1, debug=False)
+
+
+@pytest.fixture
+def modelo():
+    return datos.modelo(2)
+
+
+@pytest.fixture
+def inventario():
+    return datos.inventario(100, colores=2, semilla=2)
+
+
+def test_clave_estable_ante_tipos_numericos():
+    modelo = ModeloMueble(1, "M", [PiezaModelo("A", 300, 400, 18, 2)])
+    otro = ModeloMueble(1, "M", [PiezaModelo("A", 300.0, np.float64(400), 18.0, 2)])
+    inventario = [PiezaInventario("S1", 500, 900, "BLANCO", None, 1)]
+    mismo = [PiezaInventario("S1", 500.0, np.float64(900.0), "BLANCO", float("nan"), 1)]
+    assert clave_corrida(MOTOR_CLASICO, modelo, inventario, 3) == clave_corrida(MOTOR_CLASICO, otro, mismo, 3)
+
+
+def test_clave_cambia_con_cada_entrada(modelo, inventario):
+    base = clave_corrida(MOTOR_CLASICO, modelo, inventario, 5, {"patrones": True})
+    assert base != clave_corrida(MOTOR_SA, modelo, inventario, 5, {"patrones": True})
+    assert base != clave_corrida(MOTOR_CLASICO, modelo, inventario, 6, {"patrones": True})
+    assert base != clave_corrida(MOTOR_CLASICO, modelo, inventario, 5, {"patrones": False})
+    # El orden de los sobrantes cuenta: el motor clásico desempata por posición
+    assert base != clave_corrida(MOTOR_CLASICO, modelo, inventario[::-1], 5, {"patrones": True})
+    # Un parámetro en None es lo mismo que no pasarlo
+    assert clave_corrida(MOTOR_CLASICO, modelo, inventario, 5) == clave_corrida(
+        MOTOR_CLASICO, modelo, inventario, 5, {"semilla": None}
+    )
+
+
+def test_clave_igual_en_lista_y_en_columnas(modelo, inventario):
+    columnas = ArreglosInventario.desde_piezas(inventario)
+    assert clave_corrida(MOTOR_CLASICO, modelo, columnas, 5) == clave_corrida(MOTOR_CLASICO, modelo, inventario, 5)
+
+
+def test_huella_precalculada_da_la_misma_clave(modelo, inventario):
+    columnas = ArreglosInventario.desde_piezas(inventario)
+    huella = huella_inventario(inventario)
+    assert huella_inventario(columnas) == huella
+    assert clave_corrida(MOTOR_CLASICO, modelo, [], 5, huella_inv=huella) == clave_corrida(
+        MOTOR_CLASICO, modelo, columnas, 5
+    )
+
+
+def test_parametros_sin_efecto_fuera_de_la_clave(modelo, inventario):
+    cache = CacheResultados()
+    primero = optimizar_cacheado(cache, MOTOR_CLASICO, modelo, inventario, 5, debug=False)
+    instrumentacion = Instrumentacion()
+    segundo = optimizar_cacheado(
+        cache, MOTOR_CLASICO, modelo, inventario, 5, debug=True, workers=2, instrumentacion=instrumentacion
+    )
+    assert segundo == primero
+    assert (len(cache), cache.aciertos) == (1, 1)
+    assert instrumentacion.contadores.get("cache_aciertos") == 1
+
+
+def test_recocido_solo_se_cachea_con_semilla(modelo, inventario):
+    cache = CacheResultados()
+    optimizar_cacheado(cache, MOTOR_SA, modelo, inventario, 2, **SA)
+    assert len(cache) == 0
+    primero = optimizar_cacheado(cache, MOTOR_SA, modelo, inventario, 2, semilla=1, **SA)
+    assert optimizar_cacheado(cache, MOTOR_SA, modelo, inventario, 2, semilla=1, **SA) == primero
+    assert (len(cache), cache.aciertos) == (1, 1)
+
+
+@pytest.mark.parametrize("parametros, cacheable", [
+    ({"tiempo_limite_ms": 50}, False),
+    ({"tiempo_limite_ms": 50, "max_iter": None}, False),
+    ({"tiempo_limite_ms": 5000, "max_iter": 300}, True),
+])
+def test_recocido_con_tiempo_limite_necesita_max_iter(modelo, inventario, parametros, cacheable):
+    cache = CacheResultados()
+    optimizar_cacheado(cache, MOTOR_SA, modelo, inventario, 2, semilla=1, workers=1, debug=False, **parametros)
+    assert len(cache) == (1 if cacheable else 0)
+
+
+def test_disco_acotado(modelo, inventario, tmp_path):
+    cache = CacheResultados(directorio=str(tmp_path), max_bytes_disco=50_000)
+    for cantidad in range(1, 15):
+        optimizar_cacheado(cache, MOTOR_CLASICO, modelo, inventario, cantidad)
+    ocupado = sum(os.path.getsize(os.path.join(tmp_path, n)) for n in os.listdir(tmp_path))
+    assert 0 < ocupado <= 50_000
+    # Se podan las más viejas: la última sigue en disco
+    assert len(os.listdir(tmp_path)) < 14
+    otra = CacheResultados(directorio=str(tmp_path))
+    optimizar_cacheado(otra, MOTOR_CLASICO, modelo, inventario, 14)
+    assert otra.aciertos == 1
+
+
+def test_sobrescribir_no_duplica_los_bytes_en_disco(modelo, inventario, tmp_path):
+    cache = CacheResultados(directorio=str(tmp_path))
+    for _ in range(3):
+        cache.guardar("clave", optimizar_cacheado(CacheResultados(), MOTOR_CLASICO, modelo, inventario, 5))
+    assert cache._bytes_disco == os.path.getsize(cache._ruta("clave"))
+
+
+def test_acierto_desde_disco(modelo, inventario, tmp_path):
+    primero = optimizar_cacheado(CacheResultados(directorio=str(tmp_path)), MOTOR_CLASICO, modelo, inventario, 5)
+    # Otra instancia sobre el mismo directorio lo lee del disco
+    otra = CacheResultados(directorio=str(tmp_path))
+    assert optimizar_cacheado(otra, MOTOR_CLASICO, modelo, inventario, 5) == primero
+    assert otra.aciertos == 1
+
+
+def test_fuentes_modificadas_invalidan(modelo, inventario, tmp_path):
+    fuente = tmp_path / "inventario.json"
+    fuente.write_text("[]")
+    cache = CacheResultados(directorio=str(tmp_path / "cache"), fuentes=(str(fuente),))
+    optimizar_cacheado(cache, MOTOR_CLASICO, modelo, inventario, 5)
+    fuente.write_text("[1]")
+    optimizar_cacheado(cache, MOTOR_CLASICO, modelo, inventario, 5)
+    assert cache.aciertos == 0
@@ -0,0 +1,78 @@
+# tests/test_columnar.py
+
+import json
+import numpy as np
+import pytest
+from optimizador.cache import MOTOR_CLASICO, clave_corrida
+from optimizador.logic import cantidad_maxima, optimizar_por_color
+from optimizador.logic_guillotina import optimizar_guillotina
+from optimizador.models import ArreglosInventario, ModeloMueble, PiezaModelo
+import datos
+
+pytest.importorskip("pyarrow")
+from optimizador.columnar import (  # noqa: E402
+    convertir_json, escribir_inventario, escribir_modelos, leer_inventario, leer_modelos
+)
+
+FORMATOS = ("arrow", "parquet")
+
+
+def _iguales(a: ArreglosInventario, b: ArreglosInventario) -> bool:
+    return list(a.codigo) == list(b.codigo) and list(a.color) == list(b.color) and all(
+        np.array_equal(getattr(a, c), getattr(b, c), equal_nan=True) for c in ("ancho", "largo", "espesor", "cantidad")
+    )
+
+
+@pytest.fixture
+def inventario():
+    # Con algunos espesores vacíos, que viajan como NaN
+    return datos.inventario(400, colores=3, semilla=5, prob_sin_espesor=0.1)
+
+
+@pytest.mark.parametrize("formato", FORMATOS)
+def test_inventario_ida_y_vuelta(tmp_path, inventario, formato):
+    ruta = str(tmp_path / f"inventario.{formato}")
+    escribir_inventario(inventario, ruta)
+    leido = leer_inventario(ruta)
+    assert _iguales(leido, ArreglosInventario.desde_piezas(inventario))
+    assert leido.a_piezas() == inventario
+
+
+@pytest.mark.parametrize("formato", FORMATOS)
+def test_filtro_por_color(tmp_path, inventario, formato):
+    ruta = str(tmp_path / f"inventario.{formato}")
+    escribir_inventario(inventario, ruta)
+    color = inventario[0].color
+    assert leer_inventario(ruta, color=color).a_piezas() == [p for p in inventario if p.color == color]
+
+
+@pytest.mark.parametrize("formato", FORMATOS)
+def test_motores_dan_lo_mismo_con_columnas(tmp_path, inventario, formato):
+    ruta = str(tmp_path / f"inventario.{formato}")
+    escribir_inventario(inventario, ruta)
+    columnas = leer_inventario(ruta)
+    modelo = datos.modelo(5)
+    assert clave_corrida(MOTOR_CLASICO, modelo, columnas, 20) == clave_corrida(MOTOR_CLASICO, modelo, inventario, 20)
+    assert optimizar_por_color(modelo, columnas, 20) == optimizar_por_color(modelo, inventario, 20)
+    assert optimizar_guillotina(modelo, columnas, 20) == optimizar_guillotina(modelo, inventario, 20)
+    assert cantidad_maxima(modelo, columnas) == cantidad_maxima(modelo, inventario)
+
+
+@pytest.mark.parametrize("formato", FORMATOS)
+def test_modelos_ida_y_vuelta(tmp_path, formato):
+    modelos = [
+        datos.modelo(1, id=1),
+        ModeloMueble(2, "Sin piezas", []),
+        ModeloMueble(3, "Con espesor vacío", [PiezaModelo("A", 300.0, 400.0, None, 2)]),
+    ]
+    ruta = str(tmp_path / f"modelos.{formato}")
+    escribir_modelos(modelos, ruta)
+    assert leer_modelos(ruta) == modelos
+
+
+def test_convertir_json(tmp_path, inventario):
+    campos = ("codigo", "ancho", "largo", "color", "espesor", "cantidad")
+    origen = tmp_path / "inventario.json"
+    origen.write_text(json.dumps([{c: getattr(p, c) for c in campos} for p in inventario]), encoding="utf-8")
+    ruta, _ = convertir_json(str(tmp_path / "columnar"), str(origen))
+    assert leer_inventario(ruta).a_piezas() == inventario
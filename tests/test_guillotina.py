@@ -0,0 +1,83 @@
+# tests/test_guillotina.py
+
+import itertools
+import pytest
+from optimizador.logic import optimizar_por_color
+from optimizador.logic_guillotina import KERF, optimizar_guillotina
+from optimizador.models import ModeloMueble, PiezaInventario, PiezaModelo
+import datos
+
+EPS = 1e-6
+
+
+def _separados(a, b, kerf: float) -> bool:
+    return (
+        a["x"] + a["ancho"] + kerf <= b["x"] + EPS or b["x"] + b["ancho"] + kerf <= a["x"] + EPS or
+        a["y"] + a["largo"] + kerf <= b["y"] + EPS or b["y"] + b["largo"] + kerf <= a["y"] + EPS
+    )
+
+
+def _chequear(resultado, modelo: ModeloMueble, kerf: float):
+    """Piezas dentro de su tablero, con sus medidas, sin solaparse y con `kerf` entre cortes; libres sin piezas."""
+    medidas = {p.codigo: (p.ancho, p.largo) for p in modelo.piezas}
+    for r in resultado:
+        por_tablero = {}
+        for lote in r["piezasUtilizadas"]:
+            cuenta = {}
+            for e in lote:
+                cuenta[e["pieza_modelo_codigo"]] = cuenta.get(e["pieza_modelo_codigo"], 0) + e["cantidad_req"]
+                assert len(e["colocaciones"]) == e["cantidad_req"]
+                ancho, largo = medidas[e["pieza_modelo_codigo"]]
+                for c in e["colocaciones"]:
+                    assert (c["ancho"], c["largo"]) == ((largo, ancho) if c["rotada"] else (ancho, largo))
+                    assert c["x"] >= 0 and c["y"] >= 0
+                    assert c["x"] + c["ancho"] <= e["ancho"] + EPS and c["y"] + c["largo"] <= e["largo"] + EPS
+                    por_tablero.setdefault(e["tablero"], []).append(c)
+            assert cuenta == {p.codigo: p.cantidad for p in modelo.piezas}
+        for colocaciones in por_tablero.values():
+            for a, b in itertools.combinations(colocaciones, 2):
+                assert _separados(a, b, kerf), (a, b)
+        for libre in r["libres"]:
+            for c in por_tablero[libre["tablero"]]:
+                assert _separados(libre, c, 0.0), (libre, c)
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_sin_solapes_y_con_kerf(semilla):
+    modelo = datos.modelo(semilla)
+    resultado = optimizar_guillotina(modelo, datos.inventario(300, colores=3, semilla=semilla), 30)
+    _chequear(resultado, modelo, KERF)
+
+
+@pytest.mark.parametrize("kerf", [0.0, 10.0])
+def test_respeta_otro_kerf(kerf):
+    modelo = ModeloMueble(1, "Chico", [PiezaModelo("A", 50, 80, None, 40), PiezaModelo("B", 30, 30, None, 60)])
+    inventario = [PiezaInventario("T", 1830, 2440, "BLANCO", None, 3)]
+    resultado = optimizar_guillotina(modelo, inventario, 50, kerf=kerf)
+    assert resultado[0]["cantidadFabricable"] > 0
+    _chequear(resultado, modelo, kerf)
+
+
+def test_el_kerf_cuenta_al_encajar():
+    # Dos piezas de 500 en un tablero de 1000 sólo entran sin kerf
+    modelo = ModeloMueble(1, "Par", [PiezaModelo("A", 500, 500, None, 2)])
+    inventario = [PiezaInventario("T", 500, 1000, "BLANCO", None, 1)]
+    assert optimizar_guillotina(modelo, inventario, 1, kerf=0.0)[0]["cantidadFabricable"] == 1
+    assert optimizar_guillotina(modelo, inventario, 1, kerf=3.0)[0]["cantidadFabricable"] == 0
+
+
+def test_unidad_incompleta_no_consume():
+    modelo = ModeloMueble(1, "M", [PiezaModelo("A", 90, 90, None, 1), PiezaModelo("B", 95, 95, None, 1)])
+    inventario = [PiezaInventario("T", 100, 100, "BLANCO", None, 1)]
+    resultado = optimizar_guillotina(modelo, inventario, 3)
+    assert resultado[0]["cantidadFabricable"] == 0
+    assert resultado[0]["piezasUtilizadas"] == []
+
+
+def test_modelo_sin_piezas_como_el_motor_clasico():
+    modelo = ModeloMueble(1, "Vacío", [])
+    inventario = datos.inventario(20)
+    guillotina = optimizar_guillotina(modelo, inventario, 3)
+    clasico = optimizar_por_color(modelo, inventario, 3, debug=False)
+    campos = ("color", "cantidadFabricable", "piezasUtilizadas")
+    assert [{c: r[c] for c in campos} for r in guillotina] == [{c: r[c] for c in campos} for r in clasico]
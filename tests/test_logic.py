@@ -0,0 +1,56 @@
+# tests/test_logic.py
+
+import pytest
+from optimizador.logic import cantidad_maxima, optimizar_por_color
+from optimizador.models import ArreglosInventario, ModeloMueble, PiezaInventario, PiezaModelo
+import datos
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_patrones_dan_el_mismo_resultado_que_unidad_por_unidad(semilla):
+    modelo = datos.modelo(semilla)
+    inventario = datos.inventario(300, colores=3, semilla=semilla)
+    con = optimizar_por_color(modelo, inventario, 40, debug=False, patrones=True)
+    sin = optimizar_por_color(modelo, inventario, 40, debug=False, patrones=False)
+    assert con == sin
+
+
+def test_patron_se_replica_mientras_alcanzan_las_copias():
+    modelo = ModeloMueble(1, "Repisa", [PiezaModelo("A", 300, 800, 18.0, 2)])
+    inventario = [PiezaInventario("T", 700, 900, "BLANCO", 18.0, 5)]
+    resultado = optimizar_por_color(modelo, inventario, 10, debug=False)
+    # Cada tablero da dos piezas: cinco copias, cinco unidades iguales
+    assert resultado[0]["cantidadFabricable"] == 5
+    lotes = resultado[0]["piezasUtilizadas"]
+    assert all(lote == lotes[0] for lote in lotes)
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_cantidad_maxima_igual_al_motor_clasico(semilla):
+    modelo = datos.modelo(semilla)
+    inventario = datos.inventario(300, colores=3, semilla=semilla)
+    maximo = cantidad_maxima(modelo, inventario)
+    clasico = optimizar_por_color(modelo, inventario, 10_000, debug=False)
+    assert maximo == {r["color"]: r["cantidadFabricable"] for r in clasico}
+    # Pedir una más que el máximo no agrega unidades
+    for r in optimizar_por_color(modelo, inventario, max(maximo.values()) + 1, debug=False):
+        assert r["cantidadFabricable"] == maximo[r["color"]]
+
+
+def test_cantidad_maxima_con_inventario_en_columnas():
+    modelo = datos.modelo(1)
+    inventario = datos.inventario(200, colores=2, semilla=1)
+    assert cantidad_maxima(modelo, ArreglosInventario.desde_piezas(inventario)) == cantidad_maxima(modelo, inventario)
+
+
+def test_cantidad_maxima_rechaza_modelo_sin_area():
+    with pytest.raises(ValueError):
+        cantidad_maxima(ModeloMueble(1, "Vacío", []), datos.inventario(10))
+
+
+def test_pieza_sin_area_no_limita_las_unidades():
+    modelo = ModeloMueble(1, "Con tapacanto", [PiezaModelo("A", 300, 800, 18.0, 2), PiezaModelo("C", 0, 800, 18.0, 4)])
+    inventario = [PiezaInventario("T", 700, 900, "BLANCO", 18.0, 5)]
+    resultado = optimizar_por_color(modelo, inventario, 10, debug=False)
+    assert resultado[0]["cantidadFabricable"] == 5
+    assert cantidad_maxima(modelo, inventario) == {"BLANCO": 5}
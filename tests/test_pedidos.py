@@ -0,0 +1,27 @@
+# tests/test_pedidos.py
+
+import json
+import pytest
+from optimizador.pedidos import Pedido, leer_pedidos
+
+
+def test_lee_json_y_jsonl(tmp_path):
+    datos = [{"modelo_id": 1, "cantidad": 2}, {"modelo_id": 2, "cantidad": 1, "prioridad": 0, "color": "NEGRO"}]
+    (tmp_path / "p.json").write_text(json.dumps(datos))
+    (tmp_path / "p.jsonl").write_text("\n".join(json.dumps(d) for d in datos) + "\n")
+    esperado = [Pedido(1, 2), Pedido(2, 1, prioridad=0, color="NEGRO")]
+    assert leer_pedidos(str(tmp_path / "p.json")) == esperado
+    assert leer_pedidos(str(tmp_path / "p.jsonl")) == esperado
+
+
+@pytest.mark.parametrize("malo, mensaje", [
+    ({"cantidad": 2}, "Pedido 1: falta el campo 'modelo_id'"),
+    ({"modelo_id": 1, "cantidad": 2, "colour": "NEGRO"}, "Pedido 1: campo desconocido 'colour'"),
+    ([1, 2], "Pedido 1: se esperaba un objeto JSON"),
+])
+def test_pedido_invalido_dice_cual_y_por_que(tmp_path, malo, mensaje):
+    ruta = tmp_path / "p.json"
+    ruta.write_text(json.dumps([{"modelo_id": 1, "cantidad": 1}, malo]))
+    with pytest.raises(ValueError) as error:
+        leer_pedidos(str(ruta))
+    assert str(error.value) == mensaje
@@ -0,0 +1,65 @@
+# tests/test_recocido.py
+
+import random
+import numpy as np
+import pytest
+from optimizador.logic_opti5 import PENALIZACION_TABLERO, Estado, simulated_annealing_optimize
+import datos
+
+
+def _estado(semilla: int) -> Estado:
+    modelo = datos.modelo(semilla)
+    inventario = datos.inventario(40, colores=1, semilla=semilla)
+    return Estado(modelo.piezas, inventario, random.Random(semilla), multiplicidad=4)
+
+
+def _energia_completa(estado: Estado) -> float:
+    # Desde la matriz de asignación, sin los acumuladores
+    conteo = estado.asignacion.sum(axis=1)
+    area = estado.asignacion @ np.array(estado.area_tipo, dtype=float)
+    sin_asignar = sum(estado.demanda) - int(estado.asignacion.sum())
+    return estado.penalizacion_pieza * sin_asignar + sum(
+        PENALIZACION_TABLERO + estado.area_tablero[i] - area[i] for i in range(len(conteo)) if conteo[i]
+    )
+
+
+@pytest.mark.parametrize("semilla", range(4))
+def test_delta_igual_a_la_diferencia_de_energia(semilla):
+    estado = _estado(semilla)
+    assert estado.energia() == pytest.approx(_energia_completa(estado))
+    for _ in range(2000):
+        movimiento = estado.mutar()
+        if movimiento is None:
+            continue
+        antes = estado.energia()
+        delta = estado.delta(movimiento)
+        estado.aplicar(movimiento, delta)
+        assert estado.energia() == pytest.approx(antes + delta)
+    assert estado.energia() == pytest.approx(_energia_completa(estado))
+
+
+@pytest.mark.parametrize("semilla", range(4))
+def test_acumuladores_coinciden_con_la_asignacion(semilla):
+    estado = _estado(semilla)
+    for _ in range(2000):
+        movimiento = estado.mutar()
+        if movimiento is not None:
+            estado.aplicar(movimiento)
+    asignacion = estado.instantanea()
+    assert (asignacion >= 0).all()
+    assert estado.conteo == asignacion.sum(axis=1).tolist()
+    assert [d - int(c) for d, c in zip(estado.demanda, asignacion.sum(axis=0))] == estado.sin_asignar
+    assert min(estado.sin_asignar) >= 0
+    for tipo, lista in enumerate(estado._con_tipo):
+        assert sorted(lista) == np.flatnonzero(asignacion[:, tipo]).tolist()
+    for i, area in enumerate(estado.area_usada):
+        assert area <= estado.area_tablero[i] + 1e-6
+
+
+@pytest.mark.parametrize("cadenas", [1, 3])
+def test_misma_semilla_mismo_resultado(cadenas):
+    modelo = datos.modelo(3)
+    inventario = datos.inventario(60, colores=2, semilla=3)
+    uno = simulated_annealing_optimize(modelo, inventario, 4, semilla=7, max_iter=2000, cadenas=cadenas, workers=1)
+    otro = simulated_annealing_optimize(modelo, inventario, 4, semilla=7, max_iter=2000, cadenas=cadenas, workers=1)
+    assert uno == otro
@@ -0,0 +1,88 @@
+# tests/test_recortes.py
+
+import pytest
+from optimizador.almacen import Almacen
+from optimizador.indice import InventoryIndex
+from optimizador.logic import optimizar_por_color
+from optimizador.logic_guillotina import optimizar_guillotina
+from optimizador.logic_opti5 import simulated_annealing_optimize
+from optimizador.models import ModeloMueble, PiezaInventario, PiezaModelo
+from optimizador.recortes import confirmar_plan, delta_plan, distribucion, tableros_plan
+import datos
+
+MOTORES = {
+    "clasico": lambda modelo, inventario: optimizar_por_color(modelo, inventario, 15),
+    "guillotina": lambda modelo, inventario: optimizar_guillotina(modelo, inventario, 15),
+    "sa": lambda modelo, inventario: simulated_annealing_optimize(modelo, inventario, 4, semilla=1, max_iter=500, workers=1),
+}
+
+
+def _ordenados(piezas):
+    return sorted((p.codigo, p.color, p.ancho, p.largo, p.espesor, p.cantidad) for p in piezas)
+
+
+def _stock(piezas) -> int:
+    return sum(p.cantidad for p in piezas)
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    return Almacen(str(tmp_path / "optimizador.db"))
+
+
+@pytest.mark.parametrize("motor", sorted(MOTORES))
+@pytest.mark.parametrize("semilla", range(2))
+def test_confirmar_descuenta_tableros_y_suma_recortes(almacen, motor, semilla):
+    modelo = datos.modelo(semilla)
+    almacen.agregar_sobrantes(datos.inventario(150, colores=2, semilla=semilla))
+    inventario = almacen.sobrantes()
+    indice = InventoryIndex(inventario)
+    resultado = MOTORES[motor](modelo, inventario)
+
+    delta = confirmar_plan(resultado, modelo, almacen=almacen, indice=indice, lado_minimo=100)
+
+    assert delta.tableros == len(tableros_plan(resultado, modelo)) > 0
+    recortes = sum(r.cantidad for r in delta.recortes)
+    assert _stock(almacen.sobrantes()) == _stock(inventario) - delta.tableros + recortes
+    # Almacén e índice quedan con el mismo inventario
+    assert _ordenados(almacen.sobrantes()) == _ordenados(indice.restantes())
+    for r in delta.recortes:
+        assert min(r.ancho, r.largo) >= 100
+        assert r.codigo.endswith("-R")
+
+
+@pytest.mark.parametrize("motor", sorted(MOTORES))
+def test_recortes_y_piezas_no_superan_el_tablero(motor):
+    modelo = datos.modelo(4)
+    resultado = MOTORES[motor](modelo, datos.inventario(150, colores=2, semilla=4))
+    for tablero in tableros_plan(resultado, modelo):
+        distribuido = distribucion(tablero)
+        if distribuido is None:
+            continue
+        colocaciones, libres = distribuido
+        area = sum(w * h for _, _, _, w, h in colocaciones) + sum(w * h for _, _, w, h in libres)
+        assert area <= tablero.clave[2] * tablero.clave[3] + 1e-6
+
+
+def test_lado_minimo_filtra_recortes():
+    modelo = ModeloMueble(1, "Tapa", [PiezaModelo("A", 400, 400, None, 1)])
+    inventario = [PiezaInventario("T", 600, 1000, "BLANCO", None, 1)]
+    resultado = optimizar_por_color(modelo, inventario, 1)
+    todos = delta_plan(resultado, modelo, lado_minimo=0)
+    grandes = delta_plan(resultado, modelo, lado_minimo=500)
+    assert todos.tableros == grandes.tableros == 1
+    assert sum(r.cantidad for r in grandes.recortes) < sum(r.cantidad for r in todos.recortes)
+    assert all(min(r.ancho, r.largo) >= 500 for r in grandes.recortes)
+
+
+def test_stock_insuficiente_no_cambia_nada(almacen):
+    modelo = datos.modelo(9)
+    almacen.agregar_sobrantes(datos.inventario(50, colores=1, semilla=9))
+    resultado = optimizar_por_color(modelo, almacen.sobrantes(), 3)
+    confirmar_plan(resultado, modelo, almacen=almacen)
+    with pytest.raises(ValueError):
+        for _ in range(10):
+            antes = _ordenados(almacen.sobrantes())
+            confirmar_plan(resultado, modelo, almacen=almacen)
+    # La confirmación que falla se revierte entera
+    assert _ordenados(almacen.sobrantes()) == antes